@@ -1,8 +1,8 @@
+import math
+import threading
 from enum import StrEnum, Enum
-from datetime import datetime, timedelta
-from threading import Thread
-from time import sleep
-from typing import Any, List
+from time import monotonic, time
+from typing import Any, List, Optional
 
 from gi.repository import GLib
 from GtkHelper.GenerativeUI.SwitchRow import SwitchRow
@@ -14,9 +14,8 @@ from src.backend.PluginManager.PluginSettings.Asset import Color
 from loguru import logger as log
 
 from ..constants import (
-    AD_SCHEDULE_FETCH_INTERVAL_SECONDS,
     AD_DISPLAY_UPDATE_INTERVAL_SECONDS,
-    ERROR_DISPLAY_DURATION_SECONDS,
+    RESOURCE_AD_SCHEDULE,
 )
 
 
@@ -30,6 +29,72 @@ class Colors(StrEnum):
     ALERT = "alert"
 
 
+class AdCountdown:
+    """Deck-wide timer that redraws the countdown of every visible Ad Schedule key.
+
+    A single GLib timeout ticks all keys. Each tick is scheduled for the next
+    time a key's countdown shows another second, i.e. `n` seconds before its
+    ad, so the display changes right on the boundary. Keys that are no longer
+    visible are dropped and the timer stops once no key is left.
+    """
+
+    def __init__(self) -> None:
+        self.keys: set["AdSchedule"] = set()
+        self.source_id: Optional[int] = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, key: "AdSchedule") -> None:
+        with self.lock:
+            self.keys.add(key)
+            if self.source_id is None:
+                self.source_id = GLib.idle_add(self._tick)
+
+    def remove(self, key: "AdSchedule") -> None:
+        with self.lock:
+            self.keys.discard(key)
+
+    def reschedule(self) -> None:
+        """Moves the next tick to the new boundaries after a schedule change."""
+        GLib.idle_add(self._reschedule)
+
+    def _reschedule(self) -> bool:
+        with self.lock:
+            # Ticks and reschedules both run on the main loop, so the pending
+            # timeout is never the one currently running
+            if self.source_id is not None and self.keys:
+                GLib.source_remove(self.source_id)
+                self.source_id = GLib.timeout_add(self._next_tick_ms(), self._tick)
+        return False
+
+    def _next_tick_ms(self) -> int:
+        """Returns the time until the next key changes, call with the lock held."""
+        seconds = min(key.seconds_until_change() for key in self.keys)
+        # Never early, a tick just before the boundary would draw the old value
+        return math.ceil(seconds * 1000)
+
+    def _tick(self) -> bool:
+        with self.lock:
+            keys = list(self.keys)
+        for key in keys:
+            if not key.get_is_present():
+                self.remove(key)
+                continue
+            try:
+                key.update_countdown()
+            except Exception as ex:
+                log.error(f"Failed to update ad timer display: {ex}")
+
+        with self.lock:
+            if not self.keys:
+                self.source_id = None
+                return False
+            self.source_id = GLib.timeout_add(self._next_tick_ms(), self._tick)
+        return False
+
+
+_countdown = AdCountdown()
+
+
 class AdSchedule(TwitchCore):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -39,14 +104,19 @@ class AdSchedule(TwitchCore):
         self.color_keys = [Colors.DEFAULT, Colors.WARNING, Colors.ALERT]
         self.current_color = self.get_color(Colors.DEFAULT)
         self.has_configuration = True
-        self._next_ad: datetime = datetime.now()
+        # Monotonic time of the next ad, immune to wall clock changes
+        self._next_ad: float = 0
         self._snoozes: int = -1
+        self._resync_requested: bool = True
 
     def on_ready(self) -> None:
         super().on_ready()
-        Thread(
-            target=self._update_ad_display, daemon=True, name="update_ad_display"
-        ).start()
+        self.subscribe_state(RESOURCE_AD_SCHEDULE, self._on_ad_schedule)
+        _countdown.add(self)
+
+    def on_removed_from_cache(self) -> None:
+        _countdown.remove(self)
+        super().on_removed_from_cache()
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -69,70 +139,59 @@ class AdSchedule(TwitchCore):
         )
 
     def get_config_rows(self) -> List[Any]:
-        return [self._skip_ad_switch.widget]
+        return [self._skip_ad_switch.widget, *super().get_config_rows()]
 
     def _update_background_color(self, color: str) -> None:
-        def _update():
-            self.current_color = self.get_color(color)
-            self.display_color()
-
-        GLib.idle_add(_update)
-
-    def _update_ad_display(self) -> None:
-        """Consolidated update loop that fetches ad schedule and updates display."""
-        last_fetch_time = datetime.now() - timedelta(
-            seconds=AD_SCHEDULE_FETCH_INTERVAL_SECONDS
-        )  # Fetch immediately on start
-
-        while self.get_is_present():
-            self.display_color()
-            now = datetime.now()
-
-            # Fetch ad schedule every 30 seconds
-            if (
-                now - last_fetch_time
-            ).total_seconds() >= AD_SCHEDULE_FETCH_INTERVAL_SECONDS:
-                try:
-                    schedule, snoozes = self.backend.get_next_ad()
-                    self._next_ad = schedule
-                    self._snoozes = snoozes
-                    last_fetch_time = now
-                except Exception as ex:
-                    log.error(f"Failed to get ad schedule from Twitch API: {ex}")
-                    self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
-
-            # Update display every second
-            snooze_label = (
-                str(self._snoozes)
-                if (self._snoozes >= 0 and self._skip_ad_switch.get_active())
-                else ""
-            )
-            GLib.idle_add(lambda: self.set_bottom_label(snooze_label))
-
-            try:
-                if self._next_ad < now:
-                    self._update_background_color(Colors.DEFAULT)
-                    GLib.idle_add(lambda: self.set_center_label(""))
-                    sleep(AD_DISPLAY_UPDATE_INTERVAL_SECONDS)
-                    continue
-                diff = (self._next_ad - now).total_seconds()
-                time_label = self._convert_seconds_to_hh_mm_ss(diff)
-                GLib.idle_add(lambda: self.set_center_label(time_label))
-                if diff <= 60:
-                    self._update_background_color(Colors.ALERT)
-                elif diff <= 300:
-                    self._update_background_color(Colors.WARNING)
-                else:
-                    self._update_background_color(Colors.DEFAULT)
-            except TypeError:
-                # There is a known issue where the default timestamp returned from
-                # the twitch API is an invalid datetime object and causes an error.
-                # Ignoring it here
-                pass
-            except Exception as ex:
-                log.error(f"Failed to update ad timer display: {ex}")
+        self.current_color = self.get_color(color)
+        self.display_color()
+
+    def _on_ad_schedule(self, ad_schedule: Any) -> None:
+        next_ad_at, snoozes = ad_schedule
+        self._next_ad = monotonic() + (next_ad_at - time())
+        self._snoozes = snoozes
+        self._resync_requested = False
+        self.update_countdown()
+        _countdown.reschedule()
+
+    def seconds_until_change(self) -> float:
+        """Returns the time until the countdown shows the next second."""
+        diff = self._next_ad - monotonic()
+        if diff < 0:
+            # Nothing counts down until the schedule is fetched again
+            return AD_DISPLAY_UPDATE_INTERVAL_SECONDS
+        return diff % 1
+
+    def update_countdown(self) -> None:
+        """Redraws the countdown from the last fetched ad schedule."""
+        snooze_label = (
+            str(self._snoozes)
+            if (self._snoozes >= 0 and self._skip_ad_switch.get_active())
+            else ""
+        )
+        self.render_label("bottom", snooze_label)
 
-            sleep(AD_DISPLAY_UPDATE_INTERVAL_SECONDS)
+        diff = self._next_ad - monotonic()
+        if diff < 0:
+            self._update_background_color(Colors.DEFAULT)
+            self.render_icon_label("")
+            self._request_resync()
+            return
+        if diff <= 60:
+            self._update_background_color(Colors.ALERT)
+        elif diff <= 300:
+            self._update_background_color(Colors.WARNING)
+        else:
+            self._update_background_color(Colors.DEFAULT)
+        self.render_icon_label(self._convert_seconds_to_hh_mm_ss(diff))
+
+    def _request_resync(self) -> None:
+        """Fetches the schedule once after the countdown ran out, as the ad is due."""
+        if self._resync_requested or not self.backend:
+            return
+        self._resync_requested = True
+        self.plugin_base.action_executor.submit(
+            self.backend.refresh, RESOURCE_AD_SCHEDULE
+        )
 
     def _convert_seconds_to_hh_mm_ss(self, seconds: float) -> str:
         hours = seconds // 3600
@@ -143,8 +202,6 @@ class AdSchedule(TwitchCore):
     def _on_snooze_ad(self, _: Any) -> None:
         if not self._skip_ad_switch.get_active():
             return
-        try:
-            self.backend.snooze_ad()
-        except Exception as ex:
-            log.error(f"Failed to snooze next ad: {ex}")
-            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+        self.run_in_background(
+            lambda: self.backend.snooze_ad(), "Failed to snooze next ad"
+        )
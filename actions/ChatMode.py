@@ -1,19 +1,17 @@
 from enum import StrEnum, Enum
-from threading import Thread
-from time import sleep
 from typing import Any, List, Optional
 
-from gi.repository import GLib
 from .TwitchCore import TwitchCore
 from src.backend.PluginManager.EventAssigner import EventAssigner
 from src.backend.PluginManager.InputBases import Input
 from GtkHelper.GenerativeUI.ComboRow import ComboRow
+from GtkHelper.GenerativeUI.SpinRow import SpinRow
 from GtkHelper.ComboRow import SimpleComboRowItem, BaseComboRowItem
 
 from loguru import logger as log
 
 from ..constants import (
-    CHAT_MODE_UPDATE_INTERVAL_SECONDS,
+    RESOURCE_CHAT_SETTINGS,
     ERROR_DISPLAY_DURATION_SECONDS,
 )
 
@@ -32,12 +30,19 @@ class ChatModeOptions(Enum):
     SLOW = SimpleComboRowItem("slow_mode", "Slow Mode")
 
 
+class ChatModeActions(Enum):
+    TOGGLE = SimpleComboRowItem("toggle", "Toggle")
+    ENABLE = SimpleComboRowItem("enable", "Enable")
+    DISABLE = SimpleComboRowItem("disable", "Disable")
+
+
 class ChatMode(TwitchCore):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.icon_keys = [Icons.FOLLOWER, Icons.SUBSCRIBER, Icons.EMOTE, Icons.SLOW]
         self.current_icon = self.get_icon(Icons.FOLLOWER)
         self.icon_name = Icons.FOLLOWER
+        self.has_configuration = True
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -64,14 +69,49 @@ class ChatMode(TwitchCore):
             complex_var_name=True,
             on_change=self._change_chat_mode,
         )
+        self._chat_action_row = ComboRow(
+            action_core=self,
+            var_name="chat.action",
+            default_value=ChatModeActions.TOGGLE.value,
+            items=[
+                ChatModeActions.TOGGLE.value,
+                ChatModeActions.ENABLE.value,
+                ChatModeActions.DISABLE.value,
+            ],
+            title="chat-action-dropdown",
+            complex_var_name=True,
+        )
+        self._slow_mode_row = SpinRow(
+            action_core=self,
+            var_name="chat.slow_mode_wait_time",
+            default_value=30,
+            min=3,
+            max=120,
+            title="chat-slow-mode-wait-time",
+            complex_var_name=True,
+        )
+        self._follower_mode_row = SpinRow(
+            action_core=self,
+            var_name="chat.follower_mode_duration",
+            default_value=0,
+            min=0,
+            max=129600,
+            title="chat-follower-mode-duration",
+            complex_var_name=True,
+        )
 
     def on_ready(self) -> None:
-        Thread(
-            target=self._update_chat_mode, daemon=True, name="update_chat_mode"
-        ).start()
+        super().on_ready()
+        self.subscribe_state(RESOURCE_CHAT_SETTINGS, self._update_chat_mode)
 
     def get_config_rows(self) -> List[Any]:
-        return [self._chat_select_row.widget]
+        return [
+            self._chat_select_row.widget,
+            self._chat_action_row.widget,
+            self._slow_mode_row.widget,
+            self._follower_mode_row.widget,
+            *super().get_config_rows(),
+        ]
 
     def _change_chat_mode(self, _: Any, new: str, __: Any) -> None:
         self.icon_name = Icons(new)
@@ -80,30 +120,51 @@ class ChatMode(TwitchCore):
 
     def _update_icon(self, mode: str, enabled: bool) -> None:
         # TODO: Custom icons for enabled/disabled
-        label = "Enabled" if enabled else "Disabled"
-        GLib.idle_add(lambda: self.set_center_label(label))
-
-    def _update_chat_mode(self) -> None:
-        while self.get_is_present():
-            mode: Optional[str] = None
-            try:
-                chat_settings = self.backend.get_chat_settings()
-                mode = self._chat_select_row.get_selected_item().get_value()
-                if mode:
-                    enabled = chat_settings.get(mode)
-                    self._update_icon(mode, enabled)
-            except Exception as ex:
-                log.error(
-                    f"Failed to update chat mode status{f' for {mode}' if mode else ''}: {ex}"
-                )
-                self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
-            sleep(CHAT_MODE_UPDATE_INTERVAL_SECONDS)
+        self.render_label("center", "Enabled" if enabled else "Disabled")
 
-    def _on_toggle_chat(self, _: Any) -> None:
-        item = self._chat_select_row.get_selected_item().get_value()
+    def _update_chat_mode(self, chat_settings: Any) -> None:
+        mode: Optional[str] = None
         try:
-            resp = self.backend.toggle_chat_mode(item)
-            self._update_icon(item, resp)
+            mode = self._chat_select_row.get_selected_item().get_value()
+            if mode:
+                enabled = chat_settings.get(mode)
+                self._update_icon(mode, enabled)
         except Exception as ex:
-            log.error(f"Failed to toggle chat mode '{item}': {ex}")
+            log.error(
+                f"Failed to update chat mode status{f' for {mode}' if mode else ''}: {ex}"
+            )
             self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+
+    def _get_duration(self, mode: str) -> Optional[int]:
+        if mode == ChatModeOptions.SLOW.value.get_value():
+            return int(self._slow_mode_row.get_value())
+        if mode == ChatModeOptions.FOLLOWER.value.get_value():
+            return int(self._follower_mode_row.get_value())
+        return None
+
+    def _on_toggle_chat(self, _: Any) -> None:
+        item = self._chat_select_row.get_selected_item().get_value()
+        action = self._chat_action_row.get_selected_item().get_value()
+        duration = self._get_duration(item)
+        chat_settings = self.get_state(RESOURCE_CHAT_SETTINGS)
+
+        if action == ChatModeActions.TOGGLE.value.get_value():
+            expected = (
+                not chat_settings[item]
+                if chat_settings and item in chat_settings
+                else None
+            )
+            call = lambda: self.backend.toggle_chat_mode(item, duration)
+        else:
+            expected = action == ChatModeActions.ENABLE.value.get_value()
+            call = lambda: self.backend.set_chat_mode(item, expected, duration)
+
+        # Show the expected state right away, the result of the call confirms it
+        if expected is not None:
+            self._update_icon(item, expected)
+        self.run_in_background(
+            call,
+            f"Failed to {action} chat mode '{item}'",
+            on_success=lambda enabled: self._update_icon(item, enabled),
+            on_error=lambda _: self._update_chat_mode(chat_settings or {}),
+        )
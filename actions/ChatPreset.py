@@ -0,0 +1,136 @@
+from enum import StrEnum
+from typing import Any, List
+
+from .TwitchCore import TwitchCore
+from src.backend.PluginManager.EventAssigner import EventAssigner
+from src.backend.PluginManager.InputBases import Input
+from GtkHelper.GenerativeUI.EntryRow import EntryRow
+from GtkHelper.GenerativeUI.SpinRow import SpinRow
+from GtkHelper.GenerativeUI.SwitchRow import SwitchRow
+
+
+class Icons(StrEnum):
+    CHAT = "chat"
+
+
+class ChatPreset(TwitchCore):
+    """Applies several chat settings at once, e.g. as a panic button during raids.
+
+    The first press applies the preset in a single request, the next press
+    restores the chat settings from before the preset was applied.
+    """
+
+    # Accounts the backend keeps the settings from before a preset for, shared
+    # by all preset keys, so one key restoring them is seen by the others
+    backed_up_accounts: set[str] = set()
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.icon_keys = [Icons.CHAT]
+        self.current_icon = self.get_icon(Icons.CHAT)
+        self.icon_name = Icons.CHAT
+        self.has_configuration = True
+        self._applied: bool = False
+
+    def on_ready(self) -> None:
+        super().on_ready()
+        self.render_label("bottom", self._name_row.get_value())
+        self.render_label("center", "Active" if self._applied else "")
+
+    def create_event_assigners(self) -> None:
+        self.event_manager.add_event_assigner(
+            EventAssigner(
+                id="chat-preset",
+                ui_label="Apply/Restore Preset",
+                default_event=Input.Key.Events.DOWN,
+                callback=self._on_press,
+            )
+        )
+
+    def create_generative_ui(self) -> None:
+        self._name_row = EntryRow(
+            action_core=self,
+            var_name="preset.name",
+            default_value="Lockdown",
+            title="chat-preset-name",
+            auto_add=False,
+            complex_var_name=True,
+            on_change=lambda _, name, __: self.render_label("bottom", name),
+        )
+        self._mode_rows = {
+            mode: SwitchRow(
+                action_core=self,
+                var_name=f"preset.{mode}",
+                default_value=mode != "subscriber_mode",
+                title=f"chat-preset-{mode.replace('_', '-')}",
+                auto_add=False,
+                complex_var_name=True,
+            )
+            for mode in ("follower_mode", "subscriber_mode", "emote_mode", "slow_mode")
+        }
+        self._slow_mode_row = SpinRow(
+            action_core=self,
+            var_name="preset.slow_mode_wait_time",
+            default_value=30,
+            min=3,
+            max=120,
+            title="chat-slow-mode-wait-time",
+            auto_add=False,
+            complex_var_name=True,
+        )
+        self._follower_mode_row = SpinRow(
+            action_core=self,
+            var_name="preset.follower_mode_duration",
+            default_value=10,
+            min=0,
+            max=129600,
+            title="chat-follower-mode-duration",
+            auto_add=False,
+            complex_var_name=True,
+        )
+
+    def get_config_rows(self) -> List[Any]:
+        return [
+            self._name_row.widget,
+            *[row.widget for row in self._mode_rows.values()],
+            self._slow_mode_row.widget,
+            self._follower_mode_row.widget,
+            *super().get_config_rows(),
+        ]
+
+    def _get_settings(self) -> dict[str, Any]:
+        settings: dict[str, Any] = {
+            mode: row.get_active() for mode, row in self._mode_rows.items()
+        }
+        if settings["slow_mode"]:
+            settings["slow_mode_wait_time"] = int(self._slow_mode_row.get_value())
+        if settings["follower_mode"]:
+            settings["follower_mode_duration"] = int(
+                self._follower_mode_row.get_value()
+            )
+        return settings
+
+    def _on_press(self, _: Any) -> None:
+        account = self.account
+        if self._applied and account in ChatPreset.backed_up_accounts:
+            self.run_in_background(
+                lambda: self.backend.restore_chat_settings(),
+                "Failed to restore chat settings",
+                on_success=lambda _: self._set_applied(False, account),
+            )
+            return
+
+        settings = self._get_settings()
+        self.run_in_background(
+            lambda: self.backend.apply_chat_settings(**settings),
+            f"Failed to apply chat preset '{self._name_row.get_value()}'",
+            on_success=lambda _: self._set_applied(True, account),
+        )
+
+    def _set_applied(self, applied: bool, account: str) -> None:
+        self._applied = applied
+        if applied:
+            ChatPreset.backed_up_accounts.add(account)
+        else:
+            ChatPreset.backed_up_accounts.discard(account)
+        self.render_label("center", "Active" if applied else "")
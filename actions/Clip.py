@@ -1,26 +1,33 @@
-from enum import StrEnum
-from typing import Any
+from enum import Enum, StrEnum
+from typing import Any, List
 
 from loguru import logger as log
+from gi.repository import Gdk
 
 from .TwitchCore import TwitchCore
 from src.backend.PluginManager.EventAssigner import EventAssigner
 from src.backend.PluginManager.InputBases import Input
-
-from ..constants import ERROR_DISPLAY_DURATION_SECONDS
+from GtkHelper.GenerativeUI.ComboRow import ComboRow
+from GtkHelper.ComboRow import SimpleComboRowItem
 
 
 class Icons(StrEnum):
     CLIP = "camera"
 
 
+class ShareModes(Enum):
+    NONE = SimpleComboRowItem("none", "Don't share")
+    CLIPBOARD = SimpleComboRowItem("clipboard", "Copy URL to clipboard")
+    CHAT = SimpleComboRowItem("chat", "Post URL to chat")
+
+
 class Clip(TwitchCore):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.icon_keys = [Icons.CLIP]
         self.current_icon = self.get_icon(Icons.CLIP)
         self.icon_name = Icons.CLIP
-        self.has_configuration = False
+        self.has_configuration = True
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -32,9 +39,42 @@ class Clip(TwitchCore):
             )
         )
 
+    def create_generative_ui(self) -> None:
+        self._share_row = ComboRow(
+            action_core=self,
+            var_name="clip.share",
+            default_value=ShareModes.NONE.value,
+            items=[mode.value for mode in ShareModes],
+            title="clip-share",
+            complex_var_name=True,
+        )
+
+    def get_config_rows(self) -> List[Any]:
+        return [self._share_row.widget, *super().get_config_rows()]
+
     def _on_clip(self, _: Any) -> None:
-        try:
-            self.backend.create_clip()
-        except Exception as ex:
-            log.error(f"Failed to create clip: {ex}")
-            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+        self.run_in_background(
+            lambda: self.backend.create_clip(),
+            "Failed to create clip",
+            on_success=self._on_clip_created,
+        )
+
+    def _on_clip_created(self, clip: tuple[str, str]) -> None:
+        clip_id, edit_url = clip
+        log.info(f"Created clip, edit it at {edit_url}")
+        # The key stays pending until Twitch has processed the clip
+        self.watch_future(
+            self.plugin_base.watch_clip(clip_id, self.account),
+            "Failed to process clip",
+            on_success=self._share,
+        )
+
+    def _share(self, url: str) -> None:
+        mode = self._share_row.get_selected_item().get_value()
+        if mode == ShareModes.CLIPBOARD.value.get_value():
+            Gdk.Display.get_default().get_clipboard().set(url)
+        elif mode == ShareModes.CHAT.value.get_value():
+            self.run_in_background(
+                lambda: self.backend.send_message(url, ""),
+                "Failed to post clip to chat",
+            )
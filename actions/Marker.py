@@ -1,14 +1,10 @@
 from enum import StrEnum
 from typing import Any
 
-from loguru import logger as log
-
 from .TwitchCore import TwitchCore
 from src.backend.PluginManager.EventAssigner import EventAssigner
 from src.backend.PluginManager.InputBases import Input
 
-from ..constants import ERROR_DISPLAY_DURATION_SECONDS
-
 
 class Icons(StrEnum):
     MARKER = "bookmark"
@@ -20,7 +16,7 @@ class Marker(TwitchCore):
         self.icon_keys = [Icons.MARKER]
         self.current_icon = self.get_icon(Icons.MARKER)
         self.icon_name = Icons.MARKER
-        self.has_configuration = False
+        self.has_configuration = True
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -33,8 +29,6 @@ class Marker(TwitchCore):
         )
 
     def _on_marker(self, _: Any) -> None:
-        try:
-            self.backend.create_marker()
-        except Exception as ex:
-            log.error(f"Failed to create stream marker: {ex}")
-            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+        self.run_in_background(
+            lambda: self.backend.create_marker(), "Failed to create stream marker"
+        )
@@ -38,7 +38,7 @@ class PlayAd(TwitchCore):
         )
 
     def get_config_rows(self) -> List[Any]:
-        return [self._time_row.widget]
+        return [self._time_row.widget, *super().get_config_rows()]
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -54,10 +54,13 @@ class PlayAd(TwitchCore):
         time: Optional[str] = None
         try:
             time = self._time_row.get_selected_item().get_value()
-            if time:
-                self.backend.play_ad(int(time))
         except Exception as ex:
-            log.error(
-                f"Failed to play ad{f' (duration: {time}s)' if time else ''}: {ex}"
-            )
+            log.error(f"Failed to play ad: {ex}")
             self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+            return
+        if not time:
+            return
+        self.run_in_background(
+            lambda: self.backend.play_ad(int(time)),
+            f"Failed to play ad (duration: {time}s)",
+        )
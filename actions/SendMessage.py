@@ -7,9 +7,7 @@ from src.backend.PluginManager.InputBases import Input
 
 from GtkHelper.GenerativeUI.EntryRow import EntryRow
 
-from loguru import logger as log
-
-from ..constants import ERROR_DISPLAY_DURATION_SECONDS
+from ..message_template import MessageTemplate, compile_template
 
 
 class Icons(StrEnum):
@@ -23,6 +21,7 @@ class SendMessage(TwitchCore):
         self.current_icon = self.get_icon(Icons.CHAT)
         self.icon_name = Icons.CHAT
         self.has_configuration = True
+        self._template: MessageTemplate = compile_template("")
 
     def create_event_assigners(self) -> None:
         self.event_manager.add_event_assigner(
@@ -42,6 +41,7 @@ class SendMessage(TwitchCore):
             title="chat-message-text",
             auto_add=False,
             complex_var_name=True,
+            on_change=lambda _, text, __: self._set_template(text),
         )
         self.channel_row = EntryRow(
             action_core=self,
@@ -53,13 +53,35 @@ class SendMessage(TwitchCore):
         )
 
     def get_config_rows(self) -> List[Any]:
-        return [self.message_row.widget, self.channel_row.widget]
+        return [
+            self.message_row.widget,
+            self.channel_row.widget,
+            *super().get_config_rows(),
+        ]
+
+    def on_ready(self) -> None:
+        super().on_ready()
+        # Subscriptions are paused while the page is hidden, subscribe everything again
+        self._template = compile_template("")
+        self._set_template(self.message_row.get_value())
+
+    def on_backend_ready(self) -> None:
+        self.backend.prefetch_user_id(self.channel_row.get_value())
+
+    def _set_template(self, text: str) -> None:
+        """Compiles the message and keeps the stream state it uses up to date."""
+        previous = self._template.resources
+        self._template = compile_template(text)
+        for resource in previous - self._template.resources:
+            self.unsubscribe_state(resource)
+        for resource in self._template.resources - previous:
+            # Values are read from the shared state when the message is sent
+            self.subscribe_state(resource, lambda _: None)
 
     def _on_chat(self, _: Any) -> None:
-        message = self.message_row.get_value()
+        message = self._template.render(self.get_state)
         channel = self.channel_row.get_value()
-        try:
-            self.backend.send_message(message, channel)
-        except Exception as ex:
-            log.error(f"Failed to send chat message to channel '{channel}': {ex}")
-            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+        self.run_in_background(
+            lambda: self.backend.send_message(message, channel),
+            f"Failed to send chat message to channel '{channel}'",
+        )
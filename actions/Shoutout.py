@@ -45,7 +45,10 @@ class Shoutout(TwitchCore):
         )
 
     def get_config_rows(self) -> List[Any]:
-        return [self.username_row.widget]
+        return [self.username_row.widget, *super().get_config_rows()]
+
+    def on_backend_ready(self) -> None:
+        self.backend.prefetch_user_id(self.username_row.get_value())
 
     def _on_shoutout(self, _: Any) -> None:
         username = self.username_row.get_value()
@@ -55,8 +58,7 @@ class Shoutout(TwitchCore):
             self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
             return
 
-        try:
-            self.backend.send_shoutout(username)
-        except Exception as ex:
-            log.error(f"Failed to send shoutout to '{username}': {ex}")
-            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+        self.run_in_background(
+            lambda: self.backend.send_shoutout(username),
+            f"Failed to send shoutout to '{username}'",
+        )
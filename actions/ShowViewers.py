@@ -1,36 +1,74 @@
-from enum import StrEnum
-from threading import Thread
-from time import sleep
-from typing import Optional, Union
+from enum import StrEnum, Enum
+from typing import Any, List
 
-from gi.repository import GLib
 from .TwitchCore import TwitchCore
-from src.backend.PluginManager.EventAssigner import EventAssigner
-from src.backend.PluginManager.InputBases import Input
+from GtkHelper.GenerativeUI.ComboRow import ComboRow
+from GtkHelper.ComboRow import SimpleComboRowItem
 
 from loguru import logger as log
 
-from ..constants import VIEWER_UPDATE_INTERVAL_SECONDS
+from ..constants import RESOURCE_VIEWERS, STATE_VIEWER_TREND
 
 
 class Icons(StrEnum):
     VIEWERS = "view"
 
 
+class DisplayModes(Enum):
+    COUNT = SimpleComboRowItem("count", "Viewer count")
+    TREND = SimpleComboRowItem("trend", "Viewer count with trend")
+
+
 class ShowViewers(TwitchCore):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.icon_keys = [Icons.VIEWERS]
         self.current_icon = self.get_icon(Icons.VIEWERS)
         self.icon_name = Icons.VIEWERS
+        self.has_configuration = True
 
     def on_ready(self) -> None:
-        Thread(target=self._update_viewers, daemon=True, name="update_viewers").start()
-
-    def _update_viewers(self) -> None:
-        while self.get_is_present():
-            count: Union[Optional[int], str] = self.backend.get_viewers()
-            if not count:
-                count = "-"
-            GLib.idle_add(lambda c=count: self.set_center_label(str(c)))
-            sleep(VIEWER_UPDATE_INTERVAL_SECONDS)
+        super().on_ready()
+        self.subscribe_state(RESOURCE_VIEWERS, self._update_viewers)
+        # The trend can change while the viewer count stays the same
+        self.subscribe_state(STATE_VIEWER_TREND, self._update_trend)
+
+    def create_generative_ui(self) -> None:
+        self._display_mode_row = ComboRow(
+            action_core=self,
+            var_name="viewers.display_mode",
+            default_value=DisplayModes.COUNT.value,
+            items=[DisplayModes.COUNT.value, DisplayModes.TREND.value],
+            title="viewers-display-mode",
+            complex_var_name=True,
+            on_change=lambda *_: self._update_viewers(
+                self.get_state(RESOURCE_VIEWERS)
+            ),
+        )
+
+    def get_config_rows(self) -> List[Any]:
+        return [self._display_mode_row.widget, *super().get_config_rows()]
+
+    def _is_trend_mode(self) -> bool:
+        mode = self._display_mode_row.get_selected_item().get_value()
+        return mode == DisplayModes.TREND.value.get_value()
+
+    def _update_trend(self, trend: Any) -> None:
+        if self._is_trend_mode():
+            self._update_viewers(self.get_state(RESOURCE_VIEWERS))
+
+    def _update_viewers(self, count: Any) -> None:
+        if not count:
+            count = "-"
+        if not self._is_trend_mode():
+            self.render_label("bottom", "")
+            self.render_icon_label(str(count))
+            return
+
+        trend = self.get_state(STATE_VIEWER_TREND) or {}
+        if trend.get("peak") is None:
+            self.render_label("bottom", "")
+            self.render_icon_label(str(count))
+            return
+        self.render_label("bottom", f"{trend['delta']:+} / {trend['peak']}")
+        self.render_icon_label(str(count), trend["sparkline"])
@@ -0,0 +1,34 @@
+from enum import StrEnum
+from typing import Any
+
+from .TwitchCore import TwitchCore
+
+from ..constants import RESOURCE_METRICS
+
+
+class Icons(StrEnum):
+    STATS = "delay"
+
+
+class Stats(TwitchCore):
+    """Shows the 95th percentile latency of the Twitch API calls made by the plugin."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.icon_keys = [Icons.STATS]
+        self.current_icon = self.get_icon(Icons.STATS)
+        self.icon_name = Icons.STATS
+        self.has_configuration = False
+
+    def on_ready(self) -> None:
+        super().on_ready()
+        self.render_label("bottom", "p95")
+        self.subscribe_state(RESOURCE_METRICS, self._update_stats)
+
+    def _update_stats(self, summary: Any) -> None:
+        if not summary or not summary["calls"]:
+            self.render_label("center", "-")
+            return
+        self.render_label("center", f"{summary['p95_ms']} ms")
+        errors = summary["errors"]
+        self.render_label("bottom", f"p95 ({errors} err)" if errors else "p95")
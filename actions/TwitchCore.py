@@ -2,15 +2,32 @@ from loguru import logger as log
 from src.backend.PluginManager.ActionCore import ActionCore
 from src.backend.DeckManagement.InputIdentifier import InputEvent, Input
 from src.backend.PluginManager.PluginSettings.Asset import Color, Icon
-from typing import Optional, Any
+from concurrent.futures import Future
+from enum import StrEnum
+import threading
+from typing import Optional, Any, Callable
 
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk, Adw, GLib
 import gi
 
+from GtkHelper.GenerativeUI.EntryRow import EntryRow
+
+from ..constants import (
+    ERROR_DISPLAY_DURATION_SECONDS,
+    SUCCESS_DISPLAY_DURATION_SECONDS,
+)
+from ..key_renderer import key_renderer
+
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 
 
+class FeedbackColors(StrEnum):
+    DEFAULT = "default"
+    PENDING = "pending"
+    SUCCESS = "success"
+
+
 class TwitchCore(ActionCore):
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
@@ -22,76 +39,326 @@ class TwitchCore(ActionCore):
         self.current_color: Optional[Color] = None
         self.icon_name: str = ""
         self.color_name: str = ""
-        self.backend: Any = self.plugin_base.backend
+        self._state_callbacks: dict[str, Callable[[Any], None]] = {}
+        # Account the state subscriptions were made for
+        self._state_account: str = ""
+        # Calls in flight, counted on the input thread and on the main loop
+        self._pending_calls: int = 0
+        self._pending_lock: threading.Lock = threading.Lock()
+        self._render_lock: threading.Lock = threading.Lock()
+        self._rendered: dict[str, Any] = {}
+        self._pending_renders: dict[str, tuple[Any, Callable[[], None]]] = {}
+        # Label and sparkline drawn into the key image by `render_icon_label`
+        self._icon_label: Optional[str] = None
+        self._icon_series: tuple[int, ...] = ()
 
         self.plugin_base.asset_manager.icons.add_listener(self._icon_changed)
         self.plugin_base.asset_manager.colors.add_listener(self._color_changed)
 
         # Setup action related stuff
+        self._account_row = EntryRow(
+            action_core=self,
+            var_name="account",
+            default_value="",
+            title="account",
+            auto_add=False,
+            complex_var_name=True,
+            on_change=lambda *_: self._on_account_changed(),
+        )
         self.create_generative_ui()
         self.create_event_assigners()
 
+    @property
+    def account(self) -> str:
+        """Login of the account the key acts on, empty for the main account."""
+        return self._account_row.get_value().strip().lower()
+
+    @property
+    def backend(self) -> Any:
+        # The backend is launched in the background and may not be connected yet
+        return self.plugin_base.get_backend(self.account)
+
+    def get_config_rows(self) -> list[Any]:
+        return [self._account_row.widget]
+
     def on_ready(self) -> None:
         super().on_ready()
+        self._reset_rendered()
         self.display_icon()
         self.display_color()
+        if self.plugin_base.add_ready_listener(self._on_backend_ready):
+            self._on_backend_ready()
+        else:
+            self.render_label("top", "Connecting")
 
-    def create_generative_ui(self) -> None:
+    def on_backend_ready(self) -> None:
+        """Called once the backend is connected and authenticated, override to use it."""
         pass
 
-    def create_event_assigners(self) -> None:
-        pass
+    def render_label(self, position: str, text: str) -> None:
+        """Shows a label on the key, skipping the render if it is already shown.
 
-    def display_icon(self) -> None:
-        if not self.current_icon:
-            return
-        _, rendered = self.current_icon.get_values()
-        if rendered:
-            self.set_media(image=rendered)
+        Like all `render_*` methods this is safe to call from any thread.
+        Updates made in the same main loop iteration are drawn together.
 
-    async def _icon_changed(self, event: str, key: str, asset: Any) -> None:
-        if not key in self.icon_keys:
-            return
-        if key != self.icon_name:
-            return
-        self.current_icon = asset
-        self.icon_name = key
+        Args:
+            position: One of "top", "center" or "bottom"
+            text: Text to show
+        """
+        setters = {
+            "top": self.set_top_label,
+            "center": self.set_center_label,
+            "bottom": self.set_bottom_label,
+        }
+        self._queue_render(f"label_{position}", text, lambda: setters[position](text))
+
+    def render_icon_label(self, text: str, series: tuple[int, ...] = ()) -> None:
+        """Draws a fast-changing center label, e.g. a counter, into the key image.
+
+        Unlike `render_label` the text is drawn by the plugin from cached
+        glyphs onto a cached icon, so updating it every second stays cheap.
+
+        Args:
+            text: Text to show
+            series: Values to draw as a sparkline below the text
+        """
+        self._icon_label = text
+        self._icon_series = tuple(series)
         self.display_icon()
 
-    def display_color(self) -> None:
-        if not self.current_color:
+    def render_background_color(self, color: list[int]) -> None:
+        self._queue_render(
+            "background", tuple(color), lambda: self.set_background_color(color)
+        )
+
+    def render_media(self, image: Any) -> None:
+        # Images are compared by identity, comparing pixels would cost more than
+        # the render itself. Keeping the image referenced stops its id from being reused.
+        self._queue_render(
+            "media", (id(image), image), lambda: self.set_media(image=image)
+        )
+
+    def subscribe_state(self, resource: str, callback: Callable[[Any], None]) -> None:
+        """Receives updates for a stream state resource shared by all keys.
+
+        The backend polls the resource once for every subscribed key. The
+        subscription is paused as soon as the key is no longer present and
+        resumed by `on_ready` when its page is shown again.
+        """
+        self._state_callbacks[resource] = callback
+        self._state_account = self.account
+        self.plugin_base.subscribe_state(
+            resource,
+            self._subscriber_id,
+            lambda value: self._on_state_update(resource, value),
+            lambda message: self.on_state_error(resource, message),
+            self.get_is_present,
+            self._state_account,
+        )
+
+    def unsubscribe_state(self, resource: str) -> None:
+        if self._state_callbacks.pop(resource, None) is None:
             return
-        color = self.current_color.get_values()
+        self.plugin_base.unsubscribe_state(
+            resource, self._subscriber_id, self._state_account
+        )
+
+    def get_state(self, resource: str) -> Any:
+        """Returns the last known value of a stream state resource of the key's account."""
+        return self.plugin_base.get_cached_state(resource, self.account)
+
+    def run_in_background(
+        self,
+        func: Callable[[], Any],
+        error_message: str,
+        on_success: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """Runs a backend call without blocking deck input.
+
+        The key shows a pending state right away and switches to a success or
+        error state once the call finishes.
+
+        Args:
+            func: Function performing the backend call
+            error_message: Logged together with the exception if the call fails
+            on_success: Called with the result of `func` if the call succeeds
+            on_error: Called with the exception if the call fails, e.g. to roll
+                back an optimistic update
+        """
+        self.watch_future(
+            self.plugin_base.action_executor.submit(func),
+            error_message,
+            on_success,
+            on_error,
+        )
+
+    def watch_future(
+        self,
+        future: Future,
+        error_message: str,
+        on_success: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """Shows the pending state until `future` finishes, like `run_in_background`.
+
+        Used for results the backend reports later, e.g. a clip that is still
+        being processed, without keeping an action worker busy.
+        """
+        with self._pending_lock:
+            self._pending_calls += 1
+        self._show_feedback_color(FeedbackColors.PENDING)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(
+                self._on_background_done, f, error_message, on_success, on_error
+            )
+        )
+
+    def on_state_error(self, resource: str, message: str) -> None:
+        if self.get_is_present():
+            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+
+    def on_removed_from_cache(self) -> None:
+        for resource in list(self._state_callbacks):
+            self.unsubscribe_state(resource)
+        super().on_removed_from_cache()
+
+    def _on_background_done(
+        self,
+        future: Future,
+        error_message: str,
+        on_success: Optional[Callable[[Any], None]],
+        on_error: Optional[Callable[[Exception], None]],
+    ) -> bool:
+        with self._pending_lock:
+            self._pending_calls -= 1
         try:
-            self.set_background_color(color)
-        except:
-            # Sometimes we try to call this too early, and it leads to
-            # console errors, but no real errors. Ignoring this for now
-            pass
+            result = future.result()
+        except Exception as ex:
+            log.error(f"{error_message}: {ex}")
+            if on_error:
+                on_error(ex)
+            self._restore_color()
+            self.show_error(ERROR_DISPLAY_DURATION_SECONDS)
+            return False
 
-    async def _color_changed(self, event: str, key: str, asset: Any) -> None:
-        if not key in self.color_keys:
+        if on_success:
+            on_success(result)
+        if not self._has_pending_calls():
+            self._show_feedback_color(FeedbackColors.SUCCESS)
+            GLib.timeout_add_seconds(
+                SUCCESS_DISPLAY_DURATION_SECONDS, self._restore_color
+            )
+        return False
+
+    def _show_feedback_color(self, color: str) -> None:
+        self.render_background_color(self.get_color(color).get_values())
+
+    def _has_pending_calls(self) -> bool:
+        with self._pending_lock:
+            return self._pending_calls > 0
+
+    def _restore_color(self) -> bool:
+        if self._has_pending_calls():
+            return False
+        if self.current_color:
+            self.display_color()
+        else:
+            self._show_feedback_color(FeedbackColors.DEFAULT)
+        return False
+
+    def _on_backend_ready(self) -> bool:
+        if not self.get_is_present():
+            return False
+        if not self.plugin_base.backend_initialized:
+            self.render_label("top", "Offline")
+            return False
+        if not self.backend:
+            # The account was removed or never added
+            self.render_label("top", "No account")
+            return False
+        self.render_label("top", "")
+        self.on_backend_ready()
+        return False
+
+    @property
+    def _subscriber_id(self) -> str:
+        return str(id(self))
+
+    def _queue_render(self, slot: str, value: Any, apply: Callable[[], None]) -> None:
+        with self._render_lock:
+            if slot not in self._pending_renders and self._rendered.get(slot) == value:
+                # The key already shows the value
+                return
+            schedule = not self._pending_renders
+            self._pending_renders[slot] = (value, apply)
+        if schedule:
+            GLib.idle_add(self._flush_renders)
+
+    def _flush_renders(self) -> bool:
+        with self._render_lock:
+            pending = self._pending_renders
+            self._pending_renders = {}
+        for slot, (value, apply) in pending.items():
+            with self._render_lock:
+                if self._rendered.get(slot) == value:
+                    continue
+            try:
+                apply()
+            except Exception:
+                # Sometimes we try to call this too early, and it leads to
+                # console errors, but no real errors. Ignoring this for now
+                continue
+            with self._render_lock:
+                self._rendered[slot] = value
+        return False
+
+    def _on_account_changed(self) -> None:
+        """Moves the state subscriptions over to the newly selected account."""
+        callbacks = dict(self._state_callbacks)
+        for resource in callbacks:
+            self.unsubscribe_state(resource)
+        for resource, callback in callbacks.items():
+            self.subscribe_state(resource, callback)
+        if self.plugin_base.backend_initialized:
+            self._on_backend_ready()
+
+    def _reset_rendered(self) -> None:
+        """Forgets what the key shows, e.g. after the page was reloaded."""
+        with self._render_lock:
+            self._rendered.clear()
+
+    def _on_state_update(self, resource: str, value: Any) -> None:
+        callback = self._state_callbacks.get(resource)
+        if not callback:
             return
-        if key != self.color_name:
+        if not self.get_is_present():
+            self.unsubscribe_state(resource)
             return
-        self.current_color = asset
-        self.color_name = key
-        self.display_color()
+        callback(value)
 
-    def create_generative_ui(self):
+    def create_generative_ui(self) -> None:
         pass
 
-    def create_event_assigners(self):
+    def create_event_assigners(self) -> None:
         pass
 
-    def display_icon(self):
+    def display_icon(self) -> None:
         if not self.current_icon:
             return
         _, rendered = self.current_icon.get_values()
-        if rendered:
-            self.set_media(image=rendered)
+        if not rendered:
+            return
+        if self._icon_label is not None:
+            color = (
+                self.current_color.get_values() if self.current_color else [0, 0, 0, 0]
+            )
+            rendered = key_renderer.render(
+                rendered, tuple(color), self._icon_label, self._icon_series
+            )
+        self.render_media(rendered)
 
-    async def _icon_changed(self, event: str, key: str, asset):
+    async def _icon_changed(self, event: str, key: str, asset: Any) -> None:
         if not key in self.icon_keys:
             return
         if key != self.icon_name:
@@ -100,18 +367,15 @@ class TwitchCore(ActionCore):
         self.icon_name = key
         self.display_icon()
 
-    def display_color(self):
+    def display_color(self) -> None:
         if not self.current_color:
             return
-        color = self.current_color.get_values()
-        try:
-            self.set_background_color(color)
-        except:
-            # Sometimes we try to call this too early, and it leads to
-            # console errors, but no real errors. Ignoring this for now
-            pass
+        self.render_background_color(self.current_color.get_values())
+        if self._icon_label is not None:
+            # The background is part of the drawn key image
+            self.display_icon()
 
-    async def _color_changed(self, event: str, key: str, asset):
+    async def _color_changed(self, event: str, key: str, asset: Any) -> None:
         if not key in self.color_keys:
             return
         if key != self.color_name:
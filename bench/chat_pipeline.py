@@ -0,0 +1,192 @@
+"""Benchmarks the outbound chat pipeline against a local fake IRC server.
+
+Reports how many messages per second reach chat, how long a press waits for
+its message to be sent, and how many presses are merged, dropped, retried
+over Helix after IRC failed to deliver them, failed or lost.
+
+    python bench/chat_pipeline.py                    # all scenarios
+    python bench/chat_pipeline.py flood --messages 500
+"""
+
+import argparse
+from concurrent.futures import Future, wait
+from time import perf_counter, sleep
+from typing import Callable
+
+from common import add_repo_to_path, format_latencies, set_log_level
+from fake_irc import FakeIrcServer
+
+add_repo_to_path()
+
+from chat import ChatPipeline, ChatQueueFullError, IrcChatClient  # noqa: E402
+from constants import RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD  # noqa: E402
+from twitch_backend import RateLimiter  # noqa: E402
+
+
+class ChatBench:
+    """One pipeline sending to a fake IRC server, with Helix as the fallback.
+
+    Args:
+        helix_latency: Seconds a message sent over Helix takes
+        use_irc: Whether to send over IRC at all
+    """
+
+    def __init__(self, helix_latency: float, use_irc: bool = True) -> None:
+        self.helix_latency: float = helix_latency
+        self.helix_messages: list[str] = []
+        self.server: FakeIrcServer = FakeIrcServer()
+        self.server.start()
+        self.pipeline: ChatPipeline = ChatPipeline(
+            RateLimiter(RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD), self._send_helix
+        )
+        if use_irc:
+            self.pipeline.irc = IrcChatClient(
+                lambda: ("streamer", "token"), self.server.url
+            )
+            self.pipeline.irc.start()
+            for _ in range(100):
+                if self.pipeline.irc.connected:
+                    break
+                sleep(0.05)
+            else:
+                raise RuntimeError("IRC client did not connect to the fake server")
+        self.latencies: list[float] = []
+        self.futures: list[Future] = []
+        self.rejected: int = 0
+
+    def press(self, text: str, is_moderator: bool = True) -> None:
+        """Sends a message the way a key press does, recording how long it takes."""
+        queued = perf_counter()
+        try:
+            future = self.pipeline.send("1", "streamer", text, is_moderator)
+        except ChatQueueFullError:
+            self.rejected += 1
+            return
+        future.add_done_callback(
+            lambda _: self.latencies.append(perf_counter() - queued)
+        )
+        self.futures.append(future)
+
+    def finish(self, timeout: float) -> None:
+        """Waits for the queued messages, then reports and shuts down."""
+        start = perf_counter()
+        _, not_done = wait(self.futures, timeout)
+        sleep(0.2)
+        stats = self.pipeline.get_stats()
+        self.pipeline.stop()
+        if self.pipeline.irc is not None:
+            self.pipeline.irc.stop()
+        self.server.stop()
+
+        arrivals = [arrived for arrived, _, _ in self.server.messages]
+        irc_seconds = max(arrivals, default=0) - min(arrivals, default=0)
+        delivered = len(arrivals) + len(self.helix_messages)
+        print(
+            f"  presses: {len(self.futures) + self.rejected}, sent {stats['sent']}, "
+            f"merged {stats['merged']}, dropped {stats['dropped']}, "
+            f"retried over Helix {stats['irc_retried']}, failed {stats['failed']}"
+        )
+        # Counted as sent but never received by the fake server or Helix
+        print(
+            f"  received: {len(arrivals)} over IRC, "
+            f"{len(self.helix_messages)} over Helix, "
+            f"{stats['sent'] - delivered} lost, {len(not_done)} still queued "
+            f"after waiting {perf_counter() - start:.1f}s"
+        )
+        if len(arrivals) > 1:
+            print(f"  IRC rate: {(len(arrivals) - 1) / irc_seconds:.1f} messages/s")
+        print(f"  press to sent: {format_latencies(self.latencies)}")
+
+    def _send_helix(self, channel_id: str, text: str) -> None:
+        sleep(self.helix_latency)
+        self.helix_messages.append(text)
+
+
+def flood(args: argparse.Namespace) -> None:
+    """A key mashed as fast as possible, every press a different message."""
+    print(f"flood: {args.messages} messages as fast as possible")
+    bench = ChatBench(args.helix_latency)
+    for n in range(args.messages):
+        bench.press(f"Message {n}")
+    bench.finish(args.timeout)
+
+
+def paced(args: argparse.Namespace) -> None:
+    """Presses at a steady rate, within the moderator chat limit."""
+    print(f"paced: {args.messages} messages at {args.rate}/s")
+    bench = ChatBench(args.helix_latency)
+    for n in range(args.messages):
+        bench.press(f"Message {n}")
+        sleep(1 / args.rate)
+    bench.finish(args.timeout)
+
+
+def duplicates(args: argparse.Namespace) -> None:
+    """The same message pressed over and over."""
+    print(f"duplicates: the same message {args.messages} times at {args.rate}/s")
+    bench = ChatBench(args.helix_latency)
+    for _ in range(args.messages):
+        bench.press("Hype!")
+        sleep(1 / args.rate)
+    bench.finish(args.timeout)
+
+
+def helix(args: argparse.Namespace) -> None:
+    """Paced presses without IRC, every message is a Helix request."""
+    print(
+        f"helix: {args.messages} messages at {args.rate}/s, "
+        f"{args.helix_latency * 1000:.0f}ms per request"
+    )
+    bench = ChatBench(args.helix_latency, use_irc=False)
+    for n in range(args.messages):
+        bench.press(f"Message {n}")
+        sleep(1 / args.rate)
+    bench.finish(args.timeout)
+
+
+def reconnect(args: argparse.Namespace) -> None:
+    """Paced presses while the IRC connection drops halfway through."""
+    print(f"reconnect: {args.messages} messages at {args.rate}/s, IRC dropped halfway")
+    bench = ChatBench(args.helix_latency)
+    for n in range(args.messages):
+        if n == args.messages // 2:
+            bench.server.disconnect_all()
+        bench.press(f"Message {n}")
+        sleep(1 / args.rate)
+    bench.finish(args.timeout)
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "flood": flood,
+    "paced": paced,
+    "duplicates": duplicates,
+    "helix": helix,
+    "reconnect": reconnect,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)}, default: all"
+    )
+    parser.add_argument("--messages", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=20, help="presses per second")
+    parser.add_argument(
+        "--helix-latency", type=float, default=0.1, help="seconds per Helix request"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="seconds to wait for the queue"
+    )
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    set_log_level(args.log_level)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    for name in args.scenarios or SCENARIOS:
+        SCENARIOS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import importlib
+import math
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+from typing import Any, Callable
+
+from loguru import logger as log
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_repo_to_path() -> None:
+    """Makes the backend modules importable, like the backend process does."""
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+
+def import_plugin_module(name: str) -> Any:
+    """Imports a frontend module, which uses imports relative to the plugin package."""
+    parent = os.path.dirname(REPO_DIR)
+    if parent not in sys.path:
+        sys.path.append(parent)
+    return importlib.import_module(f"{os.path.basename(REPO_DIR)}.{name}")
+
+
+def set_log_level(level: str) -> None:
+    log.remove()
+    log.add(sys.stderr, level=level)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank percentile `q` (0 to 1) of `values`, 0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def format_latencies(seconds: list[float], unit: str = "ms") -> str:
+    """Formats the p50, p99 and max of durations in milliseconds or "us"."""
+    scale = 1e6 if unit == "us" else 1e3
+    return (
+        f"p50 {percentile(seconds, 0.5) * scale:.1f}{unit}, "
+        f"p99 {percentile(seconds, 0.99) * scale:.1f}{unit}, "
+        f"max {max(seconds, default=0) * scale:.1f}{unit}"
+    )
+
+
+def run_concurrently(
+    calls: list[Callable[[], Any]],
+) -> tuple[list[float], list[Exception]]:
+    """Runs every call on its own thread, all released at the same moment.
+
+    Returns:
+        The latency of every call in seconds and the exceptions raised
+    """
+    barrier = threading.Barrier(len(calls))
+    latencies: list[float] = []
+    errors: list[Exception] = []
+    lock = threading.Lock()
+
+    def run(call: Callable[[], Any]) -> None:
+        barrier.wait()
+        start = perf_counter()
+        try:
+            call()
+        except Exception as ex:
+            with lock:
+                errors.append(ex)
+        with lock:
+            latencies.append(perf_counter() - start)
+
+    threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+class RecordingFrontend:
+    """Stands in for the frontend, counting the calls the backend makes to it."""
+
+    def __init__(self) -> None:
+        self.calls: Counter[str] = Counter()
+        # Arguments of the last call by name
+        self.last_args: dict[str, tuple[Any, ...]] = {}
+        self.lock: threading.Condition = threading.Condition()
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def record(*args: Any, **kwargs: Any) -> None:
+            with self.lock:
+                self.calls[name] += 1
+                self.last_args[name] = args
+                self.lock.notify_all()
+
+        return record
+
+    def wait_for(self, name: str, check: Callable[..., bool], timeout: float) -> bool:
+        """Waits until the last call to `name` was made with arguments passing `check`.
+
+        Returns:
+            False if no such call was made within `timeout` seconds
+        """
+        with self.lock:
+            return self.lock.wait_for(
+                lambda: name in self.last_args and check(*self.last_args[name]),
+                timeout,
+            )
@@ -0,0 +1,80 @@
+import threading
+from time import monotonic
+
+from mock_ws import WebSocketConnection, WebSocketServer
+
+
+class FakeIrcServer:
+    """Local stand-in for the Twitch IRC over WebSocket endpoint.
+
+    Accepts any login, answers pings and records every chat message with the
+    time it arrived. Joins and messages are confirmed with a USERSTATE, like
+    Twitch does for clients with the commands capability.
+
+    Args:
+        reject_login: Answer logins with the notice Twitch sends for a token
+            without the `chat:edit` scope
+    """
+
+    def __init__(self, reject_login: bool = False) -> None:
+        self.reject_login: bool = reject_login
+        # Arrival time, channel and text of every message
+        self.messages: list[tuple[float, str, str]] = []
+        self.joins: list[str] = []
+        self.logins: int = 0
+        self.condition: threading.Condition = threading.Condition()
+        self.server: WebSocketServer = WebSocketServer(
+            lambda _: None, self._on_message
+        )
+
+    @property
+    def url(self) -> str:
+        return self.server.url
+
+    def start(self) -> None:
+        self.server.start()
+
+    def stop(self) -> None:
+        self.server.stop()
+
+    def disconnect_all(self) -> None:
+        """Drops every connection, like a Twitch server restart does."""
+        with self.server.lock:
+            connections = list(self.server.connections)
+        for connection in connections:
+            connection.close()
+
+    def wait_for_messages(self, count: int, timeout: float) -> bool:
+        """Waits until `count` messages arrived, returns whether they did."""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: len(self.messages) >= count, timeout
+            )
+
+    def _on_message(self, connection: WebSocketConnection, text: str) -> None:
+        for line in text.split("\r\n"):
+            self._handle_line(connection, line)
+
+    def _handle_line(self, connection: WebSocketConnection, line: str) -> None:
+        command, _, params = line.partition(" ")
+        if command == "PING":
+            connection.send(f"PONG {params}")
+        elif command == "CAP":
+            connection.send(f":tmi.twitch.tv CAP * ACK {params.partition(' ')[2]}")
+        elif command == "NICK":
+            if self.reject_login:
+                connection.send(":tmi.twitch.tv NOTICE * :Login authentication failed")
+                return
+            with self.condition:
+                self.logins += 1
+            connection.send(f":tmi.twitch.tv 001 {params} :Welcome, GLHF!")
+        elif command == "JOIN":
+            with self.condition:
+                self.joins.append(params.lstrip("#"))
+            connection.send(f"@mod=0 :tmi.twitch.tv USERSTATE {params}")
+        elif command == "PRIVMSG":
+            channel, _, message = params.partition(" :")
+            with self.condition:
+                self.messages.append((monotonic(), channel.lstrip("#"), message))
+                self.condition.notify_all()
+            connection.send(f"@mod=0 :tmi.twitch.tv USERSTATE {channel}")
@@ -0,0 +1,116 @@
+"""Benchmarks reading the shared stream state over RPyC, the way the frontend does.
+
+The backend runs behind a local RPyC server, authenticated against the mock
+Twitch server with every resource polled once. Each run reports how many
+full state refreshes per second the frontend can make:
+
+- per resource: one call per resource, the returned values are netrefs whose
+  items take further round trips to read
+- snapshot: one `get_state_snapshot` call returning plain JSON
+- unchanged: `get_state_snapshot` with the current version, which returns None
+
+    python bench/ipc.py
+    python bench/ipc.py --refreshes 5000
+"""
+
+import argparse
+import json
+import threading
+from time import perf_counter, sleep
+from typing import Any, Callable
+
+import rpyc
+from rpyc.utils.server import ThreadedServer
+
+from common import format_latencies, set_log_level
+from mock_twitch import MockTwitch
+from scenarios import POLLED_RESOURCES, start_backend, stop_backend
+
+RPYC_CONFIG = {"allow_public_attrs": True, "allow_all_attrs": True}
+
+
+class BackendService(rpyc.Service):
+    """Hands the backend to the connecting frontend, like the plugin connection does."""
+
+    def __init__(self, backend: Any) -> None:
+        super().__init__()
+        self.backend: Any = backend
+
+    def exposed_get_backend(self) -> Any:
+        return self.backend
+
+
+def read_per_resource(backend: Any) -> dict[str, Any]:
+    state: dict[str, Any] = {}
+    for resource in POLLED_RESOURCES:
+        value = backend.poller.get_cached(resource)
+        # Reading a netref item by item, like the actions did
+        if isinstance(value, str) or value is None:
+            state[resource] = value
+        elif hasattr(value, "keys"):
+            state[resource] = {key: value[key] for key in value.keys()}
+        else:
+            state[resource] = [item for item in value]
+    state["authed"] = backend.is_authed()
+    return state
+
+
+def measure(refreshes: int, refresh: Callable[[], Any]) -> None:
+    durations: list[float] = []
+    for _ in range(refreshes):
+        start = perf_counter()
+        refresh()
+        durations.append(perf_counter() - start)
+    print(
+        f"  {len(durations) / sum(durations):.0f} refreshes/s, "
+        f"refresh {format_latencies(durations)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refreshes", type=int, default=1000)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    set_log_level(args.log_level)
+
+    mock = MockTwitch()
+    mock.start()
+    backend = start_backend(mock)
+    for resource in POLLED_RESOURCES:
+        backend.subscribe(resource, "bench")
+    for _ in range(100):
+        if all(backend.poller.get_cached(resource) for resource in POLLED_RESOURCES):
+            break
+        sleep(0.05)
+
+    server = ThreadedServer(
+        BackendService(backend),
+        hostname="127.0.0.1",
+        port=0,
+        protocol_config=RPYC_CONFIG,
+    )
+    threading.Thread(target=server.start, daemon=True, name="rpyc").start()
+    # The server only listens once it is started on its thread
+    while not server.active:
+        sleep(0.01)
+    port = server.listener.getsockname()[1]
+    connection = rpyc.connect("127.0.0.1", port, config=RPYC_CONFIG)
+    remote = connection.root.get_backend()
+
+    print("per resource:")
+    measure(args.refreshes, lambda: read_per_resource(remote))
+    print("snapshot:")
+    measure(args.refreshes, lambda: json.loads(remote.get_state_snapshot(-1)))
+    print("unchanged:")
+    version = json.loads(remote.get_state_snapshot(-1))["version"]
+    measure(args.refreshes, lambda: remote.get_state_snapshot(version))
+
+    connection.close()
+    server.close()
+    stop_backend(backend)
+    mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmarks drawing fast-changing labels onto key images.
+
+Compares the key image renderer with composing the key and laying out the
+label from scratch for every frame, and reports frames per second per key.
+
+    python bench/key_images.py
+    python bench/key_images.py --frames 3600 --size 96
+"""
+
+import argparse
+import os
+from time import perf_counter
+from typing import Any, Callable
+
+from PIL import Image, ImageDraw, ImageFont
+
+from common import REPO_DIR, format_latencies, import_plugin_module
+
+constants = import_plugin_module("constants")
+key_renderer = import_plugin_module("key_renderer")
+
+ICON_PATH = os.path.join(REPO_DIR, "assets", "money.png")
+COLOR = (145, 70, 255, 255)
+
+
+def render_from_scratch(icon: Image.Image, color: tuple[int, ...], text: str) -> Any:
+    """Composes the key and lays out the label for every frame."""
+    size = max(int(icon.height * constants.KEY_LABEL_FONT_SCALE), 1)
+    try:
+        font = ImageFont.load_default(size)
+    except TypeError:
+        font = ImageFont.load_default()
+    image = Image.new("RGBA", icon.size, color)
+    image.alpha_composite(icon.convert("RGBA"))
+    ImageDraw.Draw(image).text(
+        (icon.width / 2, icon.height / 2),
+        text,
+        font=font,
+        anchor="mm",
+        fill=(255, 255, 255, 255),
+        stroke_width=constants.KEY_LABEL_STROKE_WIDTH,
+        stroke_fill=(0, 0, 0, 255),
+    )
+    return image
+
+
+def countdown(frames: int) -> list[str]:
+    """Returns the labels of a countdown ticking once per frame."""
+    return [f"{(frames - n) // 60}:{(frames - n) % 60:02}" for n in range(frames)]
+
+
+def measure(frames: list[Any], draw: Callable[[Any], Any]) -> None:
+    durations: list[float] = []
+    for frame in frames:
+        start = perf_counter()
+        draw(frame)
+        durations.append(perf_counter() - start)
+    print(
+        f"  {len(frames) / sum(durations):.0f} frames/s, "
+        f"frame {format_latencies(durations, 'us')}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--size", type=int, default=72, help="key size in pixels")
+    args = parser.parse_args()
+
+    icon = Image.open(ICON_PATH).convert("RGBA").resize((args.size, args.size))
+    labels = countdown(args.frames)
+
+    print("from scratch: countdown")
+    measure(labels, lambda text: render_from_scratch(icon, COLOR, text))
+
+    renderer = key_renderer.KeyImageRenderer()
+    print("renderer: countdown, every label new")
+    measure(labels, lambda text: renderer.render(icon, COLOR, text))
+    print("renderer: the same labels again")
+    # The labels still in the cache
+    repeated = labels[-renderer.cache_size :]
+    measure(repeated, lambda text: renderer.render(icon, COLOR, text))
+
+    renderer = key_renderer.KeyImageRenderer()
+    print("renderer: viewer count with a sparkline")
+    samples = [
+        (str(1000 + n % 50), tuple(range(n, n + 60))) for n in range(args.frames)
+    ]
+    measure(samples, lambda sample: renderer.render(icon, COLOR, *sample))
+    print(f"  cache: {renderer.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
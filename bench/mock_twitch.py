@@ -0,0 +1,594 @@
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from time import monotonic, sleep, time
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+from mock_ws import WebSocketConnection, WebSocketServer
+
+
+@dataclass
+class _Token:
+    login: str
+    user_id: str
+    revoked: bool = False
+
+
+class MockTwitch:
+    """Local mock of the Twitch Helix, OAuth and EventSub endpoints used by the plugin.
+
+    Authorization codes are accepted as the login of the account they
+    authorize, so `auth_with_code(..., "streamer")` logs in as "streamer".
+    Every account has its own Helix rate limit window, reported through the
+    `Ratelimit-*` headers like Twitch does, and is answered with 429 once the
+    window is used up.
+
+    Args:
+        latency: Seconds every request takes before it is answered
+        jitter: Up to this many seconds are added to the latency at random
+        rate_limit: Helix requests allowed per account and window
+        rate_period: Length of the rate limit window in seconds
+        clip_delay: Seconds until a created clip is processed
+        keepalive: Seconds between EventSub keepalive messages
+        tls: Serve Helix and OAuth over HTTPS with a throwaway self-signed
+            certificate, see `certificate`. Needs the openssl command.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: int = 800,
+        rate_period: float = 60,
+        clip_delay: float = 2.0,
+        keepalive: int = 10,
+        tls: bool = False,
+    ) -> None:
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.rate_limit: int = rate_limit
+        self.rate_period: float = rate_period
+        self.clip_delay: float = clip_delay
+        self.keepalive: int = keepalive
+        self.live: bool = True
+        self.viewers: int = 42
+        self.started_at: str = _now()
+        self.next_ad_at: int = int(time()) + 1800
+        self.lock: threading.Lock = threading.Lock()
+        self.ids: count = count(1000)
+        self.tokens: dict[str, _Token] = {}
+        self.refresh_tokens: dict[str, str] = {}
+        self.user_ids: dict[str, str] = {}
+        # Remaining requests and the Unix time the window resets, by user ID
+        self.windows: dict[str, tuple[int, float]] = {}
+        # Statuses the next Helix requests are answered with
+        self.failures: deque[int] = deque()
+        self.chat_settings: dict[str, dict[str, Any]] = {}
+        # Monotonic time each clip is processed at, by clip ID
+        self.clips: dict[str, float] = {}
+        self.requests: Counter[str] = Counter()
+        self.statuses: Counter[int] = Counter()
+        self.httpd: _MockServer = _MockServer(("127.0.0.1", 0), _make_handler(self))
+        # Path of the certificate clients have to trust, None without TLS
+        self.certificate: Optional[str] = None
+        self.certificate_dir: Optional[tempfile.TemporaryDirectory] = None
+        if tls:
+            self._enable_tls()
+        self.eventsub: WebSocketServer = WebSocketServer(
+            self._on_eventsub_connect, lambda *_: None
+        )
+        self.running: bool = False
+
+    @property
+    def helix_url(self) -> str:
+        return f"{self._base_url}/helix"
+
+    @property
+    def oauth_url(self) -> str:
+        return f"{self._base_url}/oauth2"
+
+    @property
+    def _base_url(self) -> str:
+        scheme = "https" if self.certificate else "http"
+        return f"{scheme}://127.0.0.1:{self.httpd.server_port}"
+
+    @property
+    def eventsub_url(self) -> str:
+        return self.eventsub.url
+
+    def start(self) -> None:
+        self.running = True
+        threading.Thread(
+            target=self.httpd.serve_forever, daemon=True, name="mock_twitch"
+        ).start()
+        self.eventsub.start()
+        threading.Thread(
+            target=self._send_keepalives, daemon=True, name="mock_keepalive"
+        ).start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.eventsub.stop()
+        if self.certificate_dir is not None:
+            self.certificate_dir.cleanup()
+
+    def revoke_tokens(self) -> None:
+        """Rejects all access tokens issued so far, like a password change does."""
+        with self.lock:
+            for token in self.tokens.values():
+                token.revoked = True
+
+    def fail_next(self, status: int, times: int = 1) -> None:
+        """Answers the next `times` Helix requests with `status`, e.g. 429 or 500."""
+        with self.lock:
+            self.failures.extend([status] * times)
+
+    def push_event(self, subscription_type: str, event: dict[str, Any]) -> None:
+        """Sends an EventSub notification to every connected session."""
+        self.eventsub.broadcast(
+            json.dumps(
+                {
+                    "metadata": {
+                        "message_type": "notification",
+                        "subscription_type": subscription_type,
+                        "message_timestamp": datetime.now(timezone.utc).isoformat(),
+                    },
+                    "payload": {"event": event},
+                }
+            )
+        )
+
+    def set_chat_settings(self, broadcaster_id: str, **settings: Any) -> None:
+        """Changes chat settings, like a moderator would, and pushes the change."""
+        with self.lock:
+            current = self._chat_settings(broadcaster_id)
+            current.update(settings)
+            event = {
+                "broadcaster_user_id": broadcaster_id,
+                "emote_mode": current["emote_mode"],
+                "follower_mode": current["follower_mode"],
+                "follower_mode_duration_minutes": current["follower_mode_duration"],
+                "slow_mode": current["slow_mode"],
+                "slow_mode_wait_time_seconds": current["slow_mode_wait_time"],
+                "subscriber_mode": current["subscriber_mode"],
+            }
+        self.push_event("channel.chat_settings.update", event)
+
+    def start_ad_break(self, broadcaster_id: str, length: int = 60) -> int:
+        """Starts an ad break and pushes it.
+
+        Returns:
+            The Unix time of the ad after this one
+        """
+        with self.lock:
+            # Past the previous one, so every break changes the schedule
+            self.next_ad_at = max(self.next_ad_at, int(time())) + 1800
+            next_ad_at = self.next_ad_at
+        self.push_event(
+            "channel.ad_break.begin",
+            {
+                "broadcaster_user_id": broadcaster_id,
+                "duration_seconds": length,
+                "started_at": _now(),
+                "is_automatic": False,
+            },
+        )
+        return next_ad_at
+
+    def set_live(self, broadcaster_id: str, live: bool) -> None:
+        """Starts or ends the stream and pushes the change."""
+        with self.lock:
+            self.live = live
+            if live:
+                self.started_at = _now()
+        event: dict[str, Any] = {"broadcaster_user_id": broadcaster_id}
+        if live:
+            event.update(type="live", started_at=self.started_at)
+        self.push_event("stream.online" if live else "stream.offline", event)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Returns the number of requests by endpoint and by response status."""
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "total": sum(self.requests.values()),
+            }
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.requests.clear()
+            self.statuses.clear()
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        headers: Any,
+        body: bytes,
+    ) -> tuple[int, dict[str, str], Optional[dict[str, Any]]]:
+        """Answers one request with its status, extra headers and JSON body."""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            sleep(delay)
+        if path.startswith("/oauth2/"):
+            status, response_headers, response = self._oauth(
+                method, path[len("/oauth2") :], query, headers, body
+            )
+        elif path.startswith("/helix/"):
+            status, response_headers, response = self._helix(
+                method, path[len("/helix") :], query, headers, body
+            )
+        else:
+            status, response_headers, response = _error(404, "Not Found")
+        with self.lock:
+            self.requests[f"{method} {path}"] += 1
+            self.statuses[status] += 1
+        return status, response_headers, response
+
+    # OAuth
+
+    def _oauth(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        headers: Any,
+        body: bytes,
+    ) -> tuple[int, dict[str, str], Optional[dict[str, Any]]]:
+        if path == "/authorize":
+            if not _first(query, "client_id"):
+                return _error(400, "invalid client")
+            # Valid requests are sent on to the login page
+            return 302, {"Location": "/oauth2/login"}, None
+        if path == "/login":
+            return 200, {}, {}
+        if path == "/token" and method == "POST":
+            form = parse_qs(body.decode())
+            if _first(form, "grant_type") == "refresh_token":
+                with self.lock:
+                    login = self.refresh_tokens.pop(_first(form, "refresh_token"), None)
+                if login is None:
+                    return _error(400, "Invalid refresh token")
+            else:
+                login = _first(form, "code")
+                if not login:
+                    return _error(400, "Invalid authorization code")
+            return 200, {}, self._issue_tokens(login)
+        if path == "/validate":
+            token = self._get_token(headers.get("Authorization", ""), "OAuth ")
+            if token is None:
+                return _error(401, "invalid access token")
+            return (
+                200,
+                {},
+                {
+                    "client_id": "mock",
+                    "login": token.login,
+                    "user_id": token.user_id,
+                    "scopes": [],
+                    "expires_in": 14400,
+                },
+            )
+        return _error(404, "Not Found")
+
+    def _issue_tokens(self, login: str) -> dict[str, Any]:
+        with self.lock:
+            number = next(self.ids)
+            access_token = f"access-{number}"
+            refresh_token = f"refresh-{number}"
+            self.tokens[access_token] = _Token(login, self._user_id(login))
+            self.refresh_tokens[refresh_token] = login
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": 14400,
+            "token_type": "bearer",
+        }
+
+    def _get_token(self, authorization: str, prefix: str) -> Optional[_Token]:
+        with self.lock:
+            token = self.tokens.get(authorization.removeprefix(prefix))
+        if token is None or token.revoked:
+            return None
+        return token
+
+    def _user_id(self, login: str) -> str:
+        """Returns the stable user ID of a login, must be called with the lock held."""
+        login = login.lower()
+        if login not in self.user_ids:
+            self.user_ids[login] = str(next(self.ids))
+        return self.user_ids[login]
+
+    # Helix
+
+    def _helix(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        headers: Any,
+        body: bytes,
+    ) -> tuple[int, dict[str, str], Optional[dict[str, Any]]]:
+        token = self._get_token(headers.get("Authorization", ""), "Bearer ")
+        if token is None:
+            return _error(401, "Invalid OAuth token")
+        with self.lock:
+            failure = self.failures.popleft() if self.failures else None
+            remaining, reset_at = self.windows.get(token.user_id, (0, 0.0))
+            now = time()
+            if now >= reset_at:
+                remaining, reset_at = self.rate_limit, now + self.rate_period
+            limited = failure == 429 or remaining == 0
+            if failure == 429:
+                remaining = 0
+            elif not limited:
+                remaining -= 1
+            self.windows[token.user_id] = (remaining, reset_at)
+        rate_headers = {
+            "Ratelimit-Limit": str(self.rate_limit),
+            "Ratelimit-Remaining": str(remaining),
+            "Ratelimit-Reset": str(int(reset_at)),
+        }
+        if limited:
+            status, _, response = _error(429, "Too Many Requests")
+        elif failure is not None:
+            status, _, response = _error(failure, "Injected failure")
+        else:
+            data = json.loads(body) if body else {}
+            status, response = self._route(method, path, query, data, token)
+        return status, rate_headers, response
+
+    def _route(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        data: dict[str, Any],
+        token: _Token,
+    ) -> tuple[int, Optional[dict[str, Any]]]:
+        route = f"{method} {path}"
+        if route == "GET /users":
+            with self.lock:
+                logins = query.get("login", [])
+                users = [
+                    {"id": self._user_id(login), "login": login} for login in logins
+                ]
+                users += [
+                    {"id": user_id, "login": login}
+                    for login, user_id in self.user_ids.items()
+                    if user_id in query.get("id", [])
+                ]
+            return 200, {"data": users}
+        if route == "GET /streams":
+            if not self.live:
+                return 200, {"data": []}
+            stream = {
+                "user_id": _first(query, "user_id"),
+                "viewer_count": self.viewers,
+                "started_at": self.started_at,
+            }
+            return 200, {"data": [stream]}
+        if path == "/chat/settings" and method in ("GET", "PATCH"):
+            broadcaster_id = _first(query, "broadcaster_id")
+            with self.lock:
+                settings = self._chat_settings(broadcaster_id)
+                if method == "PATCH":
+                    settings.update(data)
+                settings = dict(settings)
+            return 200, {"data": [settings]}
+        if route == "POST /chat/messages":
+            return 200, {"data": [{"message_id": str(next(self.ids)), "is_sent": True}]}
+        if route == "POST /chat/shoutouts":
+            return 204, None
+        if route == "POST /clips":
+            clip_id = f"clip-{next(self.ids)}"
+            with self.lock:
+                self.clips[clip_id] = monotonic() + self.clip_delay
+            edit_url = f"https://clips.twitch.tv/{clip_id}/edit"
+            return 202, {"data": [{"id": clip_id, "edit_url": edit_url}]}
+        if route == "GET /clips":
+            now = monotonic()
+            with self.lock:
+                ready = [
+                    clip_id
+                    for clip_id in query.get("id", [])
+                    if self.clips.get(clip_id, now + 1) <= now
+                ]
+            return 200, {
+                "data": [
+                    {"id": clip_id, "url": f"https://clips.twitch.tv/{clip_id}"}
+                    for clip_id in ready
+                ]
+            }
+        if route == "POST /streams/markers":
+            return 200, {"data": [{"id": str(next(self.ids)), "position_seconds": 60}]}
+        if route == "POST /channels/commercial":
+            commercial = {"length": data.get("length"), "message": ""}
+            return 200, {"data": [{**commercial, "retry_after": 480}]}
+        if route == "GET /channels/ads":
+            return 200, {"data": [self._ad_schedule()]}
+        if route == "POST /channels/ads/schedule/snooze":
+            return 200, {"data": [self._ad_schedule()]}
+        if route == "POST /eventsub/subscriptions":
+            subscription = {
+                "id": str(next(self.ids)),
+                "status": "enabled",
+                "type": data.get("type"),
+                "condition": data.get("condition"),
+            }
+            return 202, {"data": [subscription]}
+        return 404, {"error": "Not Found", "status": 404, "message": "Not Found"}
+
+    def _chat_settings(self, broadcaster_id: str) -> dict[str, Any]:
+        """Returns the chat settings of a channel, must be called with the lock held."""
+        return self.chat_settings.setdefault(
+            broadcaster_id,
+            {
+                "broadcaster_id": broadcaster_id,
+                "emote_mode": False,
+                "follower_mode": False,
+                "follower_mode_duration": None,
+                "slow_mode": False,
+                "slow_mode_wait_time": None,
+                "subscriber_mode": False,
+            },
+        )
+
+    def _ad_schedule(self) -> dict[str, Any]:
+        with self.lock:
+            next_ad_at = self.next_ad_at
+        return {
+            "next_ad_at": next_ad_at,
+            "last_ad_at": next_ad_at - 3600,
+            "duration": 60,
+            "preroll_free_time": 0,
+            "snooze_count": 3,
+            "snooze_refresh_at": int(time()) + 3600,
+        }
+
+    # EventSub
+
+    def _on_eventsub_connect(self, connection: WebSocketConnection) -> None:
+        connection.send(
+            json.dumps(
+                {
+                    "metadata": {"message_type": "session_welcome"},
+                    "payload": {
+                        "session": {
+                            "id": f"session-{next(self.ids)}",
+                            "keepalive_timeout_seconds": self.keepalive,
+                        }
+                    },
+                }
+            )
+        )
+
+    def _enable_tls(self) -> None:
+        if shutil.which("openssl") is None:
+            raise RuntimeError("Serving over TLS needs the openssl command")
+        self.certificate_dir = tempfile.TemporaryDirectory()
+        certificate = os.path.join(self.certificate_dir.name, "cert.pem")
+        key = os.path.join(self.certificate_dir.name, "key.pem")
+        subprocess.run(
+            [
+                "openssl",
+                "req",
+                "-x509",
+                "-newkey",
+                "ec",
+                "-pkeyopt",
+                "ec_paramgen_curve:prime256v1",
+                "-nodes",
+                "-days",
+                "1",
+                "-subj",
+                "/CN=127.0.0.1",
+                "-addext",
+                "subjectAltName=IP:127.0.0.1",
+                "-keyout",
+                key,
+                "-out",
+                certificate,
+            ],
+            check=True,
+            capture_output=True,
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certificate, key)
+        self.httpd.ssl_context = context
+        self.certificate = certificate
+
+    def _send_keepalives(self) -> None:
+        message = json.dumps({"metadata": {"message_type": "session_keepalive"}})
+        while self.running:
+            sleep(self.keepalive)
+            self.eventsub.broadcast(message)
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections of a burst, which then retry
+    # after a second
+    request_queue_size = 128
+    ssl_context: Optional[ssl.SSLContext] = None
+
+    def finish_request(self, request: Any, client_address: Any) -> None:
+        if self.ssl_context is not None:
+            # The handshake runs on the connection's thread, not the one accepting
+            try:
+                request = self.ssl_context.wrap_socket(request, server_side=True)
+            except (ssl.SSLError, OSError):
+                return
+            with request:
+                super().finish_request(request, client_address)
+            return
+        super().finish_request(request, client_address)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _first(values: dict[str, list[str]], name: str) -> str:
+    return values.get(name, [""])[0]
+
+
+def _error(
+    status: int, message: str
+) -> tuple[int, dict[str, str], Optional[dict[str, Any]]]:
+    return status, {}, {"error": message, "status": status, "message": message}
+
+
+def _make_handler(mock: MockTwitch) -> type[BaseHTTPRequestHandler]:
+    class MockTwitchHandler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real endpoints
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, without this every response
+        # on a kept alive connection waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            self._handle("GET")
+
+        def do_POST(self) -> None:
+            self._handle("POST")
+
+        def do_PATCH(self) -> None:
+            self._handle("PATCH")
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _handle(self, method: str) -> None:
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            status, headers, response = mock.handle(
+                method, url.path, parse_qs(url.query), self.headers, body
+            )
+            data = json.dumps(response).encode() if response is not None else b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if data:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return MockTwitchHandler
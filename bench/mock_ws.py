@@ -0,0 +1,193 @@
+import base64
+import hashlib
+import socket
+import struct
+import threading
+from typing import Callable, Optional
+
+from loguru import logger as log
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OPCODE_TEXT = 0x1
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+
+class WebSocketConnection:
+    """Server side of one WebSocket connection, text frames only."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock: socket.socket = sock
+        self.lock: threading.Lock = threading.Lock()
+        self.closed: threading.Event = threading.Event()
+
+    def send(self, text: str) -> None:
+        self._send_frame(_OPCODE_TEXT, text.encode())
+
+    def close(self) -> None:
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        try:
+            self._send_frame(_OPCODE_CLOSE, b"")
+        except OSError:
+            pass
+        self.sock.close()
+
+    def recv(self) -> Optional[str]:
+        """Returns the next text message, or None once the connection is closed."""
+        while True:
+            header = self._read(2)
+            if header is None:
+                return None
+            opcode = header[0] & 0x0F
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._read(2) or b"\0\0")[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read(8) or bytes(8))[0]
+            # Clients always mask their frames
+            mask = self._read(4) if header[1] & 0x80 else bytes(4)
+            payload = self._read(length) if length else b""
+            if mask is None or payload is None:
+                return None
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+            if opcode == _OPCODE_CLOSE:
+                return None
+            if opcode == _OPCODE_PING:
+                self._send_frame(_OPCODE_PONG, data)
+            elif opcode == _OPCODE_TEXT:
+                return data.decode()
+
+    def _read(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            try:
+                chunk = self.sock.recv(size - len(data))
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack("!Q", len(payload))
+        with self.lock:
+            self.sock.sendall(header + payload)
+
+
+class WebSocketServer:
+    """Minimal local WebSocket server for the mock Twitch endpoints.
+
+    Every connection is served by its own thread.
+
+    Args:
+        on_connect: Called with each new connection once the handshake is done
+        on_message: Called with the connection and every text message it sends
+        on_close: Called with each connection once it is closed
+    """
+
+    def __init__(
+        self,
+        on_connect: Callable[[WebSocketConnection], None],
+        on_message: Callable[[WebSocketConnection, str], None],
+        on_close: Optional[Callable[[WebSocketConnection], None]] = None,
+    ) -> None:
+        self.on_connect: Callable[[WebSocketConnection], None] = on_connect
+        self.on_message: Callable[[WebSocketConnection, str], None] = on_message
+        self.on_close: Optional[Callable[[WebSocketConnection], None]] = on_close
+        self.sock: socket.socket = socket.create_server(("127.0.0.1", 0))
+        self.connections: set[WebSocketConnection] = set()
+        self.lock: threading.Lock = threading.Lock()
+        self.running: bool = False
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.sock.getsockname()[1]}"
+
+    def start(self) -> None:
+        self.running = True
+        threading.Thread(target=self._accept, daemon=True, name="mock_ws").start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.sock.close()
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+
+    def broadcast(self, text: str) -> None:
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.send(text)
+            except OSError:
+                pass
+
+    def _accept(self) -> None:
+        while self.running:
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(sock,), daemon=True, name="mock_ws_conn"
+            ).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        try:
+            self._handshake(sock)
+        except (OSError, ValueError) as ex:
+            log.warning(f"Mock WebSocket handshake failed: {ex}")
+            sock.close()
+            return
+        connection = WebSocketConnection(sock)
+        with self.lock:
+            self.connections.add(connection)
+        try:
+            self.on_connect(connection)
+            while True:
+                message = connection.recv()
+                if message is None:
+                    break
+                self.on_message(connection, message)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.connections.discard(connection)
+            connection.close()
+            if self.on_close:
+                self.on_close(connection)
+
+    def _handshake(self, sock: socket.socket) -> None:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ValueError("Connection closed during the handshake")
+            request += chunk
+        key = ""
+        for line in request.decode().split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if not key:
+            raise ValueError("Missing Sec-WebSocket-Key header")
+        accept = base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest())
+        sock.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
@@ -0,0 +1,239 @@
+"""Benchmarks the rate limiter under thousands of concurrent calls from threads.
+
+Every thread makes its calls back to back, all threads start at once. Each
+run reports the throughput and how long calls waited before they could run:
+
+- legacy: the original sliding window decorator, which slept while holding
+  its lock
+- limiter: `RateLimiter.try_acquire`, each thread sleeping for the wait it
+  returns
+- dispatcher: `RequestDispatcher`, the path every Helix request takes
+- endpoint: the dispatcher while one thread keeps hitting an endpoint bucket
+  with a much lower limit, e.g. clips. Only reports the waits, the run lasts
+  as long as that thread is throttled.
+
+    python bench/rate_limiter.py
+    python bench/rate_limiter.py dispatcher --threads 100 --limit 5000
+"""
+
+import argparse
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from time import perf_counter, sleep
+from typing import Any, Callable
+
+from common import add_repo_to_path, format_latencies, set_log_level
+
+add_repo_to_path()
+
+from event_loop import EventLoopThread  # noqa: E402
+from twitch_backend import Priority, RateLimiter, RequestDispatcher  # noqa: E402
+
+ENDPOINT_BUCKET = "endpoint"
+
+
+class LegacyRateLimiter:
+    """The sliding window decorator the plugin used before the token buckets."""
+
+    def __init__(self, max_calls: int, period: float) -> None:
+        self.max_calls: int = max_calls
+        self.period: float = period
+        self.calls: deque[datetime] = deque()
+        self.lock: threading.Lock = threading.Lock()
+
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with self.lock:
+                now = datetime.now()
+                while (
+                    self.calls and (now - self.calls[0]).total_seconds() > self.period
+                ):
+                    self.calls.popleft()
+                if len(self.calls) >= self.max_calls:
+                    wait_time = self.period - (now - self.calls[0]).total_seconds()
+                    if wait_time > 0:
+                        sleep(wait_time)
+                        now = datetime.now()
+                        while (
+                            self.calls
+                            and (now - self.calls[0]).total_seconds() > self.period
+                        ):
+                            self.calls.popleft()
+                self.calls.append(datetime.now())
+            return func(*args, **kwargs)
+
+        return wrapper
+
+
+def run_threads(
+    threads: int, calls: int, call: Callable[[int], float]
+) -> tuple[float, list[float]]:
+    """Runs `calls` calls on each of `threads` threads.
+
+    Args:
+        call: Makes one call for the given thread number and returns how
+            long it waited
+
+    Returns:
+        The total time in seconds and the wait of every call
+    """
+    barrier = threading.Barrier(threads + 1)
+    waits: list[float] = []
+    lock = threading.Lock()
+
+    def run(thread: int) -> None:
+        barrier.wait()
+        thread_waits = [call(thread) for _ in range(calls)]
+        with lock:
+            waits.extend(thread_waits)
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = perf_counter()
+    for worker in workers:
+        worker.join()
+    return perf_counter() - start, waits
+
+
+def report(elapsed: float, waits: list[float]) -> None:
+    print(
+        f"  {len(waits)} calls in {elapsed:.2f}s ({len(waits) / elapsed:.0f}/s), "
+        f"wait {format_latencies(waits)}"
+    )
+
+
+def legacy(args: argparse.Namespace) -> None:
+    print("legacy:")
+    limiter = LegacyRateLimiter(args.limit, args.period)
+
+    @limiter
+    def work(queued: float) -> float:
+        waited = perf_counter() - queued
+        sleep(args.work)
+        return waited
+
+    report(*run_threads(args.threads, args.calls, lambda _: work(perf_counter())))
+
+
+def limiter(args: argparse.Namespace) -> None:
+    print("limiter:")
+    rate_limiter = RateLimiter(args.limit, args.period)
+
+    def call(_: int) -> float:
+        queued = perf_counter()
+        while (wait := rate_limiter.try_acquire()) > 0:
+            sleep(wait)
+        waited = perf_counter() - queued
+        sleep(args.work)
+        rate_limiter.release()
+        return waited
+
+    report(*run_threads(args.threads, args.calls, call))
+
+
+def dispatcher(args: argparse.Namespace) -> None:
+    print("dispatcher:")
+    loop = EventLoopThread()
+    request_dispatcher = RequestDispatcher(RateLimiter(args.limit, args.period), loop)
+    try:
+        report(
+            *run_threads(
+                args.threads, args.calls, lambda _: _dispatch(args, request_dispatcher)
+            )
+        )
+    finally:
+        _stop(request_dispatcher, loop)
+
+
+def endpoint(args: argparse.Namespace) -> None:
+    endpoint_limit = max(args.limit // 100, 1)
+    print(f"endpoint: thread 0 limited to {endpoint_limit} calls per {args.period}s")
+    loop = EventLoopThread()
+    rate_limiter = RateLimiter(args.limit, args.period)
+    rate_limiter.add_bucket(ENDPOINT_BUCKET, endpoint_limit, args.period)
+    request_dispatcher = RequestDispatcher(rate_limiter, loop)
+    endpoint_waits: list[float] = []
+    other_waits: list[float] = []
+
+    def call(thread: int) -> float:
+        if thread == 0:
+            waits = endpoint_waits
+            waited = _dispatch(args, request_dispatcher, ENDPOINT_BUCKET)
+        else:
+            waits = other_waits
+            waited = _dispatch(args, request_dispatcher)
+        waits.append(waited)
+        return waited
+
+    try:
+        run_threads(args.threads, args.calls, call)
+    finally:
+        _stop(request_dispatcher, loop)
+    print(f"  endpoint calls: wait {format_latencies(endpoint_waits)}")
+    print(f"  other calls: wait {format_latencies(other_waits)}")
+
+
+def _dispatch(
+    args: argparse.Namespace, request_dispatcher: RequestDispatcher, bucket: Any = None
+) -> float:
+    queued = perf_counter()
+
+    async def work() -> float:
+        waited = perf_counter() - queued
+        await asyncio.sleep(args.work)
+        return waited
+
+    return request_dispatcher.call(Priority.INTERACTIVE, work, bucket)
+
+
+def _stop(request_dispatcher: RequestDispatcher, loop: EventLoopThread) -> None:
+    request_dispatcher.stop()
+    # Let the scheduler see the stop before the loop goes away
+    request_dispatcher.scheduler.result(timeout=5)
+    loop.stop()
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "legacy": legacy,
+    "limiter": limiter,
+    "dispatcher": dispatcher,
+    "endpoint": endpoint,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)}, default: all"
+    )
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=100, help="calls per thread")
+    parser.add_argument(
+        "--limit", type=int, default=2000, help="calls allowed per period"
+    )
+    parser.add_argument("--period", type=float, default=1, help="seconds")
+    parser.add_argument(
+        "--work", type=float, default=0.001, help="seconds every call takes"
+    )
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    set_log_level(args.log_level)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    print(
+        f"{args.threads} threads x {args.calls} calls, "
+        f"{args.limit} calls per {args.period}s allowed"
+    )
+    for name in args.scenarios or SCENARIOS:
+        SCENARIOS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""Scenario benchmarks of the backend against a local mock of the Twitch API.
+
+The backend is created without a frontend connection and driven directly,
+the way the keys drive it through RPyC. Each scenario reports the requests
+that reached the mock server, their throughput and the latency seen by the
+callers.
+
+    python bench/scenarios.py                        # all scenarios, short runs
+    python bench/scenarios.py polling --duration 3600
+    python bench/scenarios.py burst --presses 50 --latency 0.05
+    python bench/scenarios.py events --no-eventsub  # slow, waits for the polls
+"""
+
+import argparse
+import json
+import random
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable
+
+try:
+    # Only used to compare with the HTTP client the plugin used before
+    import requests
+except ImportError:
+    requests = None
+
+from common import (
+    RecordingFrontend,
+    add_repo_to_path,
+    format_latencies,
+    run_concurrently,
+    set_log_level,
+)
+from mock_twitch import MockTwitch
+
+add_repo_to_path()
+
+from constants import (  # noqa: E402
+    AD_SCHEDULE_FETCH_INTERVAL_SECONDS,
+    CHAT_MODE_UPDATE_INTERVAL_SECONDS,
+    POLL_IDLE_MAX_MULTIPLIER,
+    POLL_OFFLINE_MULTIPLIER,
+    RESOURCE_AD_SCHEDULE,
+    RESOURCE_CHAT_SETTINGS,
+    RESOURCE_VIEWERS,
+    VIEWER_UPDATE_INTERVAL_SECONDS,
+)
+from helix import HelixClient, _ssl_context  # noqa: E402
+from twitch_backend import Backend  # noqa: E402
+
+# Port nothing listens on, so EventSub never connects
+UNREACHABLE_EVENTSUB_URL = "ws://127.0.0.1:9"
+
+POLLED_RESOURCES = {
+    RESOURCE_VIEWERS: VIEWER_UPDATE_INTERVAL_SECONDS,
+    RESOURCE_CHAT_SETTINGS: CHAT_MODE_UPDATE_INTERVAL_SECONDS,
+    RESOURCE_AD_SCHEDULE: AD_SCHEDULE_FETCH_INTERVAL_SECONDS,
+}
+
+# Longest a pushed change may take to reach the frontend
+PUSH_TIMEOUT_SECONDS = 10
+
+
+def start_backend(mock: MockTwitch, eventsub: bool = True) -> Backend:
+    """Creates a backend authenticated against `mock` as the account "streamer"."""
+    backend = Backend(connect=False)
+    backend.frontend = RecordingFrontend()
+    backend.set_endpoints(
+        mock.helix_url,
+        mock.oauth_url,
+        mock.eventsub_url if eventsub else UNREACHABLE_EVENTSUB_URL,
+    )
+    backend.auth_with_code("mock-client", "mock-secret", "streamer")
+    if not backend.is_authed():
+        raise RuntimeError("Backend failed to authenticate against the mock server")
+    return backend
+
+
+def stop_backend(backend: Backend) -> None:
+    backend.stop()
+    backend.loop.stop()
+
+
+def report_requests(mock: MockTwitch, seconds: float) -> None:
+    stats = mock.get_stats()
+    print(
+        f"  requests: {stats['total']} in {seconds:.1f}s "
+        f"({stats['total'] / seconds:.1f}/s)"
+    )
+    for endpoint, requests in sorted(stats["requests"].items()):
+        print(f"    {endpoint}: {requests}")
+    print(f"  statuses: {dict(sorted(stats['statuses'].items()))}")
+
+
+def polling(args: argparse.Namespace) -> None:
+    """Keys showing stream state, each subscribed to one of the polled resources."""
+    print(
+        f"polling: {args.keys} keys for {args.duration:.0f}s, "
+        f"EventSub {'on' if args.eventsub else 'off'}"
+    )
+    mock = MockTwitch(latency=args.latency, jitter=args.jitter)
+    mock.start()
+    backend = start_backend(mock, args.eventsub)
+    # Give EventSub time to take over before counting
+    sleep(1)
+    mock.reset_stats()
+
+    resources = list(POLLED_RESOURCES)
+    for key in range(args.keys):
+        backend.subscribe(resources[key % len(resources)], f"key-{key}")
+    start = monotonic()
+    while monotonic() - start < args.duration:
+        sleep(1)
+        mock.viewers = max(mock.viewers + random.randint(-2, 2), 0)
+    elapsed = monotonic() - start
+
+    # What the keys would request if each polled on its own
+    independent = sum(
+        elapsed / POLLED_RESOURCES[resources[key % len(resources)]]
+        for key in range(args.keys)
+    )
+    total = mock.get_stats()["total"]
+    report_requests(mock, elapsed)
+    print(f"  per hour: {total * 3600 / elapsed:.0f} requests")
+    print(f"  independent polling would make: {independent:.0f} requests")
+    print(f"  polls saved by sharing: {backend.get_calls_saved()}")
+    print(f"  snapshots pushed: {backend.frontend.calls['on_state_snapshot']}")
+    stop_backend(backend)
+    mock.stop()
+
+
+def burst(args: argparse.Namespace) -> None:
+    """Presses of different keys arriving at the same moment."""
+    print(f"burst: {args.presses} presses, {args.latency * 1000:.0f}ms latency")
+    mock = MockTwitch(latency=args.latency, jitter=args.jitter)
+    mock.start()
+    backend = start_backend(mock)
+    mock.reset_stats()
+    _run_presses(backend, mock, args.presses)
+    stop_backend(backend)
+    mock.stop()
+
+
+def throttled(args: argparse.Namespace) -> None:
+    """A burst against a rate limit window that cannot fit all presses."""
+    rate_limit = max(args.presses // 2, 1)
+    print(f"throttled: {args.presses} presses, {rate_limit} requests allowed per 10s")
+    mock = MockTwitch(
+        latency=args.latency, jitter=args.jitter, rate_limit=rate_limit, rate_period=10
+    )
+    mock.start()
+    backend = start_backend(mock)
+    mock.reset_stats()
+    _run_presses(backend, mock, args.presses)
+    stop_backend(backend)
+    mock.stop()
+
+
+def revoked(args: argparse.Namespace) -> None:
+    """A burst right after the access token was revoked."""
+    print(f"revoked: {args.presses} presses with a revoked token")
+    mock = MockTwitch(latency=args.latency, jitter=args.jitter)
+    mock.start()
+    backend = start_backend(mock)
+    mock.revoke_tokens()
+    mock.reset_stats()
+    _run_presses(backend, mock, args.presses)
+    stop_backend(backend)
+    mock.stop()
+
+
+def latency(args: argparse.Namespace) -> None:
+    """Sequential Helix requests over HTTPS, the way each HTTP client makes them.
+
+    - pooled: the backend's client, reusing its connections and TLS sessions
+    - new client: a new client per request, a TCP and TLS handshake each time
+    - requests: a bare `requests.get` per request, which is what the twitchpy
+      client the plugin used before does for every API call. Skipped if
+      requests is not installed.
+
+    The mock serves a throwaway self-signed certificate that all clients
+    trust, so the handshakes are real but run on localhost.
+    """
+    print(f"latency: {args.presses} requests, {args.latency * 1000:.0f}ms server time")
+    mock = MockTwitch(latency=args.latency, jitter=args.jitter, tls=True)
+    mock.start()
+    # Every Helix client shares this context
+    _ssl_context().load_verify_locations(mock.certificate)
+    backend = start_backend(mock)
+    helix = backend.helix
+    headers = {
+        "Client-Id": helix.client_id,
+        "Authorization": f"Bearer {helix.access_token}",
+    }
+
+    def pooled() -> None:
+        backend.loop.run(helix.get_streams(backend.user_id))
+
+    async def get_streams_new_client() -> None:
+        client = HelixClient(helix_url=helix.helix_url)
+        client.client_id = helix.client_id
+        client.access_token = helix.access_token
+        try:
+            await client.get_streams(backend.user_id)
+        finally:
+            await client.aclose()
+
+    def new_client() -> None:
+        backend.loop.run(get_streams_new_client())
+
+    def bare_requests() -> None:
+        requests.get(
+            f"{helix.helix_url}/streams",
+            headers=headers,
+            params={"user_id": backend.user_id, "first": 1},
+            timeout=10,
+            verify=mock.certificate,
+        ).raise_for_status()
+
+    clients: list[tuple[str, Callable[[], None]]] = [
+        ("pooled", pooled),
+        ("new client", new_client),
+    ]
+    if requests is not None:
+        clients.append(("requests", bare_requests))
+    for name, request in clients:
+        latencies: list[float] = []
+        for _ in range(args.presses):
+            start = perf_counter()
+            request()
+            latencies.append(perf_counter() - start)
+        print(f"  {name}: {format_latencies(latencies)}")
+    if requests is None:
+        print("  requests: skipped, the requests package is not installed")
+    stop_backend(backend)
+    mock.stop()
+
+
+def events(args: argparse.Namespace) -> None:
+    """State changes on Twitch, timed until the frontend receives the new state.
+
+    With EventSub the changes are pushed, without it they are only picked up
+    by the next poll of the resource.
+    """
+    print(
+        f"events: {args.events} of each, EventSub {'on' if args.eventsub else 'off'}"
+    )
+    mock = MockTwitch(latency=args.latency, jitter=args.jitter)
+    mock.start()
+    backend = start_backend(mock, args.eventsub)
+    for resource in POLLED_RESOURCES:
+        backend.subscribe(resource, "bench")
+    if args.eventsub:
+        timeout = PUSH_TIMEOUT_SECONDS
+        deadline = monotonic() + PUSH_TIMEOUT_SECONDS
+        while len(backend.pushed_resources) < 2 and monotonic() < deadline:
+            sleep(0.05)
+    else:
+        # An idle resource of an offline stream is polled least often
+        timeout = (
+            max(POLLED_RESOURCES.values())
+            * max(POLL_IDLE_MAX_MULTIPLIER, POLL_OFFLINE_MULTIPLIER)
+            + PUSH_TIMEOUT_SECONDS
+        )
+    user_id = backend.user_id
+    latencies: dict[str, list[float]] = {}
+    missed: dict[str, int] = {}
+
+    def measure(
+        name: str, change: Callable[[], Any], check: Callable[[dict[str, Any]], bool]
+    ) -> None:
+        # Changes arrive at any point of the polling interval
+        sleep(random.uniform(0, 1))
+        start = perf_counter()
+        change()
+        if backend.frontend.wait_for(
+            "on_state_snapshot",
+            lambda snapshot, *_: check(json.loads(snapshot)["resources"]),
+            timeout,
+        ):
+            latencies.setdefault(name, []).append(perf_counter() - start)
+        else:
+            missed[name] = missed.get(name, 0) + 1
+
+    for n in range(args.events):
+        emote_mode = n % 2 == 0
+        measure(
+            "channel.chat_settings.update",
+            lambda: mock.set_chat_settings(user_id, emote_mode=emote_mode),
+            lambda state: state[RESOURCE_CHAT_SETTINGS]["emote_mode"] == emote_mode,
+        )
+        next_ad_at = 0
+
+        def start_ad_break() -> None:
+            nonlocal next_ad_at
+            next_ad_at = mock.start_ad_break(user_id)
+
+        measure(
+            "channel.ad_break.begin",
+            start_ad_break,
+            lambda state: state[RESOURCE_AD_SCHEDULE][0] == next_ad_at,
+        )
+        measure(
+            "stream.offline",
+            lambda: mock.set_live(user_id, False),
+            lambda state: state[RESOURCE_VIEWERS] == "Not Live",
+        )
+        measure(
+            "stream.online",
+            lambda: mock.set_live(user_id, True),
+            lambda state: state[RESOURCE_VIEWERS] not in (None, "Not Live"),
+        )
+
+    resources = {
+        "channel.chat_settings.update": RESOURCE_CHAT_SETTINGS,
+        "channel.ad_break.begin": RESOURCE_AD_SCHEDULE,
+        "stream.offline": RESOURCE_VIEWERS,
+        "stream.online": RESOURCE_VIEWERS,
+    }
+    for name, resource in resources.items():
+        line = f"  {name}: {format_latencies(latencies.get(name, []))}"
+        if missed.get(name):
+            line += f", {missed[name]} missed after {timeout:.0f}s"
+        # Without EventSub a change waits for the next poll
+        line += f" (polling only: every {POLLED_RESOURCES[resource]}s or slower)"
+        print(line)
+    stop_backend(backend)
+    mock.stop()
+
+
+def _run_presses(backend: Backend, mock: MockTwitch, presses: int) -> None:
+    actions: list[Callable[[int], Any]] = [
+        lambda n: backend.create_marker(),
+        lambda n: backend.toggle_chat_mode("emote_mode"),
+        lambda n: backend.send_message(f"Hello {n}", ""),
+        lambda n: backend.get_channel_id(f"viewer{n}"),
+        lambda n: backend.get_viewers(),
+    ]
+    calls = [(lambda n=n: actions[n % len(actions)](n)) for n in range(presses)]
+    start = perf_counter()
+    latencies, errors = run_concurrently(calls)
+    elapsed = perf_counter() - start
+    print(
+        f"  {presses} presses in {elapsed:.2f}s ({presses / elapsed:.1f}/s), "
+        f"{len(errors)} failed"
+    )
+    print(f"  latency: {format_latencies(latencies)}")
+    for error in errors[:3]:
+        print(f"    {type(error).__name__}: {error}")
+    report_requests(mock, elapsed)
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "polling": polling,
+    "burst": burst,
+    "throttled": throttled,
+    "revoked": revoked,
+    "latency": latency,
+    "events": events,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)}, default: all"
+    )
+    parser.add_argument("--keys", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of polling")
+    parser.add_argument("--presses", type=int, default=50)
+    parser.add_argument("--events", type=int, default=10, help="changes per event")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="mock response time in seconds"
+    )
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument(
+        "--no-eventsub", dest="eventsub", action="store_false", help="poll only"
+    )
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    set_log_level(args.log_level)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    for name in args.scenarios or SCENARIOS:
+        SCENARIOS[name](args)
+
+
+if __name__ == "__main__":
+    main()
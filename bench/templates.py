@@ -0,0 +1,63 @@
+"""Benchmarks compiling and rendering chat message templates.
+
+Rendering happens on every press of a chat message key, so it has to stay in
+the microsecond range. State is read from a dict, like the cached stream
+state the keys read from.
+
+    python bench/templates.py
+    python bench/templates.py --renders 100000
+"""
+
+import argparse
+from time import perf_counter, time
+from typing import Any, Callable
+
+from common import format_latencies, import_plugin_module
+
+constants = import_plugin_module("constants")
+message_template = import_plugin_module("message_template")
+
+TEMPLATES = [
+    "Thanks for watching!",
+    "{viewers} viewers right now",
+    "Live for {uptime} with {viewers} viewers, next ad in {next_ad}",
+    "{random:Hype!|Let's go!|GG} {random:PogChamp|Kreygasm}",
+]
+
+
+def measure(calls: int, call: Callable[[], Any]) -> list[float]:
+    durations: list[float] = []
+    for _ in range(calls):
+        start = perf_counter()
+        call()
+        durations.append(perf_counter() - start)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=20000)
+    parser.add_argument("--compiles", type=int, default=2000)
+    args = parser.parse_args()
+
+    state = {
+        constants.RESOURCE_VIEWERS: "1234",
+        constants.RESOURCE_AD_SCHEDULE: (time() + 754, 3),
+        constants.STATE_STREAM_STARTED_AT: time() - 5025,
+    }
+    for source in TEMPLATES:
+        print(f"{source!r}")
+        compiles = measure(
+            args.compiles, lambda: message_template.MessageTemplate(source)
+        )
+        print(f"  compile: {format_latencies(compiles, 'us')}")
+        template = message_template.compile_template(source)
+        renders = measure(args.renders, lambda: template.render(state.get))
+        print(
+            f"  render: {format_latencies(renders, 'us')}, "
+            f"{len(renders) / sum(renders):.0f}/s -> {template.render(state.get)!r}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from time import monotonic, sleep
+from typing import Any, Callable, Optional
+
+import websocket
+from loguru import logger as log
+
+from constants import (
+    CHAT_IRC_URL,
+    CHAT_IRC_PING_TIMEOUT_SECONDS,
+    CHAT_IRC_CONFIRM_TIMEOUT_SECONDS,
+    CHAT_QUEUE_SIZE,
+    CHAT_DEDUP_WINDOW_SECONDS,
+    RATE_LIMIT_CHAT_CALLS,
+    RATE_LIMIT_CHAT_MOD_CALLS,
+    RATE_LIMIT_CHAT_PERIOD,
+    CHAT_IRC_RECONNECT_MAX_DELAY_SECONDS,
+)
+
+
+class ChatQueueFullError(Exception):
+    """Raised when a chat message is dropped because the outbound queue is full."""
+
+
+class ChatRejectedError(Exception):
+    """Raised when Twitch answers a chat message sent over IRC with a notice."""
+
+
+class IrcChatClient:
+    """Persistent IRC over WebSocket connection used to send chat messages.
+
+    Sending over an open IRC connection skips the HTTP request per message.
+    Twitch confirms every message with a USERSTATE for the channel, which
+    `send` waits for, so a message written to a connection that just dropped
+    is reported as failed instead of being lost.
+
+    Args:
+        get_credentials: Returns the login and the access token to log in with.
+            The token needs the `chat:edit` scope.
+        url: WebSocket URL to connect to, override to use a local mock server
+    """
+
+    def __init__(
+        self,
+        get_credentials: Callable[[], tuple[str, str]],
+        url: str = CHAT_IRC_URL,
+    ) -> None:
+        self.get_credentials: Callable[[], tuple[str, str]] = get_credentials
+        self.url: str = url
+        self.running: bool = False
+        self.ready: bool = False
+        self.joined: set[str] = set()
+        self.ws: Optional[websocket.WebSocket] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock: threading.Lock = threading.Lock()
+        # Channel and confirmation of the line waiting for Twitch to confirm it
+        self.pending: Optional[tuple[str, Future]] = None
+        # Only one line waits for its confirmation at a time
+        self.send_lock: threading.Lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.ready
+
+    def start(self) -> None:
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True, name="irc")
+            self.thread.start()
+
+    def stop(self) -> None:
+        with self.lock:
+            self.running = False
+            ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def send(
+        self,
+        channel: str,
+        message: str,
+        timeout: float = CHAT_IRC_CONFIRM_TIMEOUT_SECONDS,
+    ) -> None:
+        """Sends a message to the chat of `channel`, joining it first if needed.
+
+        Returns once Twitch confirmed the message.
+
+        Raises:
+            ConnectionError: If the connection is not ready or was lost before
+                the message was confirmed
+            TimeoutError: If the message was not confirmed within `timeout`
+                seconds
+            ChatRejectedError: If Twitch answered with a notice instead
+        """
+        channel = channel.lower()
+        with self.send_lock:
+            with self.lock:
+                joined = channel in self.joined
+            if not joined:
+                self._send_confirmed(channel, f"JOIN #{channel}", timeout)
+                with self.lock:
+                    self.joined.add(channel)
+            self._send_confirmed(channel, f"PRIVMSG #{channel} :{message}", timeout)
+
+    def _send_confirmed(self, channel: str, line: str, timeout: float) -> None:
+        confirmation: Future = Future()
+        with self.lock:
+            if not self.ready or self.ws is None:
+                raise ConnectionError("IRC connection is not ready")
+            self.pending = (channel, confirmation)
+            self.ws.send(line)
+        try:
+            confirmation.result(timeout)
+        finally:
+            with self.lock:
+                self.pending = None
+
+    def _confirm(self, command: str, channel: str, text: str) -> None:
+        """Resolves the line waiting for confirmation in `channel`, if any."""
+        with self.lock:
+            pending = self.pending
+        if pending is None or pending[0] != channel or pending[1].done():
+            return
+        if command == "USERSTATE":
+            pending[1].set_result(None)
+        else:
+            pending[1].set_exception(ChatRejectedError(text))
+
+    def _run(self) -> None:
+        delay = 1.0
+        while self.running:
+            try:
+                self._session()
+                delay = 1.0
+            except Exception as ex:
+                if not self.running:
+                    break
+                log.warning(f"IRC connection lost: {ex}")
+            if self.running:
+                sleep(delay)
+                delay = min(delay * 2, CHAT_IRC_RECONNECT_MAX_DELAY_SECONDS)
+
+    def _session(self) -> None:
+        login, token = self.get_credentials()
+        ws = websocket.create_connection(self.url, timeout=10)
+        with self.lock:
+            self.ws = ws
+            self.joined = set()
+        try:
+            # Twitch only confirms sent messages with the commands capability
+            ws.send("CAP REQ :twitch.tv/tags twitch.tv/commands")
+            ws.send(f"PASS oauth:{token}")
+            ws.send(f"NICK {login.lower()}")
+            while self.running:
+                for line in ws.recv().split("\r\n"):
+                    self._handle_line(ws, line)
+        finally:
+            with self.lock:
+                self.ready = False
+                self.ws = None
+                pending = self.pending
+            ws.close()
+            if pending is not None and not pending[1].done():
+                pending[1].set_exception(
+                    ConnectionError("IRC connection lost before Twitch confirmed it")
+                )
+
+    def _handle_line(self, ws: websocket.WebSocket, line: str) -> None:
+        if line.startswith("@"):
+            # Drop the tags
+            line = line.partition(" ")[2]
+        words = line.removeprefix(":").split(" ")
+        if (
+            len(words) > 2
+            and words[1] in ("USERSTATE", "NOTICE")
+            and words[2].startswith("#")
+        ):
+            self._confirm(words[1], words[2][1:], line.partition(" :")[2])
+            return
+
+        if line.startswith("PING"):
+            ws.send(line.replace("PING", "PONG", 1))
+        elif " 001 " in line:
+            # Twitch pings about every five minutes, anything longer is a dead connection
+            ws.settimeout(CHAT_IRC_PING_TIMEOUT_SECONDS)
+            self.ready = True
+            log.info("IRC connection ready for sending chat messages")
+        elif "NOTICE" in line and "authentication failed" in line.lower():
+            raise ConnectionError("IRC login failed, check the chat:edit scope")
+
+
+@dataclass
+class _ChatMessage:
+    channel_id: str
+    channel: str
+    text: str
+    bucket: str
+    future: Future = field(default_factory=Future)
+
+
+class ChatPipeline:
+    """Outbound chat message queue.
+
+    Messages are sent from a single background thread in the order they were
+    queued, limited per channel to Twitch's chat limits. Identical messages to
+    the same channel within `dedup_window` seconds are merged into one, and new
+    messages are dropped while the queue is full. Messages go over IRC when a
+    connection is ready, and over Helix otherwise. A message only counts as
+    sent once Twitch confirmed it. Messages IRC could not deliver, e.g. while
+    the connection drops, are sent over Helix instead and counted as retried,
+    messages that could not be sent at all are counted as failed.
+
+    Args:
+        rate_limiter: Rate limiter the per channel buckets are added to
+        send_helix: Sends a message to a channel ID over Helix
+        max_size: Maximum number of queued messages
+        dedup_window: Time in seconds identical messages are merged
+    """
+
+    def __init__(
+        self,
+        rate_limiter: Any,
+        send_helix: Callable[[str, str], None],
+        max_size: int = CHAT_QUEUE_SIZE,
+        dedup_window: float = CHAT_DEDUP_WINDOW_SECONDS,
+    ) -> None:
+        self.rate_limiter: Any = rate_limiter
+        self.send_helix: Callable[[str, str], None] = send_helix
+        self.irc: Optional[IrcChatClient] = None
+        self.max_size: int = max_size
+        self.dedup_window: float = dedup_window
+        self.queue: deque[_ChatMessage] = deque()
+        self.recent: dict[tuple[str, str], tuple[Future, float]] = {}
+        self.channels: set[str] = set()
+        self.stats: dict[str, int] = {
+            "sent": 0,
+            "merged": 0,
+            "dropped": 0,
+            "irc": 0,
+            "irc_retried": 0,
+            "failed": 0,
+        }
+        self.condition: threading.Condition = threading.Condition()
+        self.running: bool = False
+        self.thread: Optional[threading.Thread] = None
+
+    def send(
+        self, channel_id: str, channel: str, text: str, is_moderator: bool = False
+    ) -> Future:
+        """Queues a chat message.
+
+        Args:
+            channel_id: User ID of the channel to send to
+            channel: Login of the channel to send to
+            text: Message to send
+            is_moderator: Whether the sender moderates the channel, which
+                raises the chat limit. Only taken from the first message to a
+                channel.
+
+        Returns:
+            A future resolved once the message was sent. Merged messages share
+            the future of the message they were merged into.
+
+        Raises:
+            ChatQueueFullError: If the queue is full
+        """
+        now = monotonic()
+        key = (channel_id, text)
+        with self.condition:
+            self.recent = {
+                k: v for k, v in self.recent.items() if now - v[1] < self.dedup_window
+            }
+            if key in self.recent:
+                self.stats["merged"] += 1
+                return self.recent[key][0]
+            if len(self.queue) >= self.max_size:
+                self.stats["dropped"] += 1
+                raise ChatQueueFullError("Chat queue is full, message was dropped")
+
+            bucket = self._bucket(channel_id, is_moderator)
+            message = _ChatMessage(channel_id, channel, text, bucket)
+            self.queue.append(message)
+            self.recent[key] = (message.future, now)
+            self._start()
+            self.condition.notify()
+        return message.future
+
+    def get_stats(self) -> dict[str, int]:
+        with self.condition:
+            return {**self.stats, "queued": len(self.queue)}
+
+    def stop(self) -> None:
+        with self.condition:
+            self.running = False
+            pending = list(self.queue)
+            self.queue.clear()
+            self.condition.notify_all()
+        for message in pending:
+            message.future.cancel()
+
+    def _bucket(self, channel_id: str, is_moderator: bool) -> str:
+        """Returns the rate limit bucket of a channel, must be called with the lock held."""
+        bucket = f"chat:{channel_id}"
+        if bucket not in self.channels:
+            self.rate_limiter.add_bucket(
+                bucket,
+                RATE_LIMIT_CHAT_MOD_CALLS if is_moderator else RATE_LIMIT_CHAT_CALLS,
+                RATE_LIMIT_CHAT_PERIOD,
+            )
+            self.channels.add(bucket)
+        return bucket
+
+    def _start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="chat")
+        self.thread.start()
+
+    def _next_message(self) -> Optional[_ChatMessage]:
+        """Takes the first message whose channel is within its limit.
+
+        Waits until a message can be sent. Returns None once stopped.
+        """
+        with self.condition:
+            while self.running:
+                wait: Optional[float] = None
+                for message in self.queue:
+                    # Helix calls take their global token when they are dispatched
+                    message_wait = self.rate_limiter.try_acquire(
+                        message.bucket, global_bucket=False
+                    )
+                    if message_wait == 0:
+                        self.queue.remove(message)
+                        return message
+                    wait = message_wait if wait is None else min(wait, message_wait)
+                self.condition.wait(wait)
+        return None
+
+    def _run(self) -> None:
+        while True:
+            message = self._next_message()
+            if message is None:
+                return
+            if not message.future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._deliver(message)
+            except Exception as ex:
+                with self.condition:
+                    self.stats["failed"] += 1
+                message.future.set_exception(ex)
+            else:
+                message.future.set_result(None)
+
+    def _deliver(self, message: _ChatMessage) -> None:
+        irc = self.irc
+        if irc is not None and irc.connected:
+            try:
+                irc.send(message.channel, message.text)
+            except Exception as ex:
+                # Unconfirmed messages are most likely lost, e.g. written to a
+                # connection that just dropped
+                log.warning(f"Failed to send chat message over IRC, using Helix: {ex}")
+                with self.condition:
+                    self.stats["irc_retried"] += 1
+            else:
+                with self.condition:
+                    self.stats["sent"] += 1
+                    self.stats["irc"] += 1
+                return
+        self.send_helix(message.channel_id, message.text)
+        with self.condition:
+            self.stats["sent"] += 1
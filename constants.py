@@ -7,16 +7,126 @@ VIEWER_UPDATE_INTERVAL_SECONDS = 10
 AD_SCHEDULE_FETCH_INTERVAL_SECONDS = 30
 AD_DISPLAY_UPDATE_INTERVAL_SECONDS = 1
 CHAT_MODE_UPDATE_INTERVAL_SECONDS = 5
+METRICS_UPDATE_INTERVAL_SECONDS = 5
+
+# Key images drawn by the plugin for fast-changing labels
+KEY_IMAGE_CACHE_SIZE = 256
+KEY_LABEL_FONT_SCALE = 0.22  # Font size relative to the key height
+KEY_LABEL_STROKE_WIDTH = 2
+KEY_SPARKLINE_HEIGHT_SCALE = 0.3  # Sparkline height relative to the key height
+KEY_SPARKLINE_WIDTH = 2
+
+# Shared stream state resources polled by the backend
+RESOURCE_VIEWERS = "viewers"
+RESOURCE_CHAT_SETTINGS = "chat_settings"
+RESOURCE_AD_SCHEDULE = "ad_schedule"
+# Latency summary of the backend, computed locally without API calls
+RESOURCE_METRICS = "metrics"
+# Start of the current broadcast, updated together with the viewers
+STATE_STREAM_STARTED_AT = "stream_started_at"
+# Viewer sparkline, delta and peak, updated together with the viewers
+STATE_VIEWER_TREND = "viewer_trend"
+# State derived from the polled resources, published with every snapshot. It is
+# kept current by subscribing to the resource it is derived from.
+DERIVED_STATE = (STATE_STREAM_STARTED_AT, STATE_VIEWER_TREND)
+
+# Viewer history
+# Room for a 12 hour stream even at one sample per second, 8 bytes per sample
+VIEWER_HISTORY_SIZE = 12 * 60 * 60
+# The sparkline covers the last hour
+VIEWER_SPARKLINE_BUCKETS = 24
+VIEWER_SPARKLINE_BUCKET_SECONDS = 150
+
+# Adaptive polling
+# Intervals grow while a value stays unchanged or the stream is offline, and
+# shrink shortly before a known event such as the next ad
+POLL_IDLE_BACKOFF_FACTOR = 1.5
+POLL_IDLE_MAX_MULTIPLIER = 6
+POLL_OFFLINE_MULTIPLIER = 6
+POLL_NEAR_EVENT_WINDOW_SECONDS = 300
+POLL_NEAR_EVENT_INTERVAL_SECONDS = 10
+# How often the frontend pauses polling for keys that are no longer visible
+STATE_VISIBILITY_CHECK_SECONDS = 5
+
+# EventSub push updates
+# Polling is kept as a slow fallback for resources covered by EventSub
+EVENTSUB_WS_URL = "wss://eventsub.wss.twitch.tv/ws"
+EVENTSUB_KEEPALIVE_GRACE_SECONDS = 5
+EVENTSUB_RECONNECT_MAX_DELAY_SECONDS = 60
+EVENTSUB_FALLBACK_POLL_INTERVAL_SECONDS = 120
+
+# Outbound chat messages
+# Identical messages to a channel within the dedup window are sent only once
+CHAT_QUEUE_SIZE = 20
+CHAT_DEDUP_WINDOW_SECONDS = 3
+CHAT_IRC_URL = "wss://irc-ws.chat.twitch.tv:443"
+CHAT_IRC_PING_TIMEOUT_SECONDS = 360
+# Messages Twitch has not confirmed by then are sent again over Helix
+CHAT_IRC_CONFIRM_TIMEOUT_SECONDS = 5
+CHAT_IRC_RECONNECT_MAX_DELAY_SECONDS = 60
 
 # Error display
 ERROR_DISPLAY_DURATION_SECONDS = 3
+SUCCESS_DISPLAY_DURATION_SECONDS = 1
+
+# Number of key presses that may wait on the backend at the same time
+ACTION_WORKERS = 4
+
+# Twitch API endpoints and HTTP connection pool
+HELIX_BASE_URL = "https://api.twitch.tv/helix"
+OAUTH_BASE_URL = "https://id.twitch.tv/oauth2"
+HTTP_CONNECT_TIMEOUT_SECONDS = 3
+HTTP_READ_TIMEOUT_SECONDS = 10
+HTTP_MAX_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 120
 
 # OAuth/Authentication
 OAUTH_REDIRECT_URI = "http://localhost:3000/auth"
 OAUTH_PORT = 3000
+# Refresh the access token in the background when it has less than this many seconds left
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
+# Twitch requires validating access tokens at least once an hour
+TOKEN_VALIDATE_INTERVAL_SECONDS = 3600
+# Time to wait before retrying a failed background token check, e.g. while offline
+TOKEN_RETRY_DELAY_SECONDS = 60
+
+# Token file of each added account, next to the token file of the main account
+ACCOUNT_TOKEN_FILE = "keys-{account}.json"
+
+# Backend metrics
+# Optional Prometheus endpoint, served on localhost next to the OAuth server
+METRICS_PORT = 3001
+# Latency histograms keep 5 significant bits, i.e. quantiles are within ~6%
+METRICS_HISTOGRAM_PRECISION_BITS = 5
+METRICS_HISTOGRAM_MAX_MICROSECONDS = 60_000_000
+
+# Username to user ID resolution
+USER_ID_CACHE_FILE = "user_ids.json"
+USER_ID_CACHE_SIZE = 500
+USER_ID_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Resolved user IDs are collected for a few seconds before the cache file is written
+USER_ID_CACHE_SAVE_DELAY_SECONDS = 5
+USER_ID_PREFETCH_DELAY_SECONDS = 1
+USER_ID_BATCH_SIZE = 100  # Maximum logins per get_users request
 
 # Rate Limiting
 # Twitch API standard rate limit: 800 requests per minute
 # Using conservative limit to avoid hitting the cap
 RATE_LIMIT_CALLS = 100
 RATE_LIMIT_PERIOD = 60  # seconds
+# Endpoints with their own limits on top of the global one
+RATE_LIMIT_CHAT_CALLS = 20  # Twitch chat limit for non-moderators
+RATE_LIMIT_CHAT_MOD_CALLS = 100  # Twitch chat limit for moderators and the broadcaster
+RATE_LIMIT_CHAT_PERIOD = 30
+RATE_LIMIT_SHOUTOUT_CALLS = 1  # One shoutout every 2 minutes
+RATE_LIMIT_SHOUTOUT_PERIOD = 120
+RATE_LIMIT_COMMERCIAL_CALLS = 1
+RATE_LIMIT_COMMERCIAL_PERIOD = 60
+RATE_LIMIT_CLIP_CALLS = 5
+RATE_LIMIT_CLIP_PERIOD = 60
+
+# Clip processing
+# Twitch considers a clip failed if it is not returned by get_clips within 15 seconds
+CLIP_PROCESSING_TIMEOUT_SECONDS = 15
+CLIP_POLL_INITIAL_DELAY_SECONDS = 1
+CLIP_POLL_BACKOFF_FACTOR = 2
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+class EventLoopThread:
+    """Runs the asyncio event loop that all Twitch API traffic of the backend goes through.
+
+    Requests, request scheduling and state polling of every account run as
+    tasks on this one loop, so concurrent requests overlap without a thread
+    per request. Code outside the loop, e.g. RPyC calls from the frontend,
+    waits for coroutines with `run`.
+
+    Callbacks that block, such as calls into the frontend, must not run on
+    the loop. `call_in_thread` runs them in order on a separate thread.
+
+    Args:
+        name: Name of the loop thread
+    """
+
+    def __init__(self, name: str = "backend_loop") -> None:
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.callbacks: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"{name}_callbacks"
+        )
+        self.thread: threading.Thread = threading.Thread(
+            target=self._run, daemon=True, name=name
+        )
+        self.thread.start()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> Future:
+        """Schedules a coroutine on the loop from any thread.
+
+        Returns:
+            Future resolving to the result of the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine on the loop and waits for its result.
+
+        Raises:
+            RuntimeError: If called on the loop thread, where waiting would
+                block the loop forever
+        """
+        if self.in_loop():
+            coroutine.close()
+            raise RuntimeError("Cannot wait for a coroutine on the event loop thread")
+        return self.submit(coroutine).result()
+
+    def call_soon(self, func: Callable[..., Any], *args: Any) -> None:
+        """Calls a function on the loop from any thread, e.g. to wake up a task."""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def call_in_thread(self, func: Callable[..., Any], *args: Any) -> Future:
+        """Runs a blocking callback off the loop, callbacks run one after another."""
+        return self.callbacks.submit(func, *args)
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def stop(self) -> None:
+        self.callbacks.shutdown(wait=False, cancel_futures=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+def blocking(
+    coroutine_function: Callable[..., Coroutine[Any, Any, T]],
+) -> Callable[..., T]:
+    """Wraps a coroutine method into a method that runs it on `self.loop` and waits for it.
+
+    Gives callers that cannot await, such as the frontend over RPyC, a plain
+    method next to each `*_async` coroutine:
+
+        create_clip = blocking(create_clip_async)
+    """
+
+    @wraps(coroutine_function)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+        return self.loop.run(coroutine_function(self, *args, **kwargs))
+
+    wrapper.__name__ = coroutine_function.__name__.removesuffix("_async")
+    return wrapper
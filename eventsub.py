@@ -0,0 +1,156 @@
+import json
+import threading
+from datetime import datetime, timezone
+from time import sleep
+from typing import Any, Callable, Optional
+
+import websocket
+from loguru import logger as log
+
+from constants import (
+    EVENTSUB_WS_URL,
+    EVENTSUB_KEEPALIVE_GRACE_SECONDS,
+    EVENTSUB_RECONNECT_MAX_DELAY_SECONDS,
+)
+
+
+class EventSubClient:
+    """Client for the Twitch EventSub WebSocket transport.
+
+    Keeps a single WebSocket session open in a background thread and hands every
+    notification to a callback. The connection is re-established with
+    exponential backoff when it drops or when the keepalive window passes
+    without a message, and `session_reconnect` messages are followed without
+    losing subscriptions.
+
+    Args:
+        on_welcome: Called with the session ID once a new session is ready.
+            Subscriptions have to be created for this session ID.
+        on_notification: Called with the subscription type and event payload
+            for every notification
+        on_disconnect: Called when the session is lost
+        url: WebSocket URL to connect to, override to use a local mock server
+    """
+
+    def __init__(
+        self,
+        on_welcome: Callable[[str], None],
+        on_notification: Callable[[str, dict[str, Any]], None],
+        on_disconnect: Callable[[], None],
+        url: str = EVENTSUB_WS_URL,
+    ) -> None:
+        self.on_welcome: Callable[[str], None] = on_welcome
+        self.on_notification: Callable[[str, dict[str, Any]], None] = on_notification
+        self.on_disconnect: Callable[[], None] = on_disconnect
+        self.url: str = url
+        self.session_id: Optional[str] = None
+        self.running: bool = False
+        self.ws: Optional[websocket.WebSocket] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock: threading.Lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.session_id is not None
+
+    def start(self) -> None:
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(
+                target=self._run, daemon=True, name="eventsub"
+            )
+            self.thread.start()
+
+    def stop(self) -> None:
+        with self.lock:
+            self.running = False
+            ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        url = self.url
+        delay = 1.0
+        while self.running:
+            try:
+                next_url = self._session(url)
+            except Exception as ex:
+                if not self.running:
+                    break
+                log.warning(f"EventSub connection lost: {ex}")
+                next_url = self.url
+            if next_url == self.url:
+                if self.session_id is not None:
+                    # Session was established, start backing off from scratch
+                    delay = 1.0
+                    self.session_id = None
+                    self.on_disconnect()
+                if self.running:
+                    sleep(delay)
+                    delay = min(delay * 2, EVENTSUB_RECONNECT_MAX_DELAY_SECONDS)
+            url = next_url
+
+    def _session(self, url: str) -> str:
+        """Runs one WebSocket session.
+
+        Returns:
+            The URL to connect to next. This is the reconnect URL sent by
+            Twitch when the session is being migrated.
+        """
+        is_reconnect = url != self.url
+        ws = websocket.create_connection(url, timeout=10)
+        with self.lock:
+            self.ws = ws
+        try:
+            while self.running:
+                message = json.loads(ws.recv())
+                metadata = message.get("metadata", {})
+                payload = message.get("payload", {})
+                message_type = metadata.get("message_type")
+
+                if message_type == "session_welcome":
+                    session = payload["session"]
+                    keepalive = session.get("keepalive_timeout_seconds") or 10
+                    ws.settimeout(keepalive + EVENTSUB_KEEPALIVE_GRACE_SECONDS)
+                    self.session_id = session["id"]
+                    # Subscriptions carry over to the new session on reconnect
+                    if not is_reconnect:
+                        self.on_welcome(self.session_id)
+                elif message_type == "notification":
+                    self._log_latency(metadata)
+                    self.on_notification(
+                        metadata.get("subscription_type", ""), payload.get("event", {})
+                    )
+                elif message_type == "session_reconnect":
+                    reconnect_url = payload["session"]["reconnect_url"]
+                    log.info("EventSub session is migrating to a new server")
+                    return reconnect_url
+                elif message_type == "revocation":
+                    subscription = payload.get("subscription", {})
+                    log.warning(
+                        f"EventSub subscription '{subscription.get('type')}' was revoked: {subscription.get('status')}"
+                    )
+            return self.url
+        finally:
+            with self.lock:
+                self.ws = None
+            ws.close()
+
+    def _log_latency(self, metadata: dict[str, Any]) -> None:
+        timestamp = metadata.get("message_timestamp")
+        if not timestamp:
+            return
+        try:
+            # Twitch sends nanosecond precision, which fromisoformat does not accept
+            sent = datetime.fromisoformat(timestamp[:26].rstrip("Z") + "+00:00")
+        except ValueError:
+            return
+        latency = (datetime.now(timezone.utc) - sent).total_seconds()
+        log.debug(
+            f"EventSub '{metadata.get('subscription_type')}' delivered after {latency * 1000:.0f}ms"
+        )
@@ -0,0 +1,337 @@
+import importlib.util
+import ssl
+from datetime import datetime
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+import certifi
+import httpx
+
+from constants import (
+    HELIX_BASE_URL,
+    OAUTH_BASE_URL,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+)
+
+# HTTP/2 needs the optional h2 package, fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@lru_cache(maxsize=None)
+def _ssl_context() -> ssl.SSLContext:
+    """Returns the TLS settings shared by all clients.
+
+    Loading the CA certificates takes longer than creating the rest of a
+    client, so it is only done once instead of once per account.
+    """
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class HelixError(Exception):
+    """Raised when Twitch answers a request with an error status.
+
+    Args:
+        status: HTTP status code of the response
+        message: Error message returned by Twitch
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status: int = status
+
+
+def parse_timestamp(value: Any) -> datetime:
+    """Parses a Twitch timestamp into a naive local datetime.
+
+    Twitch returns some timestamps as Unix epoch seconds and others in RFC3339
+    format. Missing timestamps are returned as the epoch.
+    """
+    if not value:
+        return datetime.fromtimestamp(0)
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return datetime.fromtimestamp(int(value))
+    return datetime.fromisoformat(value).astimezone().replace(tzinfo=None)
+
+
+class HelixClient:
+    """Minimal client for the Twitch Helix and OAuth endpoints used by the plugin.
+
+    All requests share one pooled HTTP client, so connections (and their TLS
+    sessions) are kept alive and reused between calls. HTTP/2 is used when the
+    h2 package is installed.
+
+    Every request is a coroutine. They are meant to be awaited on the backend
+    event loop, where concurrent requests share the connections instead of
+    each waiting for a thread.
+
+    Args:
+        on_response: Called with the headers of every Helix response, used to
+            keep the rate limiter in sync with Twitch
+        on_request: Called after every Helix request with the method, the path,
+            the status code (0 if no response was received) and the duration
+            in seconds
+        helix_url: Base URL of the Helix API
+        oauth_url: Base URL of the OAuth endpoints
+    """
+
+    def __init__(
+        self,
+        on_response: Optional[Callable[[httpx.Headers], None]] = None,
+        on_request: Optional[Callable[[str, str, int, float], None]] = None,
+        helix_url: str = HELIX_BASE_URL,
+        oauth_url: str = OAUTH_BASE_URL,
+    ) -> None:
+        self.on_response: Optional[Callable[[httpx.Headers], None]] = on_response
+        self.on_request: Optional[Callable[[str, str, int, float], None]] = on_request
+        self.helix_url: str = helix_url
+        self.oauth_url: str = oauth_url
+        self.client_id: str = ""
+        self.client_secret: str = ""
+        self.access_token: str = ""
+        self.refresh_token: str = ""
+        self.http: httpx.AsyncClient = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            verify=_ssl_context(),
+            timeout=httpx.Timeout(
+                HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    # OAuth
+
+    async def check_client_id(self, params: dict[str, str]) -> Optional[str]:
+        """Checks the authorization URL for the given client ID.
+
+        Twitch redirects valid requests to its login page, only a client error
+        with a message in the body means the client ID was rejected.
+
+        Returns:
+            The error message returned by Twitch, or None if the URL is valid
+        """
+        resp = await self.http.get(
+            f"{self.oauth_url}/authorize", params=params, follow_redirects=True
+        )
+        if not 400 <= resp.status_code < 500:
+            return None
+        try:
+            return resp.json().get("message") or None
+        except ValueError:
+            return None
+
+    async def exchange_code(self, auth_code: str, redirect_uri: str) -> None:
+        """Exchanges an authorization code for user access and refresh tokens."""
+        self._set_tokens(
+            await self._oauth_token(
+                {
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "code": auth_code,
+                    "grant_type": "authorization_code",
+                    "redirect_uri": redirect_uri,
+                }
+            )
+        )
+
+    async def refresh(self) -> None:
+        """Gets a new access token using the refresh token."""
+        self._set_tokens(
+            await self._oauth_token(
+                {
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "grant_type": "refresh_token",
+                    "refresh_token": self.refresh_token,
+                }
+            )
+        )
+
+    async def validate(self) -> dict[str, Any]:
+        """Validates the access token.
+
+        Returns:
+            Token information including `user_id`, `login` and `expires_in`
+        """
+        resp = await self.http.get(
+            f"{self.oauth_url}/validate",
+            headers={"Authorization": f"OAuth {self.access_token}"},
+        )
+        return self._json(resp)
+
+    async def _oauth_token(self, data: dict[str, str]) -> dict[str, Any]:
+        return self._json(await self.http.post(f"{self.oauth_url}/token", data=data))
+
+    def _set_tokens(self, tokens: dict[str, Any]) -> None:
+        self.access_token = tokens["access_token"]
+        self.refresh_token = tokens.get("refresh_token", self.refresh_token)
+
+    # Helix
+
+    async def get_users(
+        self, ids: Optional[list[str]] = None, logins: Optional[list[str]] = None
+    ) -> list[dict[str, Any]]:
+        params = [("id", user_id) for user_id in ids or []]
+        params += [("login", login) for login in logins or []]
+        body = await self._helix("GET", "/users", params=params)
+        return body["data"]
+
+    async def get_streams(self, user_id: str) -> list[dict[str, Any]]:
+        body = await self._helix(
+            "GET", "/streams", params={"user_id": user_id, "first": 1}
+        )
+        return body["data"]
+
+    async def get_chat_settings(
+        self, broadcaster_id: str, moderator_id: str
+    ) -> dict[str, Any]:
+        body = await self._helix(
+            "GET",
+            "/chat/settings",
+            params={"broadcaster_id": broadcaster_id, "moderator_id": moderator_id},
+        )
+        return body["data"][0]
+
+    async def update_chat_settings(
+        self, broadcaster_id: str, moderator_id: str, **settings: Any
+    ) -> dict[str, Any]:
+        """Updates chat settings and returns the resulting settings."""
+        body = await self._helix(
+            "PATCH",
+            "/chat/settings",
+            params={"broadcaster_id": broadcaster_id, "moderator_id": moderator_id},
+            json=settings,
+        )
+        return body["data"][0]
+
+    async def send_chat_message(
+        self, broadcaster_id: str, sender_id: str, message: str
+    ) -> dict[str, Any]:
+        body = await self._helix(
+            "POST",
+            "/chat/messages",
+            json={
+                "broadcaster_id": broadcaster_id,
+                "sender_id": sender_id,
+                "message": message,
+            },
+        )
+        return body["data"][0]
+
+    async def send_shoutout(
+        self, from_broadcaster_id: str, to_broadcaster_id: str, moderator_id: str
+    ) -> None:
+        await self._helix(
+            "POST",
+            "/chat/shoutouts",
+            params={
+                "from_broadcaster_id": from_broadcaster_id,
+                "to_broadcaster_id": to_broadcaster_id,
+                "moderator_id": moderator_id,
+            },
+        )
+
+    async def create_clip(self, broadcaster_id: str) -> dict[str, Any]:
+        """Creates a clip and returns its `id` and `edit_url`."""
+        body = await self._helix(
+            "POST", "/clips", params={"broadcaster_id": broadcaster_id}
+        )
+        return body["data"][0]
+
+    async def get_clips(self, ids: list[str]) -> list[dict[str, Any]]:
+        """Returns the clips with the given IDs, clips still being processed are missing."""
+        body = await self._helix(
+            "GET", "/clips", params=[("id", clip_id) for clip_id in ids]
+        )
+        return body["data"]
+
+    async def create_stream_marker(self, user_id: str) -> dict[str, Any]:
+        body = await self._helix("POST", "/streams/markers", json={"user_id": user_id})
+        return body["data"][0]
+
+    async def start_commercial(
+        self, broadcaster_id: str, length: int
+    ) -> dict[str, Any]:
+        body = await self._helix(
+            "POST",
+            "/channels/commercial",
+            json={"broadcaster_id": broadcaster_id, "length": length},
+        )
+        return body["data"][0]
+
+    async def get_ad_schedule(self, broadcaster_id: str) -> dict[str, Any]:
+        body = await self._helix(
+            "GET", "/channels/ads", params={"broadcaster_id": broadcaster_id}
+        )
+        return body["data"][0]
+
+    async def snooze_next_ad(self, broadcaster_id: str) -> dict[str, Any]:
+        body = await self._helix(
+            "POST",
+            "/channels/ads/schedule/snooze",
+            params={"broadcaster_id": broadcaster_id},
+        )
+        return body["data"][0]
+
+    async def create_eventsub_subscription(
+        self,
+        subscription_type: str,
+        version: str,
+        condition: dict[str, Any],
+        session_id: str,
+    ) -> dict[str, Any]:
+        body = await self._helix(
+            "POST",
+            "/eventsub/subscriptions",
+            json={
+                "type": subscription_type,
+                "version": version,
+                "condition": condition,
+                "transport": {"method": "websocket", "session_id": session_id},
+            },
+        )
+        return body["data"][0]
+
+    async def _helix(self, method: str, path: str, **kwargs: Any) -> dict[str, Any]:
+        start = perf_counter()
+        status = 0
+        try:
+            resp = await self.http.request(
+                method,
+                f"{self.helix_url}{path}",
+                headers={
+                    "Authorization": f"Bearer {self.access_token}",
+                    "Client-Id": self.client_id,
+                },
+                **kwargs,
+            )
+            status = resp.status_code
+        finally:
+            if self.on_request:
+                self.on_request(method, path, status, perf_counter() - start)
+        if self.on_response:
+            self.on_response(resp.headers)
+        if resp.status_code == 204:
+            return {}
+        return self._json(resp)
+
+    def _json(self, resp: httpx.Response) -> dict[str, Any]:
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        if resp.is_error:
+            raise HelixError(
+                resp.status_code, body.get("message") or resp.reason_phrase
+            )
+        return body
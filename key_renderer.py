@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .constants import (
+    KEY_IMAGE_CACHE_SIZE,
+    KEY_LABEL_FONT_SCALE,
+    KEY_LABEL_STROKE_WIDTH,
+    KEY_SPARKLINE_HEIGHT_SCALE,
+    KEY_SPARKLINE_WIDTH,
+)
+
+Color = tuple[int, ...]
+
+
+class KeyImageRenderer:
+    """Draws fast-changing labels, e.g. counters and countdowns, onto key icons.
+
+    Redrawing a label through StreamController composes the whole key from the
+    icon, the background color and a freshly laid out text. This renderer
+    instead composes the icon over the background once per color, draws text
+    from an atlas of pre-rendered glyphs and keeps the finished images in an
+    LRU cache keyed by (icon, color, text, series). A countdown tick is then a
+    cache lookup, or a few small pastes onto the cached base image.
+
+    Returned images are shared and must not be modified.
+
+    Args:
+        cache_size: Number of finished key images to keep
+    """
+
+    def __init__(self, cache_size: int = KEY_IMAGE_CACHE_SIZE) -> None:
+        self.cache_size: int = cache_size
+        self.images: OrderedDict[
+            tuple[int, Color, str, tuple[int, ...]], Image.Image
+        ] = OrderedDict()
+        self.bases: OrderedDict[tuple[int, Color], Image.Image] = OrderedDict()
+        # Keeps cached icons alive, so their id is not reused by another image
+        self.icons: dict[int, Image.Image] = {}
+        self.glyphs: dict[tuple[int, str], Image.Image] = {}
+        # Font, top offset and line height per font size
+        self.fonts: dict[int, tuple[Any, int, int]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def render(
+        self,
+        icon: Image.Image,
+        color: Color,
+        text: str,
+        series: tuple[int, ...] = (),
+    ) -> Image.Image:
+        """Returns `icon` over a `color` background with `text` centered on it.
+
+        Args:
+            icon: Icon of the key
+            color: Background color as RGBA values
+            text: Text drawn in the center
+            series: Values drawn as a sparkline along the bottom of the key
+        """
+        key = (id(icon), tuple(color), text, tuple(series))
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+            self.icons[id(icon)] = icon
+            image = self._base(icon, key[1]).copy()
+            self._draw_sparkline(image, key[3])
+            self._draw_text(image, text)
+            self.images[key] = image
+            while len(self.images) > self.cache_size:
+                self.images.popitem(last=False)
+            return image
+
+    def get_stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.images)}
+
+    def _base(self, icon: Image.Image, color: Color) -> Image.Image:
+        """Returns the icon composed over the background, must be called with the lock held."""
+        key = (id(icon), color)
+        base = self.bases.get(key)
+        if base is None:
+            base = Image.new("RGBA", icon.size, color)
+            rgba = icon.convert("RGBA")
+            base.alpha_composite(rgba)
+            self.bases[key] = base
+            # One base per color state of each icon is enough
+            while len(self.bases) > self.cache_size // 8:
+                (icon_id, _), _ = self.bases.popitem(last=False)
+                if not any(base_id == icon_id for base_id, _ in self.bases):
+                    self._forget_icon(icon_id)
+        else:
+            self.bases.move_to_end(key)
+        return base
+
+    def _forget_icon(self, icon_id: int) -> None:
+        """Drops every image of an icon before its id can be reused."""
+        self.icons.pop(icon_id, None)
+        for key in [key for key in self.images if key[0] == icon_id]:
+            del self.images[key]
+
+    def _draw_sparkline(self, image: Image.Image, series: tuple[int, ...]) -> None:
+        if len(series) < 2:
+            return
+        low, high = min(series), max(series)
+        spread = max(high - low, 1)
+        top = int(image.height * (1 - KEY_SPARKLINE_HEIGHT_SCALE))
+        bottom = image.height - 1 - KEY_LABEL_STROKE_WIDTH
+        step = (image.width - 1) / (len(series) - 1)
+        points = [
+            (index * step, bottom - (value - low) * (bottom - top) / spread)
+            for index, value in enumerate(series)
+        ]
+        draw = ImageDraw.Draw(image)
+        draw.line(points, fill=(0, 0, 0, 255), width=KEY_SPARKLINE_WIDTH + 2)
+        draw.line(points, fill=(255, 255, 255, 255), width=KEY_SPARKLINE_WIDTH)
+
+    def _draw_text(self, image: Image.Image, text: str) -> None:
+        if not text:
+            return
+        size = max(int(image.height * KEY_LABEL_FONT_SCALE), 1)
+        glyphs = [self._glyph(size, char) for char in text]
+        # Outlines of neighbouring glyphs overlap instead of adding spacing
+        advance = [glyph.width - 2 * KEY_LABEL_STROKE_WIDTH for glyph in glyphs]
+        width = sum(advance) + 2 * KEY_LABEL_STROKE_WIDTH
+        x = (image.width - width) // 2
+        y = (image.height - glyphs[0].height) // 2
+        for glyph, step in zip(glyphs, advance):
+            image.alpha_composite(glyph, (max(x, 0), max(y, 0)))
+            x += step
+
+    def _glyph(self, size: int, char: str) -> Image.Image:
+        """Returns the pre-rendered glyph of a character, rendering it on first use."""
+        glyph = self.glyphs.get((size, char))
+        if glyph is not None:
+            return glyph
+        font, top, height = self._font(size)
+        # Every glyph of a size shares the line height, so digits line up
+        width = max(int(font.getlength(char)), 1) + 2 * KEY_LABEL_STROKE_WIDTH
+        glyph = Image.new(
+            "RGBA", (width, height + 2 * KEY_LABEL_STROKE_WIDTH), (0, 0, 0, 0)
+        )
+        ImageDraw.Draw(glyph).text(
+            (KEY_LABEL_STROKE_WIDTH, KEY_LABEL_STROKE_WIDTH - top),
+            char,
+            font=font,
+            fill=(255, 255, 255, 255),
+            stroke_width=KEY_LABEL_STROKE_WIDTH,
+            stroke_fill=(0, 0, 0, 255),
+        )
+        self.glyphs[(size, char)] = glyph
+        return glyph
+
+    def _font(self, size: int) -> tuple[Any, int, int]:
+        cached = self.fonts.get(size)
+        if cached is None:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                # Pillow before 10.1 only has a fixed size bitmap font
+                font = ImageFont.load_default()
+            _, top, _, bottom = font.getbbox("0123456789:-")
+            cached = self.fonts[size] = (font, top, bottom - top)
+        return cached
+
+
+# Shared by all keys, so glyphs and images are only rendered once
+key_renderer = KeyImageRenderer()
@@ -1,10 +1,13 @@
 import os
 import globals as gl
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
 from typing import Optional, Callable, Any
 
 from loguru import logger
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
 # Import StreamController modules
 from src.backend.PluginManager.PluginBase import PluginBase
@@ -15,14 +18,17 @@ from src.backend.DeckManagement.ImageHelpers import image2pixbuf
 
 # Import actions
 from .settings import PluginSettings
+from .constants import ACTION_WORKERS, STATE_VISIBILITY_CHECK_SECONDS
 from .actions.SendMessage import SendMessage
 from .actions.Clip import Clip
 from .actions.ShowViewers import ShowViewers
 from .actions.Marker import Marker
 from .actions.ChatMode import ChatMode
+from .actions.ChatPreset import ChatPreset
 from .actions.PlayAd import PlayAd
 from .actions.AdSchedule import AdSchedule
 from .actions.Shoutout import Shoutout
+from .actions.Stats import Stats
 
 
 class PluginTemplate(PluginBase):
@@ -33,7 +39,10 @@ class PluginTemplate(PluginBase):
     - Sending chat messages and shoutouts
     - Displaying viewer counts
     - Managing chat modes (follower-only, emote-only, slow mode, etc.)
+    - Applying and restoring chat setting presets
     - Playing ads and managing ad schedules
+    - Showing the latency of the Twitch API calls
+    - Controlling several channels, e.g. of co-streamers, through added accounts
 
     All Twitch API calls are rate-limited to prevent exceeding API limits.
     """
@@ -60,6 +69,8 @@ class PluginTemplate(PluginBase):
         self.add_color("default", [0, 0, 0, 0])
         self.add_color("warning", [255, 244, 79, 255])
         self.add_color("alert", [224, 102, 102, 255])
+        self.add_color("pending", [100, 65, 165, 255])
+        self.add_color("success", [92, 184, 92, 255])
 
     def _register_actions(self) -> None:
         self.message_action_holder = ActionHolder(
@@ -127,6 +138,19 @@ class PluginTemplate(PluginBase):
         )
         self.add_action_holder(self.chatmode_actions_holder)
 
+        self.chat_preset_action_holder = ActionHolder(
+            plugin_base=self,
+            action_base=ChatPreset,
+            action_id_suffix="ChatPreset",
+            action_name="Chat Preset",
+            action_support={
+                Input.Key: ActionInputSupport.SUPPORTED,
+                Input.Dial: ActionInputSupport.UNTESTED,
+                Input.Touchscreen: ActionInputSupport.UNTESTED,
+            },
+        )
+        self.add_action_holder(self.chat_preset_action_holder)
+
         self.playad_action_holder = ActionHolder(
             plugin_base=self,
             action_base=PlayAd,
@@ -166,31 +190,124 @@ class PluginTemplate(PluginBase):
         )
         self.add_action_holder(self.shoutout_action_holder)
 
+        self.stats_action_holder = ActionHolder(
+            plugin_base=self,
+            action_base=Stats,
+            action_id_suffix="Stats",
+            action_name="Twitch Stats",
+            action_support={
+                Input.Key: ActionInputSupport.SUPPORTED,
+                Input.Dial: ActionInputSupport.UNTESTED,
+                Input.Touchscreen: ActionInputSupport.UNTESTED,
+            },
+        )
+        self.add_action_holder(self.stats_action_holder)
+
     def _setup_backend(self) -> bool:
+        """Launches and authenticates the backend, timing every phase."""
+        timings: dict[str, float] = {}
+        start = phase_start = perf_counter()
+
+        def end_phase(name: str) -> None:
+            nonlocal phase_start
+            now = perf_counter()
+            timings[name] = now - phase_start
+            phase_start = now
+
         backend_path = os.path.join(self.PATH, "twitch_backend.py")
         self.launch_backend(
             backend_path=backend_path,
             open_in_terminal=False,
             venv_path=os.path.join(self.PATH, ".venv"),
         )
+        end_phase("launch")
         backend_ready = self.wait_for_backend(tries=5)
+        end_phase("connect")
         if not backend_ready:
             logger.error("Failed to initialize Twitch backend after 5 attempts")
+            return False
 
         settings = self.get_settings()
         client_id = settings.get("client_id", "")
         client_secret = settings.get("client_secret", "")
         auth_code = settings.get("auth_code", "")
+        accounts = settings.get("accounts", {})
 
         settings_path = os.path.join(
             gl.DATA_PATH, "settings", "plugins", self.get_plugin_id_from_folder_name()
         )
         os.makedirs(settings_path, exist_ok=True)
         self.backend.set_token_path(os.path.join(settings_path, "keys.json"))
-        if client_id and client_secret and auth_code:
-            self.backend.auth_with_code(client_id, client_secret, auth_code)
+        self.backend.set_chat_irc(settings.get("chat_irc", False))
+        self.backend.set_metrics_server(settings.get("metrics_server", False))
+        end_phase("configure")
+        if client_id and client_secret and (auth_code or accounts):
+            # All accounts authenticate at the same time
+            self.backend.auth_all(
+                client_id, client_secret, auth_code, json.dumps(accounts)
+            )
+        end_phase("auth")
+        self.refresh_state()
+        for account in accounts:
+            self.refresh_state(account)
+        end_phase("state")
+
+        self.startup_timings = {**timings, "total": perf_counter() - start}
+        logger.info(
+            "Twitch backend ready in {:.2f}s ({})".format(
+                self.startup_timings["total"],
+                ", ".join(f"{name} {duration:.2f}s" for name, duration in timings.items()),
+            )
+        )
         return True
 
+    def _start_backend(self) -> None:
+        """Runs the backend setup in the background, so StreamController can finish loading."""
+        try:
+            self.backend_initialized = self._setup_backend()
+        except Exception as ex:
+            logger.error(f"Failed to set up Twitch backend: {ex}")
+            self.backend_initialized = False
+        if not self.backend_initialized:
+            logger.warning(
+                "Twitch plugin loaded but backend failed to initialize. Please check settings."
+            )
+
+        with self._state_lock:
+            self._backend_setup_done = True
+            if self.backend_initialized:
+                self.backend_ready.set()
+            subscriptions = [
+                (account, resource, subscriber_id)
+                for (account, resource), subscribers in self._state_subscribers.items()
+                for subscriber_id in subscribers
+                if self.backend_initialized
+            ]
+            listeners = self._ready_listeners
+            self._ready_listeners = []
+        # Keys that were loaded while the backend was starting
+        for account, resource, subscriber_id in subscriptions:
+            backend = self.get_backend(account)
+            if backend:
+                backend.subscribe(resource, subscriber_id)
+        for listener in listeners:
+            GLib.idle_add(listener)
+
+    def add_ready_listener(self, listener: Callable[[], Any]) -> bool:
+        """Calls `listener` on the main loop once the backend setup finished.
+
+        Check `backend_initialized` in the listener to see if the setup succeeded.
+
+        Returns:
+            True if the setup already finished, in which case the listener is
+            not called
+        """
+        with self._state_lock:
+            if self._backend_setup_done:
+                return True
+            self._ready_listeners.append(listener)
+            return False
+
     def __init__(self) -> None:
         super().__init__(use_legacy_locale=False)
 
@@ -199,16 +316,43 @@ class PluginTemplate(PluginBase):
         self.lm.set_to_os_default()
         self._settings_manager: PluginSettings = PluginSettings(self)
         self.auth_callback_fn: Optional[Callable[[bool, str], None]] = None
+        self.account_callback_fn: Optional[Callable[[str, bool, str], None]] = None
         self.backend_initialized: bool = False
+        self.backend_ready: threading.Event = threading.Event()
+        self.startup_timings: dict[str, float] = {}
+        self._ready_listeners: list[Callable[[], Any]] = []
+        self._backend_setup_done: bool = False
+        self.action_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=ACTION_WORKERS, thread_name_prefix="twitch_action"
+        )
+        self._state_lock: threading.Lock = threading.Lock()
+        # State is kept per account and resource, the main account is ""
+        self._state_cache: dict[tuple[str, str], Any] = {}
+        self._state_versions: dict[str, int] = {}
+        self.authed: bool = False
+        self._state_subscribers: dict[
+            tuple[str, str],
+            dict[
+                str,
+                tuple[
+                    Callable[[Any], None],
+                    Callable[[str], None],
+                    Optional[Callable[[], bool]],
+                ],
+            ],
+        ] = {}
+        self._visibility_check_id: Optional[int] = None
+        self._account_backends: dict[str, Any] = {}
+        # Results of clips Twitch is still processing, by account and clip ID
+        self._clip_futures: dict[tuple[str, str], Future] = {}
+        self._clip_lock: threading.Lock = threading.Lock()
 
         self._add_icons()
         self._add_colors()
-        self.backend_initialized = self._setup_backend()
-        if not self.backend_initialized:
-            logger.warning(
-                "Twitch plugin loaded but backend failed to initialize. Please check settings."
-            )
         self._register_actions()
+        threading.Thread(
+            target=self._start_backend, daemon=True, name="twitch_backend_setup"
+        ).start()
 
         try:
             with open(
@@ -244,5 +388,231 @@ class PluginTemplate(PluginBase):
         if self.auth_callback_fn:
             self.auth_callback_fn(success, message)
 
+    def on_account_auth_callback(
+        self, account: str, success: bool, message: str = ""
+    ) -> None:
+        """Called when an added account was authenticated or failed to.
+
+        `account` is empty if adding a new account failed.
+        """
+        if not success:
+            logger.warning(
+                f"Twitch account '{account}' is not authenticated"
+                + (f": {message}" if message else "")
+            )
+        if self.account_callback_fn:
+            self.account_callback_fn(account, success, message)
+
+    def save_account(self, account: str, auth_code: str) -> None:
+        settings = self.get_settings()
+        settings["accounts"] = {**settings.get("accounts", {}), account: auth_code}
+        self.set_settings(settings)
+        with self._state_lock:
+            self._account_backends.pop(account, None)
+            subscriber_ids = [
+                (resource, subscriber_id)
+                for (subscribed, resource), subscribers in self._state_subscribers.items()
+                for subscriber_id in subscribers
+                if subscribed == account
+            ]
+        # Keys that were set up for the account before it was added
+        if subscriber_ids:
+            self.action_executor.submit(
+                self._subscribe_account, account, subscriber_ids
+            )
+
+    def remove_account(self, account: str) -> None:
+        settings = self.get_settings()
+        accounts = dict(settings.get("accounts", {}))
+        accounts.pop(account, None)
+        settings["accounts"] = accounts
+        self.set_settings(settings)
+        with self._state_lock:
+            self._account_backends.pop(account, None)
+        if self.backend_ready.is_set():
+            self.backend.remove_account(account)
+
+    def get_backend(self, account: str = "") -> Any:
+        """Returns the backend of an added account, or of the main account if `account` is empty.
+
+        Returns None if the account was not added.
+        """
+        account = account.strip().lower()
+        if not account:
+            return self.backend
+        if not self.backend_ready.is_set():
+            return None
+        with self._state_lock:
+            backend = self._account_backends.get(account)
+        if backend is not None:
+            return backend
+        try:
+            backend = self.backend.get_account(account)
+        except Exception as ex:
+            logger.debug(f"Twitch account '{account}' was not added: {ex}")
+            return None
+        with self._state_lock:
+            self._account_backends[account] = backend
+        return backend
+
+    def subscribe_state(
+        self,
+        resource: str,
+        subscriber_id: str,
+        on_update: Callable[[Any], None],
+        on_error: Callable[[str], None],
+        is_visible: Optional[Callable[[], bool]] = None,
+        account: str = "",
+    ) -> None:
+        """Subscribes an action to a shared stream state resource.
+
+        The backend polls each resource once for all subscribers. The last known
+        value is handed to new subscribers right away. Subscribers for which
+        `is_visible` returns False are dropped, so resources only shown on
+        inactive pages are not polled.
+        """
+        key = (account, resource)
+        with self._state_lock:
+            self._state_subscribers.setdefault(key, {})[subscriber_id] = (
+                on_update,
+                on_error,
+                is_visible,
+            )
+            has_cached = key in self._state_cache
+            cached = self._state_cache.get(key)
+            if is_visible and self._visibility_check_id is None:
+                self._visibility_check_id = GLib.timeout_add_seconds(
+                    STATE_VISIBILITY_CHECK_SECONDS, self._pause_hidden_subscribers
+                )
+        # Subscriptions made while the backend starts are sent once it is ready
+        if self.backend_ready.is_set():
+            backend = self.get_backend(account)
+            if backend:
+                backend.subscribe(resource, subscriber_id)
+        if has_cached:
+            on_update(cached)
+
+    def unsubscribe_state(
+        self, resource: str, subscriber_id: str, account: str = ""
+    ) -> None:
+        with self._state_lock:
+            self._state_subscribers.get((account, resource), {}).pop(
+                subscriber_id, None
+            )
+        if self.backend_ready.is_set():
+            backend = self.get_backend(account)
+            if backend:
+                backend.unsubscribe(resource, subscriber_id)
+
+    def get_cached_state(self, resource: str, account: str = "") -> Any:
+        """Returns the last known value of a shared stream state resource."""
+        with self._state_lock:
+            return self._state_cache.get((account, resource))
+
+    def refresh_state(self, account: str = "") -> bool:
+        """Fetches all shared stream state of an account from the backend in one call.
+
+        Returns:
+            True if the state changed since the last refresh
+        """
+        backend = self.get_backend(account)
+        if not backend:
+            return False
+        try:
+            snapshot = backend.get_state_snapshot(self._state_versions.get(account, -1))
+        except Exception as ex:
+            logger.error(f"Failed to fetch state snapshot: {ex}")
+            return False
+        if snapshot is None:
+            return False
+        self.on_state_snapshot(snapshot, account)
+        return True
+
+    def on_state_snapshot(self, snapshot: str, account: str = "") -> None:
+        """Applies a state snapshot and notifies the subscribers of changed resources."""
+        data = json.loads(snapshot)
+        with self._state_lock:
+            if data["version"] == self._state_versions.get(account):
+                return
+            self._state_versions[account] = data["version"]
+            if not account:
+                self.authed = data["authed"]
+            changed = []
+            for resource, value in data["resources"].items():
+                key = (account, resource)
+                if self._state_cache.get(key) == value:
+                    continue
+                self._state_cache[key] = value
+                subscribers = list(self._state_subscribers.get(key, {}).values())
+                changed.append((resource, value, subscribers))
+        for resource, value, subscribers in changed:
+            for on_update, _, _ in subscribers:
+                try:
+                    on_update(value)
+                except Exception as ex:
+                    logger.error(f"Failed to deliver '{resource}' update: {ex}")
+
+    def on_state_error(self, resource: str, message: str, account: str = "") -> None:
+        with self._state_lock:
+            subscribers = list(
+                self._state_subscribers.get((account, resource), {}).values()
+            )
+        for _, on_error, _ in subscribers:
+            try:
+                on_error(message)
+            except Exception as ex:
+                logger.error(f"Failed to deliver '{resource}' error: {ex}")
+
+    def watch_clip(self, clip_id: str, account: str = "") -> Future:
+        """Returns a future resolving to the URL of a clip once Twitch has processed it.
+
+        The future fails if the clip could not be created.
+        """
+        return self._take_clip_future(clip_id, account)
+
+    def on_clip_result(
+        self, clip_id: str, url: str, message: str, account: str = ""
+    ) -> None:
+        """Called by the backend once a clip is ready or failed to process."""
+        future = self._take_clip_future(clip_id, account)
+        if url:
+            future.set_result(url)
+        else:
+            future.set_exception(Exception(message))
+
+    def _take_clip_future(self, clip_id: str, account: str) -> Future:
+        """Returns the future of a clip, the second of `watch_clip` and `on_clip_result` removes it."""
+        key = (account, clip_id)
+        with self._clip_lock:
+            future = self._clip_futures.pop(key, None)
+            if future is None:
+                future = self._clip_futures[key] = Future()
+            return future
+
+    def _subscribe_account(
+        self, account: str, subscriptions: list[tuple[str, str]]
+    ) -> None:
+        backend = self.get_backend(account)
+        if not backend:
+            return
+        for resource, subscriber_id in subscriptions:
+            backend.subscribe(resource, subscriber_id)
+
+    def _pause_hidden_subscribers(self) -> bool:
+        with self._state_lock:
+            hidden = [
+                (account, resource, subscriber_id)
+                for (account, resource), subscribers in self._state_subscribers.items()
+                for subscriber_id, (_, _, is_visible) in subscribers.items()
+                if is_visible and not is_visible()
+            ]
+        for account, resource, subscriber_id in hidden:
+            self.unsubscribe_state(resource, subscriber_id, account)
+        with self._state_lock:
+            if any(self._state_subscribers.values()):
+                return True
+            self._visibility_check_id = None
+            return False
+
     def get_settings_area(self) -> Any:
         return self._settings_manager.get_settings_area()
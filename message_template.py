@@ -0,0 +1,123 @@
+import random
+from functools import lru_cache
+from string import Formatter
+from time import time
+from typing import Any, Callable
+
+from .constants import (
+    RESOURCE_VIEWERS,
+    RESOURCE_AD_SCHEDULE,
+    STATE_STREAM_STARTED_AT,
+)
+
+# Reads a value from the shared stream state, e.g. `get_state` of an action
+StateGetter = Callable[[str], Any]
+Part = Callable[[StateGetter], str]
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(max(seconds, 0))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+def _viewers(_: str) -> Part:
+    def render(get: StateGetter) -> str:
+        return str(get(RESOURCE_VIEWERS) or "-")
+
+    return render
+
+
+def _next_ad(_: str) -> Part:
+    def render(get: StateGetter) -> str:
+        schedule = get(RESOURCE_AD_SCHEDULE)
+        if not schedule:
+            return "-"
+        next_ad_at, _ = schedule
+        remaining = next_ad_at - time()
+        return _format_duration(remaining) if remaining > 0 else "now"
+
+    return render
+
+
+def _uptime(_: str) -> Part:
+    def render(get: StateGetter) -> str:
+        started_at = get(STATE_STREAM_STARTED_AT)
+        if not started_at:
+            return "offline"
+        return _format_duration(time() - started_at)
+
+    return render
+
+
+def _random(argument: str) -> Part:
+    choices = tuple(choice.strip() for choice in argument.split("|"))
+    return lambda _: random.choice(choices)
+
+
+# Variable name -> (factory building the part from the argument, state it reads)
+VARIABLES: dict[str, tuple[Callable[[str], Part], tuple[str, ...]]] = {
+    "viewers": (_viewers, (RESOURCE_VIEWERS,)),
+    "next_ad": (_next_ad, (RESOURCE_AD_SCHEDULE,)),
+    "uptime": (_uptime, (RESOURCE_VIEWERS,)),
+    "random": (_random, ()),
+}
+
+
+class MessageTemplate:
+    """Chat message template with variables filled from the shared stream state.
+
+    Templates use `str.format` syntax, e.g. "{viewers} viewers, next ad in
+    {next_ad}" or "{random:hi|hello|hey}". The template is parsed once, so
+    rendering only joins literal text with the variable values and never makes
+    an API call. Unknown variables are kept as they are.
+
+    Args:
+        source: Template text
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source: str = source
+        self.parts: list[Part] = []
+        # Shared state resources the template reads, these need to be polled
+        self.resources: set[str] = set()
+        self._compile()
+
+    def render(self, get: StateGetter) -> str:
+        return "".join([part(get) for part in self.parts])
+
+    def _compile(self) -> None:
+        literal: list[str] = []
+        try:
+            parsed = list(Formatter().parse(self.source))
+        except ValueError:
+            # Unbalanced braces, send the text as it is
+            parsed = [(self.source, None, None, None)]
+        for text, name, argument, _ in parsed:
+            literal.append(text)
+            if name is None:
+                continue
+            variable = VARIABLES.get(name)
+            if variable is None:
+                literal.append(f"{{{name}{f':{argument}' if argument else ''}}}")
+                continue
+            factory, resources = variable
+            self._add_literal(literal)
+            literal = []
+            self.parts.append(factory(argument or ""))
+            self.resources.update(resources)
+        self._add_literal(literal)
+
+    def _add_literal(self, literal: list[str]) -> None:
+        text = "".join(literal)
+        if text:
+            self.parts.append(lambda _: text)
+
+
+@lru_cache(maxsize=64)
+def compile_template(source: str) -> MessageTemplate:
+    """Returns the compiled template for `source`, compiling it only once."""
+    return MessageTemplate(source)
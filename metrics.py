@@ -0,0 +1,257 @@
+import inspect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Iterator, TypeVar
+
+from constants import (
+    METRICS_HISTOGRAM_PRECISION_BITS,
+    METRICS_HISTOGRAM_MAX_MICROSECONDS,
+)
+
+T = TypeVar("T")
+
+# Sorted label name/value pairs identifying one series of a metric
+Labels = tuple[tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Latency histogram with log-linear buckets in the style of HdrHistogram.
+
+    Every power of two is split into `2 ** (precision_bits - 1)` linear
+    sub-buckets, so recording is constant time, memory is fixed and quantiles
+    are exact to within about `2 ** -(precision_bits - 1)` of the value.
+
+    Args:
+        precision_bits: Number of significant bits kept per recorded value
+        max_microseconds: Largest value that can be told apart, longer
+            latencies are recorded as this value
+    """
+
+    def __init__(
+        self,
+        precision_bits: int = METRICS_HISTOGRAM_PRECISION_BITS,
+        max_microseconds: int = METRICS_HISTOGRAM_MAX_MICROSECONDS,
+    ) -> None:
+        self.precision_bits: int = precision_bits
+        self.max_microseconds: int = max_microseconds
+        self.counts: list[int] = [0] * (self._index(max_microseconds) + 1)
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+
+    def record(self, seconds: float) -> None:
+        micros = min(int(seconds * 1_000_000), self.max_microseconds)
+        self.counts[self._index(max(micros, 0))] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Returns the latency in seconds `q` of the recorded values are at or below."""
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper_bound(index) / 1_000_000, self.max)
+        return self.max
+
+    def _index(self, micros: int) -> int:
+        linear = 1 << self.precision_bits
+        if micros < linear:
+            return micros
+        shift = micros.bit_length() - self.precision_bits
+        half = linear >> 1
+        return linear + (shift - 1) * half + ((micros >> shift) - half)
+
+    def _upper_bound(self, index: int) -> int:
+        linear = 1 << self.precision_bits
+        if index < linear:
+            return index
+        half = linear >> 1
+        shift = (index - linear) // half + 1
+        sub = (index - linear) % half + half
+        return ((sub + 1) << shift) - 1
+
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms of the backend.
+
+    Metrics are identified by a name and optional labels, following the
+    Prometheus data model, so they can be exported as-is in its text format.
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.gauges: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], LatencyHistogram] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels: str) -> Iterator[None]:
+        """Records the duration of the block in `<name>_seconds`.
+
+        Failed blocks are also counted in `<name>_errors_total`.
+        """
+        start = perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", perf_counter() - start, **labels)
+
+    def merged(self, name: str) -> LatencyHistogram:
+        """Returns one histogram combining all series of the metric `name`."""
+        merged = LatencyHistogram()
+        with self.lock:
+            for (metric, _), histogram in self.histograms.items():
+                if metric == name:
+                    merged.merge(histogram)
+        return merged
+
+    def total(self, name: str) -> float:
+        """Returns the sum of all series of the counter `name`."""
+        with self.lock:
+            return sum(
+                value for (metric, _), value in self.counters.items() if metric == name
+            )
+
+    def snapshot(self) -> dict[str, list[dict[str, Any]]]:
+        """Returns all metrics as plain values."""
+        with self.lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items(), key=_key)
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.gauges.items(), key=_key)
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.total,
+                        "max": histogram.max,
+                        **{f"p{int(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                    }
+                    for (name, labels), histogram in sorted(
+                        self.histograms.items(), key=_key
+                    )
+                ],
+            }
+
+    def to_prometheus(self, prefix: str = "") -> str:
+        """Formats all metrics in the Prometheus text exposition format.
+
+        Histograms are exported as summaries with the quantiles computed here.
+        """
+        lines: list[str] = []
+        with self.lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, group in _grouped(series):
+                    lines.append(f"# TYPE {prefix}{name} {kind}")
+                    for labels, value in group:
+                        lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+            for name, group in _grouped(self.histograms):
+                lines.append(f"# TYPE {prefix}{name} summary")
+                for labels, histogram in group:
+                    for q in QUANTILES:
+                        quantile_labels = labels + (("quantile", str(q)),)
+                        lines.append(
+                            f"{prefix}{name}{_format_labels(quantile_labels)} "
+                            f"{histogram.quantile(q)}"
+                        )
+                    lines.append(
+                        f"{prefix}{name}_sum{_format_labels(labels)} {histogram.total}"
+                    )
+                    lines.append(
+                        f"{prefix}{name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def instrumented(func: Callable[..., T]) -> Callable[..., T]:
+    """Records calls, errors and latency of a method in the `metrics` of its instance.
+
+    Coroutine methods are timed until they finish, and recorded without
+    their `_async` suffix.
+    """
+    method = func.__name__.removesuffix("_async")
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            with self.metrics.timed("backend_call", method=method):
+                return await func(self, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+        with self.metrics.timed("backend_call", method=method):
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _key(item: tuple[tuple[str, Labels], Any]) -> tuple[str, Labels]:
+    return item[0]
+
+
+def _grouped(
+    series: dict[tuple[str, Labels], Any],
+) -> Iterator[tuple[str, list[tuple[Labels, Any]]]]:
+    """Groups the series of a metric type by metric name, sorted by name."""
+    groups: dict[str, list[tuple[Labels, Any]]] = {}
+    for (name, labels), value in sorted(series.items(), key=_key):
+        groups.setdefault(name, []).append((labels, value))
+    yield from groups.items()
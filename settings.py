@@ -1,4 +1,4 @@
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk, Adw, GLib
 import gi
 from typing import Any
 
@@ -11,6 +11,9 @@ gi.require_version("Adw", "1")
 
 KEY_CLIENT_SECRET = "client_secret"
 KEY_CLIENT_ID = "client_id"
+KEY_CHAT_IRC = "chat_irc"
+KEY_METRICS_SERVER = "metrics_server"
+KEY_ACCOUNTS = "accounts"
 
 
 class PluginSettings:
@@ -18,6 +21,10 @@ class PluginSettings:
     _client_id: Adw.EntryRow
     _client_secret: Adw.PasswordEntryRow
     _auth_button: Gtk.Button
+    _chat_irc: Adw.SwitchRow
+    _metrics_server: Adw.SwitchRow
+    _accounts: Gtk.ListBox
+    _add_account_button: Gtk.Button
 
     def __init__(self, plugin_base: PluginBase) -> None:
         self._plugin_base: PluginBase = plugin_base
@@ -49,11 +56,31 @@ class PluginSettings:
         self._auth_button = Gtk.Button(
             label=self._plugin_base.lm.get("actions.base.credentials.validate")
         )
+        self._chat_irc = Adw.SwitchRow(
+            title=self._plugin_base.lm.get("actions.base.chat_irc.title"),
+            subtitle=self._plugin_base.lm.get("actions.base.chat_irc.subtitle"),
+        )
+        self._metrics_server = Adw.SwitchRow(
+            title=self._plugin_base.lm.get("actions.base.metrics_server.title"),
+            subtitle=self._plugin_base.lm.get("actions.base.metrics_server.subtitle"),
+        )
+        self._accounts = Gtk.ListBox(
+            selection_mode=Gtk.SelectionMode.NONE, css_classes=["boxed-list"]
+        )
+        self._add_account_button = Gtk.Button(
+            label=self._plugin_base.lm.get("actions.base.accounts.add")
+        )
         self._auth_button.set_margin_top(10)
         self._auth_button.set_margin_bottom(10)
+        self._accounts.set_margin_top(10)
+        self._add_account_button.set_margin_top(10)
+        self._add_account_button.set_margin_bottom(10)
         self._client_id.connect("notify::text", self._on_change_client_id)
         self._client_secret.connect("notify::text", self._on_change_client_secret)
         self._auth_button.connect("clicked", self._on_auth_clicked)
+        self._chat_irc.connect("notify::active", self._on_change_chat_irc)
+        self._metrics_server.connect("notify::active", self._on_change_metrics_server)
+        self._add_account_button.connect("clicked", self._on_add_account_clicked)
 
         gh_link_label = self._plugin_base.lm.get("actions.info.link.label")
         gh_link_text = self._plugin_base.lm.get("actions.info.link.text")
@@ -63,6 +90,7 @@ class PluginSettings:
         )
 
         self._load_settings()
+        self._load_accounts()
         self._enable_auth()
 
         pref_group = Adw.PreferencesGroup()
@@ -71,6 +99,10 @@ class PluginSettings:
         pref_group.add(self._client_id)
         pref_group.add(self._client_secret)
         pref_group.add(self._auth_button)
+        pref_group.add(self._chat_irc)
+        pref_group.add(self._metrics_server)
+        pref_group.add(self._accounts)
+        pref_group.add(self._add_account_button)
         pref_group.add(gh_label)
         return pref_group
 
@@ -80,13 +112,33 @@ class PluginSettings:
         client_secret = settings.get(KEY_CLIENT_SECRET, "")
         self._client_id.set_text(client_id)
         self._client_secret.set_text(client_secret)
+        self._chat_irc.set_active(settings.get(KEY_CHAT_IRC, False))
+        self._metrics_server.set_active(settings.get(KEY_METRICS_SERVER, False))
+
+    def _load_accounts(self) -> None:
+        self._accounts.remove_all()
+        accounts = self._plugin_base.get_settings().get(KEY_ACCOUNTS, {})
+        for account in accounts:
+            row = Adw.ActionRow(
+                title=account,
+                subtitle=self._plugin_base.lm.get("actions.base.accounts.subtitle"),
+            )
+            remove_button = Gtk.Button(
+                icon_name="user-trash-symbolic",
+                valign=Gtk.Align.CENTER,
+                css_classes=["flat"],
+            )
+            remove_button.connect("clicked", self._on_remove_account_clicked, account)
+            row.add_suffix(remove_button)
+            self._accounts.append(row)
+        self._accounts.set_visible(len(accounts) > 0)
 
     def _update_status(self, message: str, is_error: bool) -> None:
         style = "twitch-controller-red" if is_error else "twitch-controller-green"
         self._status_label.set_text(message)
         self._status_label.set_css_classes([style])
 
-    def _update_settings(self, key: str, value: str) -> None:
+    def _update_settings(self, key: str, value: Any) -> None:
         settings = self._plugin_base.get_settings()
         settings[key] = value
         self._plugin_base.set_settings(settings)
@@ -101,6 +153,18 @@ class PluginSettings:
         self._update_settings(KEY_CLIENT_SECRET, val)
         self._enable_auth()
 
+    def _on_change_chat_irc(self, switch: Any, _: Any) -> None:
+        enabled = switch.get_active()
+        self._update_settings(KEY_CHAT_IRC, enabled)
+        if self._plugin_base.backend:
+            self._plugin_base.backend.set_chat_irc(enabled)
+
+    def _on_change_metrics_server(self, switch: Any, _: Any) -> None:
+        enabled = switch.get_active()
+        self._update_settings(KEY_METRICS_SERVER, enabled)
+        if self._plugin_base.backend:
+            self._plugin_base.backend.set_metrics_server(enabled)
+
     def _on_auth_clicked(self, _: Any) -> None:
         if not self._plugin_base.backend:
             self._update_status("Failed to load backend", True)
@@ -111,11 +175,26 @@ class PluginSettings:
         self._plugin_base.auth_callback_fn = self._on_auth_completed
         self._plugin_base.backend.update_client_credentials(client_id, client_secret)
 
+    def _on_add_account_clicked(self, _: Any) -> None:
+        if not self._plugin_base.backend:
+            self._update_status("Failed to load backend", True)
+            return
+        self._plugin_base.account_callback_fn = self._on_account_auth
+        self._add_account_button.set_sensitive(False)
+        self._plugin_base.backend.add_account()
+
+    def _on_remove_account_clicked(self, _: Any, account: str) -> None:
+        self._plugin_base.remove_account(account)
+        self._load_accounts()
+
     def _enable_auth(self) -> None:
         settings = self._plugin_base.get_settings()
         client_secret = settings.get(KEY_CLIENT_SECRET, "")
         client_id = settings.get(KEY_CLIENT_ID, "")
         self._auth_button.set_sensitive(len(client_id) > 0 and len(client_secret) > 0)
+        self._add_account_button.set_sensitive(
+            len(client_id) > 0 and len(client_secret) > 0
+        )
 
     def _on_auth_completed(self, success: bool, message: str = "") -> None:
         self._enable_auth()
@@ -123,3 +202,16 @@ class PluginSettings:
             lm_key = "authenticated" if success else "failed"
             message = self._plugin_base.lm.get(f"actions.base.credentials.{lm_key}")
         self._update_status(message, not success)
+
+    def _on_account_auth(self, account: str, success: bool, message: str = "") -> None:
+        # Called from the backend connection, widgets are updated on the main loop
+        GLib.idle_add(self._show_account_result, account, success, message)
+
+    def _show_account_result(self, account: str, success: bool, message: str) -> bool:
+        self._enable_auth()
+        self._load_accounts()
+        if not success:
+            if not message:
+                message = self._plugin_base.lm.get("actions.base.accounts.failed")
+            self._update_status(f"{account}: {message}" if account else message, True)
+        return False
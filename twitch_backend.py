@@ -1,87 +1,813 @@
+import asyncio
+import json
+import math
+import os
 import webbrowser
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs, urlencode
 import threading
-import requests
-from datetime import datetime, timedelta
 from collections import deque
-from functools import wraps
-from time import sleep
-from typing import Callable, Any, Optional
-from collections.abc import Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from enum import IntEnum
+from functools import partial
+from time import monotonic, time
+from typing import Awaitable, Callable, Any, Optional, TypeVar
+from collections.abc import Mapping
 
 from loguru import logger as log
-from twitchpy.client import Client
 
 from streamcontroller_plugin_tools import BackendBase
 
+from chat import ChatPipeline, IrcChatClient
+from event_loop import EventLoopThread, blocking
+from eventsub import EventSubClient
+from helix import HelixClient, HelixError, parse_timestamp
+from metrics import Metrics, instrumented
+from user_cache import UserIdCache
+from viewer_history import ViewerHistory
 from constants import (
+    ACCOUNT_TOKEN_FILE,
     OAUTH_REDIRECT_URI,
     OAUTH_PORT,
     RATE_LIMIT_CALLS,
     RATE_LIMIT_PERIOD,
+    RATE_LIMIT_SHOUTOUT_CALLS,
+    RATE_LIMIT_SHOUTOUT_PERIOD,
+    RATE_LIMIT_COMMERCIAL_CALLS,
+    RATE_LIMIT_COMMERCIAL_PERIOD,
+    RATE_LIMIT_CLIP_CALLS,
+    RATE_LIMIT_CLIP_PERIOD,
+    CLIP_PROCESSING_TIMEOUT_SECONDS,
+    CLIP_POLL_INITIAL_DELAY_SECONDS,
+    CLIP_POLL_BACKOFF_FACTOR,
+    DERIVED_STATE,
+    RESOURCE_VIEWERS,
+    RESOURCE_CHAT_SETTINGS,
+    RESOURCE_AD_SCHEDULE,
+    RESOURCE_METRICS,
+    STATE_STREAM_STARTED_AT,
+    STATE_VIEWER_TREND,
+    VIEWER_UPDATE_INTERVAL_SECONDS,
+    CHAT_MODE_UPDATE_INTERVAL_SECONDS,
+    EVENTSUB_WS_URL,
+    CHAT_IRC_URL,
+    AD_SCHEDULE_FETCH_INTERVAL_SECONDS,
+    METRICS_UPDATE_INTERVAL_SECONDS,
+    METRICS_PORT,
+    EVENTSUB_FALLBACK_POLL_INTERVAL_SECONDS,
+    POLL_IDLE_BACKOFF_FACTOR,
+    POLL_IDLE_MAX_MULTIPLIER,
+    POLL_OFFLINE_MULTIPLIER,
+    POLL_NEAR_EVENT_WINDOW_SECONDS,
+    POLL_NEAR_EVENT_INTERVAL_SECONDS,
+    TOKEN_EXPIRY_MARGIN_SECONDS,
+    TOKEN_VALIDATE_INTERVAL_SECONDS,
+    TOKEN_RETRY_DELAY_SECONDS,
+    USER_ID_CACHE_FILE,
+    USER_ID_CACHE_SIZE,
+    USER_ID_CACHE_TTL_SECONDS,
+    USER_ID_CACHE_SAVE_DELAY_SECONDS,
+    USER_ID_PREFETCH_DELAY_SECONDS,
+    USER_ID_BATCH_SIZE,
 )
 
+T = TypeVar("T")
+
+BUCKET_SHOUTOUT = "shoutout"
+BUCKET_COMMERCIAL = "commercial"
+BUCKET_CLIP = "clip"
+
+
+class RateLimitError(Exception):
+    """Raised when a call would have to wait longer than its bucket allows."""
+
+
+class TokenBucket:
+    """Token bucket that refills continuously based on a monotonic clock.
+
+    Tokens can be reserved ahead of time, which drives the balance negative.
+    The wait time returned by `reserve` tells the caller when its token becomes
+    available, so callers can wait without holding any lock.
+
+    Args:
+        capacity: Maximum number of tokens, i.e. the allowed burst size
+        period: Time in seconds it takes to refill an empty bucket
+    """
+
+    def __init__(self, capacity: int, period: float) -> None:
+        self.capacity: float = float(capacity)
+        self.refill_rate: float = capacity / period
+        self.tokens: float = float(capacity)
+        self.updated: float = monotonic()
+        self.blocked_until: float = 0
+
+    def wait_time(self, now: float) -> float:
+        """Returns the seconds until a token is available without reserving it."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.refill_rate
+        return max(wait, self.blocked_until - now)
+
+    def reserve(self, now: float) -> float:
+        """Reserves a token and returns the seconds until it may be used."""
+        wait = self.wait_time(now)
+        self.tokens -= 1
+        return wait
+
+    def sync(
+        self, remaining: int, reset_in: float, now: float, in_flight: int = 0
+    ) -> None:
+        """Lowers the local budget to what the server reports as remaining.
+
+        Args:
+            remaining: Calls the server still allows in its current window
+            reset_in: Seconds until the server's window resets
+            now: Current monotonic time
+            in_flight: Calls already made that the server has not counted yet
+        """
+        self._refill(now)
+        budget = remaining - in_flight
+        self.tokens = min(self.tokens, float(budget))
+        if budget <= 0 and reset_in > 0:
+            self.blocked_until = max(self.blocked_until, now + reset_in)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
 
 class RateLimiter:
-    """Thread-safe rate limiter using a sliding window algorithm.
+    """Thread-safe rate limiter using token buckets.
 
-    This decorator limits the number of function calls within a specified time period.
-    It uses a sliding window approach where old calls outside the time window are
-    automatically removed, and new calls are blocked if the limit is reached.
+    Every call takes a token from the global bucket, and calls to endpoints with
+    their own limits (chat messages, shoutouts, ...) additionally take a token
+    from that endpoint's bucket. `try_acquire` never waits, it tells the caller
+    how long to wait instead, so a throttled call can be put aside without
+    blocking unrelated calls. The global budget is re-synced from the
+    `Ratelimit-*` headers returned by Twitch. Calls still waiting for their
+    response are not in those headers yet, so callers report each answered
+    call with `release`.
 
     Args:
         max_calls: Maximum number of calls allowed within the time period
         period: Time period in seconds for the rate limit window
-
-    Example:
-        @RateLimiter(max_calls=100, period=60)
-        def api_call():
-            # This function will be limited to 100 calls per 60 seconds
-            pass
     """
 
+    GLOBAL_BUCKET = "global"
+
     def __init__(self, max_calls: int, period: float) -> None:
-        self.max_calls: int = max_calls
-        self.period: float = period
-        self.calls: deque[datetime] = deque()
+        self.buckets: dict[str, TokenBucket] = {
+            self.GLOBAL_BUCKET: TokenBucket(max_calls, period)
+        }
+        self.max_waits: dict[str, Optional[float]] = {}
+        # Calls that took a global token and were not answered yet
+        self.in_flight: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def add_bucket(
+        self,
+        name: str,
+        max_calls: int,
+        period: float,
+        max_wait: Optional[float] = None,
+    ) -> None:
+        """Adds a bucket for an endpoint with its own rate limit.
+
+        Args:
+            name: Name of the bucket
+            max_calls: Maximum number of calls allowed within the time period
+            period: Time period in seconds for the rate limit window
+            max_wait: Longest time in seconds a call may wait for this bucket.
+                Calls that would wait longer raise `RateLimitError` instead.
+        """
+        with self.lock:
+            self.buckets[name] = TokenBucket(max_calls, period)
+            self.max_waits[name] = max_wait
+
+    def global_wait_time(self) -> float:
+        """Returns the seconds until the global bucket has a token, without taking it."""
+        with self.lock:
+            return self.buckets[self.GLOBAL_BUCKET].wait_time(monotonic())
+
+    def try_acquire(
+        self, bucket: Optional[str] = None, global_bucket: bool = True
+    ) -> float:
+        """Takes a token only if one is available right away.
+
+        Args:
+            bucket: Endpoint bucket to take a token from
+            global_bucket: Whether to also take a token from the global bucket.
+                Disable for calls that are not made to the Helix API.
+
+        Returns:
+            0 if a token was taken, otherwise the time in seconds until one is
+            expected to be available
+
+        Raises:
+            RateLimitError: If the endpoint bucket would wait longer than its
+                configured maximum
+        """
+        with self.lock:
+            now = monotonic()
+            buckets = [self.buckets[self.GLOBAL_BUCKET]] if global_bucket else []
+            if bucket is not None:
+                max_wait = self.max_waits.get(bucket)
+                endpoint_wait = self.buckets[bucket].wait_time(now)
+                if max_wait is not None and endpoint_wait > max_wait:
+                    raise RateLimitError(
+                        f"Rate limit for '{bucket}' reached, try again in {endpoint_wait:.0f} seconds"
+                    )
+                buckets.append(self.buckets[bucket])
+            wait = max((b.wait_time(now) for b in buckets), default=0)
+            if wait > 0:
+                return wait
+            for b in buckets:
+                b.reserve(now)
+            if global_bucket:
+                self.in_flight += 1
+            return 0
+
+    def release(self) -> None:
+        """Reports that a call which took a global token was answered or failed."""
+        with self.lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Re-syncs the global budget from Twitch's `Ratelimit-*` response headers.
+
+        Called with the response of a call that is still in flight, the other
+        calls in flight are deducted from the remaining budget.
+        """
+        try:
+            remaining = int(headers["Ratelimit-Remaining"])
+            reset_at = float(headers["Ratelimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self.lock:
+            self.buckets[self.GLOBAL_BUCKET].sync(
+                remaining,
+                reset_at - time(),
+                monotonic(),
+                max(self.in_flight - 1, 0),
+            )
+
+
+class Priority(IntEnum):
+    """Priority classes for API requests, lower values run first."""
+
+    INTERACTIVE = 0
+    REFRESH = 1
+    PREFETCH = 2
+
+
+@dataclass
+class _QueuedRequest:
+    priority: Priority
+    func: Callable[[], Awaitable[Any]]
+    bucket: Optional[str]
+    key: Optional[str]
+    future: Future
+    queued_at: float = field(default_factory=monotonic)
+
+
+class RequestDispatcher:
+    """Runs API requests in priority order as rate limit tokens become available.
+
+    A scheduler task on the event loop starts the most urgent queued request
+    as soon as the rate limiter has a token for it, so key presses overtake
+    queued background polls instead of waiting in the same line. Started
+    requests run as tasks on the loop and overlap while they wait for Twitch.
+    Non-interactive requests with the same key are merged while they are
+    still queued.
+
+    Args:
+        rate_limiter: Rate limiter that decides when requests may run
+        loop: Event loop the scheduler and the requests run on
+        on_dispatch: Called with the priority and the time in seconds a
+            request waited in the queue, including its rate limit wait
+    """
+
+    def __init__(
+        self,
+        rate_limiter: RateLimiter,
+        loop: EventLoopThread,
+        on_dispatch: Optional[Callable[[Priority, float], None]] = None,
+    ) -> None:
+        self.rate_limiter: RateLimiter = rate_limiter
+        self.loop: EventLoopThread = loop
+        self.on_dispatch: Optional[Callable[[Priority, float], None]] = on_dispatch
+        self.queues: dict[Priority, deque[_QueuedRequest]] = {
+            priority: deque() for priority in Priority
+        }
+        self.queued_by_key: dict[str, _QueuedRequest] = {}
+        self.wait_totals: dict[Priority, float] = {priority: 0 for priority in Priority}
+        self.wait_max: dict[Priority, float] = {priority: 0 for priority in Priority}
+        self.dispatched: dict[Priority, int] = {priority: 0 for priority in Priority}
+        self.merged: int = 0
         self.lock: threading.Lock = threading.Lock()
+        self.wakeup: asyncio.Event = asyncio.Event()
+        # Keeps running requests alive, the loop only holds weak references
+        self.tasks: set[asyncio.Task] = set()
+        self.running: bool = True
+        self.scheduler: Future = loop.submit(self._run())
+
+    def submit(
+        self,
+        priority: Priority,
+        func: Callable[[], Awaitable[Any]],
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+        first: bool = False,
+    ) -> Future:
+        """Queues a request, can be called from any thread.
 
-    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
-        @wraps(func)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
+        Args:
+            priority: Priority class of the request
+            func: Coroutine function performing the request
+            bucket: Rate limit bucket of the endpoint, if it has its own limit
+            key: Requests with the same key are merged while queued. Ignored for
+                interactive requests, which always run.
+            first: Queue ahead of the other requests of the same priority, e.g.
+                to retry a request that already waited its turn
+
+        Returns:
+            Future resolving to the result of `func`
+        """
+        with self.lock:
+            if priority != Priority.INTERACTIVE and key is not None:
+                queued = self.queued_by_key.get(key)
+                if queued is not None:
+                    self.merged += 1
+                    return queued.future
+            request = _QueuedRequest(priority, func, bucket, key, Future())
+            if first:
+                self.queues[priority].appendleft(request)
+            else:
+                self.queues[priority].append(request)
+            if priority != Priority.INTERACTIVE and key is not None:
+                self.queued_by_key[key] = request
+        self.loop.call_soon(self.wakeup.set)
+        return request.future
+
+    def call(
+        self,
+        priority: Priority,
+        func: Callable[[], Awaitable[T]],
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> T:
+        """Queues a request and waits for its result, must not be called on the loop."""
+        return self.submit(priority, func, bucket, key).result()
+
+    async def request(
+        self,
+        priority: Priority,
+        func: Callable[[], Awaitable[T]],
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+        first: bool = False,
+    ) -> T:
+        """Queues a request and awaits its result on the loop."""
+        return await asyncio.wrap_future(self.submit(priority, func, bucket, key, first))
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Returns the queue depth and wait times per priority class."""
+        with self.lock:
+            return {
+                priority.name.lower(): {
+                    "queued": len(self.queues[priority]),
+                    "dispatched": self.dispatched[priority],
+                    "avg_wait": self.wait_totals[priority]
+                    / max(self.dispatched[priority], 1),
+                    "max_wait": self.wait_max[priority],
+                }
+                for priority in Priority
+            }
+
+    def stop(self) -> None:
+        with self.lock:
+            self.running = False
+            queued = [request for queue in self.queues.values() for request in queue]
+            for queue in self.queues.values():
+                queue.clear()
+            self.queued_by_key.clear()
+        self.loop.call_soon(self.wakeup.set)
+        for request in queued:
+            request.future.cancel()
+
+    def _take_next_request(self) -> tuple[Optional[_QueuedRequest], Optional[float]]:
+        """Dequeues the most urgent request that may run now, must be called with the lock held.
+
+        A request waiting for its own endpoint bucket is skipped, so a throttled
+        endpoint does not hold up other requests. Only a depleted global bucket
+        holds up everything.
+
+        Returns:
+            The request, or None and the seconds until a queued request may run
+        """
+        wait: Optional[float] = None
+        blocked_buckets: set[str] = set()
+        for priority in Priority:
+            for request in list(self.queues[priority]):
+                if request.bucket in blocked_buckets:
+                    continue
+                try:
+                    request_wait = self.rate_limiter.try_acquire(request.bucket)
+                except RateLimitError as ex:
+                    self._dequeue(request)
+                    request.future.set_exception(ex)
+                    continue
+                if request_wait <= 0:
+                    self._dequeue(request)
+                    return request, None
+                wait = request_wait if wait is None else min(wait, request_wait)
+                if request.bucket is None or self.rate_limiter.global_wait_time() > 0:
+                    # No other request can run before the global bucket refills
+                    return None, wait
+                blocked_buckets.add(request.bucket)
+        return None, wait
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
             with self.lock:
-                now = datetime.now()
-                # Remove calls outside the time window
-                while (
-                    self.calls and (now - self.calls[0]).total_seconds() > self.period
-                ):
-                    self.calls.popleft()
-
-                # Check if we've hit the rate limit
-                if len(self.calls) >= self.max_calls:
-                    # Calculate how long to wait
-                    oldest_call = self.calls[0]
-                    wait_time = self.period - (now - oldest_call).total_seconds()
-                    if wait_time > 0:
-                        log.warning(
-                            f"Rate limit reached, waiting {wait_time:.2f} seconds"
-                        )
-                        sleep(wait_time)
-                        # Clean up old calls again after waiting
-                        now = datetime.now()
-                        while (
-                            self.calls
-                            and (now - self.calls[0]).total_seconds() > self.period
-                        ):
-                            self.calls.popleft()
-
-                # Record this call
-                self.calls.append(datetime.now())
-
-            return func(*args, **kwargs)
-
-        return wrapper
+                if not self.running:
+                    return
+                request, wait = self._take_next_request()
+                if request is not None:
+                    waited = monotonic() - request.queued_at
+                    self.dispatched[request.priority] += 1
+                    self.wait_totals[request.priority] += waited
+                    self.wait_max[request.priority] = max(
+                        self.wait_max[request.priority], waited
+                    )
+            if request is None:
+                # Wake up early if a more urgent request comes in
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if self.on_dispatch:
+                self.on_dispatch(request.priority, waited)
+            task = asyncio.ensure_future(self._execute(request))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def _dequeue(self, request: _QueuedRequest) -> None:
+        self.queues[request.priority].remove(request)
+        if request.key is not None and self.queued_by_key.get(request.key) is request:
+            del self.queued_by_key[request.key]
+
+    async def _execute(self, request: _QueuedRequest) -> None:
+        try:
+            if not request.future.set_running_or_notify_cancel():
+                return
+            try:
+                request.future.set_result(await request.func())
+            except Exception as ex:
+                request.future.set_exception(ex)
+        finally:
+            self.rate_limiter.release()
+
+
+class StatePoller:
+    """Polls shared stream state once per interval and fans it out to subscribers.
+
+    Each registered resource (viewers, chat settings, ad schedule) is fetched at
+    most once per interval no matter how many actions display it, so API usage
+    scales with the number of distinct resources instead of the number of keys.
+    Resources without subscribers are not polled at all.
+
+    Every change to a cached value bumps `version`, and only changed values are
+    published, so unchanged polls do not cross the process boundary.
+
+    Intervals adapt to the stream: they back off while a value stays unchanged
+    or the stream is offline, and shrink shortly before a known event such as
+    the next ad. `get_intervals` returns the effective interval per resource.
+
+    Polling runs as a task on the event loop that starts a task per due
+    resource, so a slow resource does not hold up the polls of the others. A
+    resource is never polled twice at once. The callbacks may block, so they
+    run off the loop, in the order the changes happened.
+
+    Args:
+        publish: Called with the resource name and the new value whenever a
+            resource changes
+        publish_error: Called with the resource name and an error message when
+            fetching the resource fails
+        loop: Event loop the polling runs on
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, Any], None],
+        publish_error: Callable[[str, str], None],
+        loop: EventLoopThread,
+    ) -> None:
+        self.publish: Callable[[str, Any], None] = publish
+        self.publish_error: Callable[[str, str], None] = publish_error
+        self.loop: EventLoopThread = loop
+        self.resources: dict[str, tuple[Callable[[], Awaitable[Any]], float]] = {}
+        self.default_intervals: dict[str, float] = {}
+        self.subscribers: dict[str, set[str]] = {}
+        self.next_poll: dict[str, float] = {}
+        self.cache: dict[str, Any] = {}
+        self.version: int = 0
+        self.unchanged_polls: dict[str, int] = {}
+        self.derived_changes: set[str] = set()
+        self.deadlines: dict[str, float] = {}
+        self.live: bool = True
+        self.calls_made: int = 0
+        self.calls_saved: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.wakeup: asyncio.Event = asyncio.Event()
+        # Polls in progress by resource, only used on the loop
+        self.polls: dict[str, asyncio.Task] = {}
+        self.running: bool = False
+        self.task: Optional[Future] = None
+
+    def register(
+        self, resource: str, fetch: Callable[[], Awaitable[Any]], interval: float
+    ) -> None:
+        """Registers a resource that can be subscribed to.
+
+        Args:
+            resource: Name of the resource
+            fetch: Coroutine function returning the current value of the resource
+            interval: Polling interval in seconds
+        """
+        with self.lock:
+            self.resources[resource] = (fetch, interval)
+            self.default_intervals[resource] = interval
+
+    def set_interval(self, resource: str, interval: float) -> None:
+        """Changes the base polling interval of a resource, e.g. while updates are pushed."""
+        with self.lock:
+            fetch, _ = self.resources[resource]
+            self.resources[resource] = (fetch, interval)
+            self._reschedule(resource)
+        self._wake()
+
+    def set_live(self, live: bool) -> None:
+        """Backs off polling of all resources while the stream is offline."""
+        with self.lock:
+            if self.live == live:
+                return
+            self.live = live
+            for resource in self.resources:
+                self._reschedule(resource)
+        self._wake()
+
+    def set_deadline(self, resource: str, deadline: Optional[float]) -> None:
+        """Polls a resource more often shortly before a known event.
+
+        Args:
+            resource: Name of the resource
+            deadline: Monotonic time of the event, or None to clear it
+        """
+        with self.lock:
+            if deadline is None:
+                self.deadlines.pop(resource, None)
+            else:
+                self.deadlines[resource] = deadline
+            self._reschedule(resource)
+        self._wake()
+
+    def get_intervals(self) -> dict[str, Optional[float]]:
+        """Returns the effective polling interval per resource.
+
+        Resources without subscribers are not polled and map to None.
+        """
+        with self.lock:
+            return {
+                resource: (
+                    self._effective_interval(resource)
+                    if self.subscribers.get(resource)
+                    else None
+                )
+                for resource in self.resources
+            }
+
+    def reset_interval(self, resource: str) -> None:
+        self.set_interval(resource, self.default_intervals[resource])
+
+    def subscribe(self, resource: str, subscriber_id: str) -> None:
+        with self.lock:
+            if resource not in self.resources:
+                raise KeyError(f"Unknown resource '{resource}'")
+            subscribers = self.subscribers.setdefault(resource, set())
+            if not subscribers:
+                # First subscriber, fetch right away instead of waiting a full interval
+                self.next_poll[resource] = 0
+            subscribers.add(subscriber_id)
+        self.start()
+        self._wake()
+
+    def unsubscribe(self, resource: str, subscriber_id: str) -> None:
+        with self.lock:
+            self.subscribers.get(resource, set()).discard(subscriber_id)
+
+    def get_cached(self, resource: str) -> Any:
+        with self.lock:
+            return self.cache.get(resource)
+
+    def has_subscribers(self, resource: str) -> bool:
+        """Returns whether the resource is polled, i.e. whether its cached value is kept current."""
+        with self.lock:
+            return bool(self.subscribers.get(resource))
+
+    def get_snapshot(self) -> tuple[int, dict[str, Any]]:
+        """Returns the current version together with a copy of all cached values."""
+        with self.lock:
+            return self.version, dict(self.cache)
+
+    def mark_changed(self) -> None:
+        """Bumps the version for state that is tracked outside of the poller."""
+        with self.lock:
+            self.version += 1
+
+    def mark_derived_changed(self, resource: str) -> None:
+        """Publishes a resource after its next poll even if its value is unchanged.
+
+        For state derived from the resource and tracked outside of the poller,
+        such as the viewer trend, which can change while the viewer count does not.
+        """
+        with self.lock:
+            self.derived_changes.add(resource)
+
+    def push(self, resource: str, value: Any) -> None:
+        """Publishes a value that was received without polling, e.g. from EventSub.
+
+        The next poll of the resource is pushed back by a full interval.
+        """
+        with self.lock:
+            changed = self._store(resource, value)
+            self.next_poll[resource] = monotonic() + self._effective_interval(resource)
+            has_subscribers = bool(self.subscribers.get(resource))
+        if changed and has_subscribers:
+            self._notify(self.publish, resource, value)
+
+    def refresh(self, resource: str) -> None:
+        """Polls the resource right away instead of waiting for its interval."""
+        with self.lock:
+            self.next_poll[resource] = 0
+        self._wake()
+
+    def start(self) -> None:
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.task = self.loop.submit(self._run())
+
+    def stop(self) -> None:
+        with self.lock:
+            self.running = False
+        self._wake()
+
+    def _due_resources(self) -> list[tuple[str, int]]:
+        now = monotonic()
+        with self.lock:
+            return [
+                (resource, len(subscribers))
+                for resource, subscribers in self.subscribers.items()
+                if subscribers
+                and resource not in self.polls
+                and self.next_poll.get(resource, 0) <= now
+            ]
+
+    def _seconds_until_next_poll(self) -> Optional[float]:
+        now = monotonic()
+        with self.lock:
+            pending = [
+                self.next_poll.get(resource, 0) - now
+                for resource, subscribers in self.subscribers.items()
+                if subscribers and resource not in self.polls
+            ]
+        if not pending:
+            return None
+        return max(0, min(pending))
+
+    def _wake(self) -> None:
+        self.loop.call_soon(self.wakeup.set)
+
+    async def _run(self) -> None:
+        while self.running:
+            self.wakeup.clear()
+            for resource, subscriber_count in self._due_resources():
+                self._start_poll(resource, subscriber_count)
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), self._seconds_until_next_poll()
+                )
+            except asyncio.TimeoutError:
+                pass
+        for task in self.polls.values():
+            task.cancel()
+
+    def _start_poll(self, resource: str, subscriber_count: int) -> None:
+        with self.lock:
+            # Scheduled once the poll is done, unless refreshed in the meantime
+            self.next_poll[resource] = math.inf
+        task = asyncio.ensure_future(self._poll(resource, subscriber_count))
+        self.polls[resource] = task
+
+        def done(_: asyncio.Task) -> None:
+            del self.polls[resource]
+            # The resource is due again after its next interval
+            self.wakeup.set()
+
+        task.add_done_callback(done)
+
+    async def _poll(self, resource: str, subscriber_count: int) -> None:
+        with self.lock:
+            fetch, _ = self.resources[resource]
+        try:
+            value = await fetch()
+        except Exception as ex:
+            log.error(f"Failed to poll '{resource}': {ex}")
+            self._notify(self.publish_error, resource, str(ex))
+        else:
+            with self.lock:
+                changed = self._store(resource, value)
+                if not changed:
+                    self.unchanged_polls[resource] = (
+                        self.unchanged_polls.get(resource, 0) + 1
+                    )
+                    if resource in self.derived_changes:
+                        self.version += 1
+                        changed = True
+                self.derived_changes.discard(resource)
+            if changed:
+                self._notify(self.publish, resource, value)
+        with self.lock:
+            # Keep a refresh requested while the poll was running
+            self.next_poll[resource] = min(
+                self.next_poll.get(resource, 0),
+                monotonic() + self._effective_interval(resource),
+            )
+            self.calls_made += 1
+            # Without the shared poller every subscriber would have made its own call
+            self.calls_saved += subscriber_count - 1
+
+    def _store(self, resource: str, value: Any) -> bool:
+        """Caches a value, must be called with the lock held.
+
+        Returns:
+            True if the value differs from the cached one
+        """
+        if resource in self.cache and self.cache[resource] == value:
+            return False
+        self.cache[resource] = value
+        self.unchanged_polls[resource] = 0
+        self.version += 1
+        return True
+
+    def _effective_interval(self, resource: str) -> float:
+        """Returns the interval the resource is polled at, must be called with the lock held."""
+        _, interval = self.resources[resource]
+        idle_multiplier = min(
+            POLL_IDLE_BACKOFF_FACTOR ** self.unchanged_polls.get(resource, 0),
+            POLL_IDLE_MAX_MULTIPLIER,
+        )
+        effective = interval * idle_multiplier
+        if not self.live:
+            effective = max(effective, interval * POLL_OFFLINE_MULTIPLIER)
+        deadline = self.deadlines.get(resource)
+        if deadline is not None:
+            remaining = deadline - monotonic()
+            if 0 <= remaining <= POLL_NEAR_EVENT_WINDOW_SECONDS:
+                effective = min(effective, POLL_NEAR_EVENT_INTERVAL_SECONDS)
+            elif remaining > 0:
+                # Do not sleep past the start of the window
+                effective = min(
+                    effective, remaining - POLL_NEAR_EVENT_WINDOW_SECONDS
+                )
+        return effective
+
+    def _reschedule(self, resource: str) -> None:
+        """Brings the next poll forward if the effective interval got shorter."""
+        self.next_poll[resource] = min(
+            self.next_poll.get(resource, 0),
+            monotonic() + self._effective_interval(resource),
+        )
+
+    def _notify(self, callback: Callable[[str, Any], None], *args: Any) -> None:
+        try:
+            self.loop.call_in_thread(self._call, callback, *args)
+        except RuntimeError:
+            # The loop is shutting down
+            pass
+
+    def _call(self, callback: Callable[[str, Any], None], *args: Any) -> None:
+        try:
+            callback(*args)
+        except Exception as ex:
+            log.error(f"Failed to publish state for '{args[0]}': {ex}")
 
 
 def make_handler(plugin_backend: "Backend") -> type[BaseHTTPRequestHandler]:
@@ -112,7 +838,7 @@ def make_handler(plugin_backend: "Backend") -> type[BaseHTTPRequestHandler]:
             self.wfile.write(bytes(message, "utf8"))
 
             if status != 200:
-                plugin_backend.auth_failed()
+                plugin_backend.oauth_failed()
                 return
 
             plugin_backend.new_code(query_params["code"][0])
@@ -120,44 +846,363 @@ def make_handler(plugin_backend: "Backend") -> type[BaseHTTPRequestHandler]:
     return AuthHandler
 
 
-class Backend(BackendBase):
-    """Backend for Twitch API integration.
+def make_metrics_handler(plugin_backend: "Backend") -> type[BaseHTTPRequestHandler]:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = plugin_backend.get_prometheus_metrics().encode("utf8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
 
-    Handles authentication, API calls, and rate limiting for Twitch operations.
-    All API methods are automatically rate-limited to prevent exceeding Twitch's
-    API limits.
+        def log_message(self, format: str, *args: Any) -> None:
+            # Scrapes would flood the log otherwise
+            pass
+
+    return MetricsHandler
+
+
+@dataclass
+class _PendingClip:
+    deadline: float
+    next_check: float
+    delay: float = CLIP_POLL_INITIAL_DELAY_SECONDS
+
+
+class TwitchAccount:
+    """One authenticated Twitch account and the channel it broadcasts on.
+
+    Each account has its own tokens and token file, rate limit budget, request
+    queue, state poller and EventSub connection. Requests and polling of all
+    accounts run on one shared event loop, so adding accounts does not add
+    request threads.
+
+    API methods are coroutines named `*_async` that run on the loop, each
+    with a plain method of the same name without the suffix for callers
+    outside of it, such as the frontend.
+
+    Args:
+        account: Name the frontend uses for the account, its login. Empty for
+            the main account.
+        loop: Event loop shared by all accounts
+        user_cache: Username to user ID cache shared by all accounts
+        metrics: Metrics shared by all accounts
     """
 
-    def __init__(self) -> None:
-        super().__init__()
-        self.twitch: Optional[Client] = None
+    def __init__(
+        self,
+        account: str,
+        loop: EventLoopThread,
+        user_cache: UserIdCache,
+        metrics: Metrics,
+    ) -> None:
+        self.account: str = account
+        self.loop: EventLoopThread = loop
+        self.frontend: Any = None
+        # Called with the account, whether it is authenticated and an error message
+        self.on_auth_changed: Optional[
+            Callable[["TwitchAccount", bool, str], None]
+        ] = None
         self.user_id: Optional[str] = None
+        self.login: Optional[str] = None
+        # Unix timestamp the current broadcast started at, None while offline
+        self.stream_started_at: Optional[float] = None
+        self.viewer_history: ViewerHistory = ViewerHistory()
         self.token_path: Optional[str] = None
         self.client_secret: Optional[str] = None
         self.client_id: Optional[str] = None
-        self.httpd: Optional[HTTPServer] = None
-        self.httpd_thread: Optional[threading.Thread] = None
+        self.metrics: Metrics = metrics
         self.auth_code: Optional[str] = None
-        self.cached_channels: dict[str, str] = {}
+        self.token_expires_at: float = 0
+        self.token_timer: Optional[threading.Timer] = None
+        self.token_lock: threading.Lock = threading.Lock()
+        self.user_cache: UserIdCache = user_cache
+        self.prefetch_logins: set[str] = set()
+        self.prefetch_timer: Optional[threading.Timer] = None
+        self.prefetch_lock: threading.Lock = threading.Lock()
+        self.chat_settings_backup: Optional[dict[str, Any]] = None
+        self.chat_settings_lock: asyncio.Lock = asyncio.Lock()
+        # Clips Twitch is still processing by ID, only used on the loop
+        self.pending_clips: dict[str, _PendingClip] = {}
+        self.clip_task: Optional[asyncio.Task] = None
+        self.clip_wakeup: asyncio.Event = asyncio.Event()
         self.rate_limiter: RateLimiter = RateLimiter(
             RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD
         )
+        self.rate_limiter.add_bucket(
+            BUCKET_CLIP, RATE_LIMIT_CLIP_CALLS, RATE_LIMIT_CLIP_PERIOD
+        )
+        # Waiting minutes for a shoutout or an ad to go through is worse than
+        # telling the user right away
+        self.rate_limiter.add_bucket(
+            BUCKET_SHOUTOUT,
+            RATE_LIMIT_SHOUTOUT_CALLS,
+            RATE_LIMIT_SHOUTOUT_PERIOD,
+            max_wait=0,
+        )
+        self.rate_limiter.add_bucket(
+            BUCKET_COMMERCIAL,
+            RATE_LIMIT_COMMERCIAL_CALLS,
+            RATE_LIMIT_COMMERCIAL_PERIOD,
+            max_wait=0,
+        )
+        self.helix: HelixClient = HelixClient(
+            on_response=self.rate_limiter.update_from_headers,
+            on_request=self._on_helix_request,
+        )
+        self.dispatcher: RequestDispatcher = RequestDispatcher(
+            self.rate_limiter, loop, self._on_dispatch
+        )
+        self.poller: StatePoller = StatePoller(
+            self._publish_state, self._publish_state_error, loop
+        )
+        self.poller.register(
+            RESOURCE_VIEWERS,
+            partial(self.get_viewers_async, Priority.REFRESH),
+            VIEWER_UPDATE_INTERVAL_SECONDS,
+        )
+        self.poller.register(
+            RESOURCE_CHAT_SETTINGS,
+            partial(self.get_chat_settings_async, Priority.REFRESH),
+            CHAT_MODE_UPDATE_INTERVAL_SECONDS,
+        )
+        self.poller.register(
+            RESOURCE_AD_SCHEDULE,
+            partial(self.get_next_ad_async, Priority.REFRESH),
+            AD_SCHEDULE_FETCH_INTERVAL_SECONDS,
+        )
+        self.eventsub: Optional[EventSubClient] = None
+        # Resources EventSub pushes updates for while it is connected
+        self.pushed_resources: set[str] = set()
+        self.chat: ChatPipeline = ChatPipeline(self.rate_limiter, self._send_chat_helix)
+        self.use_irc: bool = False
+        self.eventsub_url: str = EVENTSUB_WS_URL
+        self.irc_url: str = CHAT_IRC_URL
+
+    def set_endpoints(
+        self,
+        helix_url: Optional[str] = None,
+        oauth_url: Optional[str] = None,
+        eventsub_url: Optional[str] = None,
+        irc_url: Optional[str] = None,
+    ) -> None:
+        """Points the backend at other Twitch endpoints, e.g. a local mock server.
+
+        Only the given URLs are changed. Call before authenticating, clients
+        that are already connected keep their URL.
+        """
+        if helix_url:
+            self.helix.helix_url = helix_url
+        if oauth_url:
+            self.helix.oauth_url = oauth_url
+        if eventsub_url:
+            self.eventsub_url = eventsub_url
+        if irc_url:
+            self.irc_url = irc_url
 
     def set_token_path(self, path: str) -> None:
         self.token_path = path
 
-    def on_disconnect(self, conn: Any) -> None:
-        if self.httpd is not None:
+    def stop(self) -> None:
+        """Stops all background work of the account and closes its connections."""
+        self._cancel_token_check()
+        with self.prefetch_lock:
+            if self.prefetch_timer is not None:
+                self.prefetch_timer.cancel()
+                self.prefetch_timer = None
+        self.poller.stop()
+        self.chat.stop()
+        self._stop_irc()
+        self.dispatcher.stop()
+        self._stop_eventsub()
+        self.loop.run(self._close_async())
+
+    async def _close_async(self) -> None:
+        if self.clip_task is not None:
+            self.clip_task.cancel()
+        self.pending_clips.clear()
+        await self.helix.aclose()
+
+    def subscribe(self, resource: str, subscriber_id: str) -> None:
+        """Subscribes an action to a shared stream state resource.
+
+        The resource is polled once per interval for all subscribers and every
+        change is pushed to the frontend as a state snapshot through
+        `on_state_snapshot`.
+
+        Subscriptions to `DERIVED_STATE` are accepted but not polled, that
+        state changes together with the resource it is derived from.
+
+        Args:
+            resource: One of the `RESOURCE_*` names from constants
+            subscriber_id: Unique ID of the subscribing action
+        """
+        if resource in DERIVED_STATE:
+            return
+        self.poller.subscribe(resource, subscriber_id)
+
+    def unsubscribe(self, resource: str, subscriber_id: str) -> None:
+        if resource in DERIVED_STATE:
+            return
+        self.poller.unsubscribe(resource, subscriber_id)
+
+    def refresh(self, resource: str) -> None:
+        """Fetches a shared stream state resource right away, e.g. when it is known to be stale."""
+        self.poller.refresh(resource)
+
+    def get_queue_stats(self) -> dict[str, dict[str, float]]:
+        """Returns queue depth and wait times per request priority class."""
+        return self.dispatcher.get_stats()
+
+    def get_calls_saved(self) -> int:
+        """Returns the number of API calls avoided by sharing polls between actions."""
+        return self.poller.calls_saved
+
+    def get_state_snapshot(self, known_version: int = -1) -> Optional[str]:
+        """Returns all shared stream state in a single call.
+
+        The snapshot is a JSON document of plain values, so it crosses the RPyC
+        boundary by value instead of as netref proxies that need further round
+        trips to read:
+
+            {"version": 3, "authed": true, "resources": {"viewers": "42", ...}}
+
+        Args:
+            known_version: Version of the last snapshot the caller has seen
+
+        Returns:
+            The JSON encoded snapshot, or None if the state has not changed
+            since `known_version`
+        """
+        version, resources = self.poller.get_snapshot()
+        if version == known_version:
+            return None
+        resources[STATE_STREAM_STARTED_AT] = self.stream_started_at
+        resources[STATE_VIEWER_TREND] = self.viewer_history.get_trend()
+        return json.dumps(
+            {"version": version, "authed": self.is_authed(), "resources": resources}
+        )
+
+    def get_viewer_history(self) -> str:
+        """Returns the viewer samples of the current stream as JSON [[timestamp, viewers], ...]."""
+        return json.dumps(self.viewer_history.get_samples())
+
+    def get_poll_intervals(self) -> dict[str, Optional[float]]:
+        """Returns the effective polling interval per resource, None while paused."""
+        return self.poller.get_intervals()
+
+    def _on_helix_request(
+        self, method: str, path: str, status: int, seconds: float
+    ) -> None:
+        endpoint = f"{method} {path}"
+        self.metrics.observe("helix_request_seconds", seconds, endpoint=endpoint)
+        self.metrics.increment(
+            "helix_responses_total", endpoint=endpoint, status=str(status)
+        )
+
+    def _on_dispatch(self, priority: Priority, waited: float) -> None:
+        self.metrics.observe(
+            "dispatcher_wait_seconds", waited, priority=priority.name.lower()
+        )
+
+    def _publish_state(self, resource: str, value: Any) -> None:
+        if resource == RESOURCE_VIEWERS:
+            self.poller.set_live(value != "Not Live")
+        elif resource == RESOURCE_AD_SCHEDULE:
+            next_ad_at, _ = value
+            self.poller.set_deadline(
+                RESOURCE_AD_SCHEDULE, monotonic() + (next_ad_at - time())
+            )
+        self.frontend.on_state_snapshot(self.get_state_snapshot(), self.account)
+
+    def _publish_state_error(self, resource: str, message: str) -> None:
+        self.frontend.on_state_error(resource, message, self.account)
+
+    def _start_eventsub(self) -> None:
+        """Starts receiving push updates for the authenticated channel.
+
+        Polling stays active as a fallback, but at a much lower rate for
+        resources that EventSub keeps up to date.
+        """
+        self._stop_eventsub()
+        self.eventsub = EventSubClient(
+            self._on_eventsub_welcome,
+            self._on_eventsub_notification,
+            self._on_eventsub_disconnect,
+            self.eventsub_url,
+        )
+        self.eventsub.start()
+
+    def _stop_eventsub(self) -> None:
+        if self.eventsub is None:
+            return
+        self.eventsub.stop()
+        self.eventsub = None
+        self._on_eventsub_disconnect()
+
+    def _on_eventsub_welcome(self, session_id: str) -> None:
+        broadcaster = {"broadcaster_user_id": self.user_id}
+        subscriptions: dict[str, tuple[dict[str, Any], Optional[str]]] = {
+            "channel.chat_settings.update": (
+                {**broadcaster, "user_id": self.user_id},
+                RESOURCE_CHAT_SETTINGS,
+            ),
+            "channel.ad_break.begin": (broadcaster, RESOURCE_AD_SCHEDULE),
+            "stream.online": (broadcaster, None),
+            "stream.offline": (broadcaster, None),
+        }
+        for subscription_type, (condition, resource) in subscriptions.items():
             try:
-                self.httpd.shutdown()
-                self.httpd.server_close()
+                self._create_eventsub_subscription(
+                    session_id, subscription_type, condition
+                )
             except Exception as ex:
-                log.error(f"Error shutting down HTTP server: {ex}")
-        self.httpd = None
-        self.httpd_thread = None
-        super().on_disconnect(conn)
+                log.warning(
+                    f"Failed to subscribe to '{subscription_type}', falling back to polling: {ex}"
+                )
+                continue
+            if resource:
+                self.pushed_resources.add(resource)
+                self.poller.set_interval(
+                    resource, EVENTSUB_FALLBACK_POLL_INTERVAL_SECONDS
+                )
 
-    def get_channel_id(self, user_name: str) -> Optional[str]:
+    def _on_eventsub_notification(
+        self, subscription_type: str, event: dict[str, Any]
+    ) -> None:
+        if subscription_type == "channel.chat_settings.update":
+            self.poller.push(RESOURCE_CHAT_SETTINGS, self._chat_state(event))
+        elif subscription_type == "channel.ad_break.begin":
+            # The next ad is rescheduled once a break starts
+            self.poller.refresh(RESOURCE_AD_SCHEDULE)
+        elif subscription_type == "stream.online":
+            self.poller.refresh(RESOURCE_VIEWERS)
+        elif subscription_type == "stream.offline":
+            self.stream_started_at = None
+            self.poller.push(RESOURCE_VIEWERS, "Not Live")
+
+    def _on_eventsub_disconnect(self) -> None:
+        self.pushed_resources.clear()
+        self.poller.reset_interval(RESOURCE_CHAT_SETTINGS)
+        self.poller.reset_interval(RESOURCE_AD_SCHEDULE)
+
+    def _create_eventsub_subscription(
+        self, session_id: str, subscription_type: str, condition: dict[str, Any]
+    ) -> None:
+        self._request(
+            Priority.REFRESH,
+            lambda: self.helix.create_eventsub_subscription(
+                subscription_type, "1", condition, session_id
+            ),
+        )
+
+    @instrumented
+    async def get_channel_id_async(self, user_name: str) -> Optional[str]:
         """Get Twitch channel ID from username.
 
         Args:
@@ -168,142 +1213,459 @@ class Backend(BackendBase):
         """
         if not user_name:
             return None
-        if user_name in self.cached_channels:
-            return self.cached_channels[user_name]
-
-        @self.rate_limiter
-        def _get_users() -> Sequence[Any]:
-            return self.twitch.get_users(None, [user_name])
+        channel_id = self.user_cache.get(user_name)
+        if channel_id:
+            return channel_id
 
-        users = _get_users()
+        users = await self._request_async(
+            Priority.INTERACTIVE, lambda: self.helix.get_users(logins=[user_name])
+        )
         if users:
-            channel_id = users[0].user_id
-            self.cached_channels[user_name] = channel_id
-            return str(channel_id)
+            channel_id = str(users[0]["id"])
+            self.user_cache.put(user_name, channel_id)
+            return channel_id
 
         return None
 
-    def create_clip(self) -> None:
-        """Create a clip of the current live stream."""
-        if not self.twitch:
+    get_channel_id = blocking(get_channel_id_async)
+
+    def prefetch_user_id(self, user_name: str) -> None:
+        """Resolves a username in the background before it is first needed.
+
+        Usernames requested within a short window are resolved together with
+        batched `get_users` calls.
+        """
+        if not user_name or not user_name.strip():
             return
-        self.validate_auth()
+        with self.prefetch_lock:
+            self.prefetch_logins.add(user_name.strip().lower())
+        self._schedule_prefetch()
 
-        @self.rate_limiter
-        def _create_clip() -> Any:
-            return self.twitch.create_clip(self.user_id)
+    def get_user_cache_stats(self) -> dict[str, int]:
+        return self.user_cache.get_stats()
 
-        _create_clip()
+    def _schedule_prefetch(self) -> None:
+        with self.prefetch_lock:
+            if not self.prefetch_logins or self.prefetch_timer is not None:
+                return
+            if not self.is_authed():
+                # Resolved once authentication succeeds
+                return
+            self.prefetch_timer = threading.Timer(
+                USER_ID_PREFETCH_DELAY_SECONDS, self._resolve_prefetched_user_ids
+            )
+            self.prefetch_timer.daemon = True
+            self.prefetch_timer.start()
+
+    def _resolve_prefetched_user_ids(self) -> None:
+        with self.prefetch_lock:
+            logins = self.user_cache.missing(list(self.prefetch_logins))
+            self.prefetch_logins.clear()
+            self.prefetch_timer = None
+        for i in range(0, len(logins), USER_ID_BATCH_SIZE):
+            batch = logins[i : i + USER_ID_BATCH_SIZE]
+            try:
+                users = self._request(
+                    Priority.PREFETCH, lambda: self.helix.get_users(logins=batch)
+                )
+            except Exception as ex:
+                log.error(f"Failed to prefetch user IDs: {ex}")
+                continue
+            self.user_cache.put_many({user["login"]: user["id"] for user in users})
 
-    def create_marker(self) -> None:
-        if not self.twitch:
-            return
-        self.validate_auth()
+    @instrumented
+    async def create_clip_async(self) -> tuple[str, str]:
+        """Create a clip of the current live stream.
+
+        Twitch processes the clip in the background. It is watched until it
+        is ready, and the result is reported through `on_clip_result` of the
+        frontend.
+
+        Returns:
+            The ID of the clip and the URL to edit it
+        """
+        if not self.is_authed():
+            raise Exception("Not authenticated")
+        clip = await self._request_async(
+            Priority.INTERACTIVE,
+            lambda: self.helix.create_clip(self.user_id),
+            bucket=BUCKET_CLIP,
+        )
+        self._watch_clip(clip["id"])
+        return clip["id"], clip["edit_url"]
 
-        @self.rate_limiter
-        def _create_marker() -> Any:
-            return self.twitch.create_stream_marker(self.user_id)
+    create_clip = blocking(create_clip_async)
 
-        _create_marker()
+    def _watch_clip(self, clip_id: str) -> None:
+        now = monotonic()
+        self.pending_clips[clip_id] = _PendingClip(
+            deadline=now + CLIP_PROCESSING_TIMEOUT_SECONDS,
+            next_check=now + CLIP_POLL_INITIAL_DELAY_SECONDS,
+        )
+        # Clips created in quick succession share one task and one request per check
+        if self.clip_task is None or self.clip_task.done():
+            self.clip_task = asyncio.ensure_future(self._poll_clips())
+        else:
+            # The new clip may be due before the clip the task is waiting for
+            self.clip_wakeup.set()
+
+    async def _poll_clips(self) -> None:
+        """Checks the pending clips with exponential backoff until each is ready or timed out."""
+        while self.pending_clips:
+            self.clip_wakeup.clear()
+            next_check = min(clip.next_check for clip in self.pending_clips.values())
+            delay = next_check - monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.clip_wakeup.wait(), delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            ids = list(self.pending_clips)
+            try:
+                clips = await self._request_async(
+                    Priority.REFRESH, lambda: self.helix.get_clips(ids)
+                )
+            except Exception as ex:
+                log.warning(f"Failed to check clips, retrying: {ex}")
+                clips = []
+            urls = {clip["id"]: clip["url"] for clip in clips}
+            now = monotonic()
+            for clip_id in ids:
+                pending = self.pending_clips[clip_id]
+                if clip_id in urls:
+                    del self.pending_clips[clip_id]
+                    self._report_clip(clip_id, urls[clip_id], "")
+                elif now >= pending.deadline:
+                    del self.pending_clips[clip_id]
+                    self._report_clip(
+                        clip_id,
+                        "",
+                        f"Clip was not ready after {CLIP_PROCESSING_TIMEOUT_SECONDS} seconds",
+                    )
+                elif pending.next_check - now <= pending.delay / 2:
+                    # Also counts for clips that were almost due, so clips created
+                    # in quick succession are checked together
+                    pending.delay *= CLIP_POLL_BACKOFF_FACTOR
+                    # The last check happens right at the deadline
+                    pending.next_check = min(now + pending.delay, pending.deadline)
+
+    def _report_clip(self, clip_id: str, url: str, message: str) -> None:
+        self.metrics.increment("clips_total", result="ready" if url else "failed")
+        # Calls into the frontend must not block the loop
+        self.loop.call_in_thread(self._publish_clip_result, clip_id, url, message)
+
+    def _publish_clip_result(self, clip_id: str, url: str, message: str) -> None:
+        try:
+            self.frontend.on_clip_result(clip_id, url, message, self.account)
+        except Exception as ex:
+            log.error(f"Failed to publish result of clip '{clip_id}': {ex}")
 
-    def get_viewers(self) -> str:
-        if not self.twitch:
-            return ""
-        self.validate_auth()
+    @instrumented
+    async def create_marker_async(self) -> None:
+        if not self.is_authed():
+            return
+        await self._request_async(
+            Priority.INTERACTIVE,
+            lambda: self.helix.create_stream_marker(self.user_id),
+        )
 
-        @self.rate_limiter
-        def _get_streams() -> Sequence[Any]:
-            return self.twitch.get_streams(first=1, user_id=self.user_id)
+    create_marker = blocking(create_marker_async)
 
-        streams = _get_streams()
+    @instrumented
+    async def get_viewers_async(self, priority: Priority = Priority.INTERACTIVE) -> str:
+        if not self.is_authed():
+            return ""
+        streams = await self._request_async(
+            priority,
+            lambda: self.helix.get_streams(self.user_id),
+            key=RESOURCE_VIEWERS,
+        )
         if not streams:
+            self.stream_started_at = None
             return "Not Live"
-        return str(streams[0].viewer_count)
+        started_at = parse_timestamp(streams[0]["started_at"]).timestamp()
+        if started_at != self.stream_started_at:
+            # A new broadcast starts a new history
+            self.viewer_history.clear()
+        self.stream_started_at = started_at
+        viewers = streams[0]["viewer_count"]
+        if self.viewer_history.add(time(), viewers):
+            # The count alone may be unchanged, the trend still has to be published
+            self.poller.mark_derived_changed(RESOURCE_VIEWERS)
+        return str(viewers)
+
+    get_viewers = blocking(get_viewers_async)
+
+    @instrumented
+    async def toggle_chat_mode_async(
+        self, mode: str, duration: Optional[int] = None
+    ) -> bool:
+        """Toggles a chat mode.
+
+        The current state is taken from the shared chat settings, which are kept
+        up to date by polling and EventSub, so only the update is sent to Twitch.
 
-    def toggle_chat_mode(self, mode: str) -> bool:
-        if not self.twitch:
+        Args:
+            mode: One of "subscriber_mode", "follower_mode", "emote_mode" or "slow_mode"
+            duration: See `set_chat_mode`
+
+        Returns:
+            True if the mode is enabled afterwards
+        """
+        if not self.is_authed():
             return False
-        self.validate_auth()
+        current = self._get_current_cached(RESOURCE_CHAT_SETTINGS)
+        if not current or mode not in current:
+            current = await self.get_chat_settings_async()
+        return await self.set_chat_mode_async(mode, not current[mode], duration)
 
-        @self.rate_limiter
-        def _get_settings() -> Any:
-            return self.twitch.get_chat_settings(self.user_id, self.user_id)
+    toggle_chat_mode = blocking(toggle_chat_mode_async)
 
-        @self.rate_limiter
-        def _update_settings(updated_value: bool) -> Any:
-            return self.twitch.update_chat_settings(
-                self.user_id, self.user_id, **{mode: updated_value}
-            )
+    @instrumented
+    async def set_chat_mode_async(
+        self, mode: str, enabled: bool, duration: Optional[int] = None
+    ) -> bool:
+        """Sets a chat mode to an explicit state, regardless of its current state.
+
+        Args:
+            mode: One of "subscriber_mode", "follower_mode", "emote_mode" or "slow_mode"
+            enabled: Whether the mode should be enabled
+            duration: Seconds between messages for slow mode, or minutes an
+                account has to follow the channel for follower mode. Only used
+                when enabling one of these modes.
+
+        Returns:
+            True if the mode is enabled afterwards, as reported by Twitch
+        """
+        if not self.is_authed():
+            return False
+        settings: dict[str, Any] = {mode: enabled}
+        if enabled and duration is not None:
+            if mode == "slow_mode":
+                settings["slow_mode_wait_time"] = duration
+            elif mode == "follower_mode":
+                settings["follower_mode_duration"] = duration
+        return (await self._update_chat_settings_async(settings))[mode]
+
+    set_chat_mode = blocking(set_chat_mode_async)
+
+    @instrumented
+    async def apply_chat_settings_async(self, **settings: Any) -> None:
+        """Applies several chat settings at once in a single request.
+
+        The settings from before the first applied preset are kept, so they can
+        be brought back with `restore_chat_settings`.
 
-        current = _get_settings()
-        updated = not getattr(current, mode)
-        _update_settings(updated)
+        Args:
+            settings: Chat settings as accepted by the Helix API, e.g.
+                `emote_mode=True, slow_mode=True, slow_mode_wait_time=30`
+        """
+        if not self.is_authed():
+            raise Exception("Not authenticated")
+        async with self.chat_settings_lock:
+            if self.chat_settings_backup is None:
+                self.chat_settings_backup = self._get_current_cached(
+                    RESOURCE_CHAT_SETTINGS
+                ) or await self.get_chat_settings_async()
+        await self._update_chat_settings_async(settings)
+
+    apply_chat_settings = blocking(apply_chat_settings_async)
+
+    @instrumented
+    async def restore_chat_settings_async(self) -> None:
+        """Restores the chat settings from before the first applied preset."""
+        if not self.is_authed():
+            raise Exception("Not authenticated")
+        async with self.chat_settings_lock:
+            backup = self.chat_settings_backup
+        if backup is None:
+            raise Exception("No chat settings to restore")
+        settings = {
+            mode: backup[mode]
+            for mode in ("subscriber_mode", "follower_mode", "emote_mode", "slow_mode")
+        }
+        if backup["slow_mode"] and backup["slow_mode_wait_time"]:
+            settings["slow_mode_wait_time"] = backup["slow_mode_wait_time"]
+        if backup["follower_mode"] and backup["follower_mode_duration"] is not None:
+            settings["follower_mode_duration"] = backup["follower_mode_duration"]
+        await self._update_chat_settings_async(settings)
+        async with self.chat_settings_lock:
+            self.chat_settings_backup = None
+
+    restore_chat_settings = blocking(restore_chat_settings_async)
+
+    def has_chat_settings_backup(self) -> bool:
+        return self.chat_settings_backup is not None
+
+    async def _update_chat_settings_async(
+        self, settings: dict[str, Any]
+    ) -> dict[str, Any]:
+        updated = await self._request_async(
+            Priority.INTERACTIVE,
+            lambda: self.helix.update_chat_settings(
+                self.user_id, self.user_id, **settings
+            ),
+        )
+        # The response holds the new settings, share them with every chat mode key
+        self.poller.push(RESOURCE_CHAT_SETTINGS, self._chat_state(updated))
         return updated
 
-    def get_chat_settings(self) -> dict[str, bool]:
-        if not self.twitch:
+    @instrumented
+    async def get_chat_settings_async(
+        self, priority: Priority = Priority.INTERACTIVE
+    ) -> dict[str, Any]:
+        if not self.is_authed():
             return {}
-        self.validate_auth()
+        current = await self._request_async(
+            priority,
+            lambda: self.helix.get_chat_settings(self.user_id, self.user_id),
+            key=RESOURCE_CHAT_SETTINGS,
+        )
+        return self._chat_state(current)
 
-        @self.rate_limiter
-        def _get_settings() -> Any:
-            return self.twitch.get_chat_settings(self.user_id, self.user_id)
+    get_chat_settings = blocking(get_chat_settings_async)
 
-        current = _get_settings()
+    def _get_current_cached(self, resource: str) -> Any:
+        """Returns the cached value of a resource, or None if it may be outdated.
+
+        The cache is only kept current while the resource is polled for a
+        subscriber or updated through EventSub, otherwise it can be hours old.
+        """
+        if resource in self.pushed_resources or self.poller.has_subscribers(resource):
+            return self.poller.get_cached(resource)
+        return None
+
+    def _chat_state(self, settings: Mapping[str, Any]) -> dict[str, Any]:
+        """Extracts the shared chat settings from a Helix response or EventSub event."""
         return {
-            "subscriber_mode": current.subscriber_mode,
-            "follower_mode": current.follower_mode,
-            "emote_mode": current.emote_mode,
-            "slow_mode": current.slow_mode,
+            "subscriber_mode": settings.get("subscriber_mode", False),
+            "follower_mode": settings.get("follower_mode", False),
+            "emote_mode": settings.get("emote_mode", False),
+            "slow_mode": settings.get("slow_mode", False),
+            "slow_mode_wait_time": settings.get(
+                "slow_mode_wait_time", settings.get("slow_mode_wait_time_seconds")
+            ),
+            "follower_mode_duration": settings.get(
+                "follower_mode_duration",
+                settings.get("follower_mode_duration_minutes"),
+            ),
         }
 
-    def send_message(self, message: str, user_name: str) -> None:
-        if not self.twitch:
-            return
-        self.validate_auth()
-        channel_id = self.get_channel_id(user_name) or self.user_id
-
-        @self.rate_limiter
-        def _send_message() -> Any:
-            return self.twitch.send_chat_message(channel_id, self.user_id, message)
+    @instrumented
+    async def send_message_async(self, message: str, user_name: str) -> None:
+        """Sends a chat message and waits until it was sent.
 
-        _send_message()
+        Messages go through the outbound chat queue, so repeated presses are
+        merged and the chat limits are never exceeded.
 
-    def snooze_ad(self) -> None:
-        if not self.twitch:
+        Args:
+            message: Message to send
+            user_name: Channel to send to, the own channel if empty
+        """
+        if not self.is_authed():
             return
-        self.validate_auth()
+        channel_id = await self.get_channel_id_async(user_name) or self.user_id
+        channel = user_name.strip() or self.login
+        # Broadcasters have the moderator chat limit in their own channel. The
+        # plugin does not check who moderates other channels, messages to them
+        # keep to the lower limit even if the user is a moderator there.
+        is_moderator = channel_id == self.user_id
+        await asyncio.wrap_future(
+            self.chat.send(channel_id, channel, message, is_moderator)
+        )
 
-        @self.rate_limiter
-        def _snooze_ad() -> Any:
-            return self.twitch.snooze_next_ad(self.user_id)
+    send_message = blocking(send_message_async)
 
-        _snooze_ad()
+    def set_chat_irc(self, enabled: bool) -> None:
+        """Sends chat messages over a persistent IRC connection instead of Helix.
 
-    def play_ad(self, length: int) -> None:
-        if not self.twitch:
+        Falls back to Helix whenever the IRC connection is not ready.
+        """
+        self.use_irc = enabled
+        if enabled and self.is_authed():
+            self._start_irc()
+        elif not enabled:
+            self._stop_irc()
+
+    def get_chat_stats(self) -> dict[str, int]:
+        """Returns counts of sent, merged, dropped, retried and failed chat messages."""
+        return self.chat.get_stats()
+
+    def _send_chat_helix(self, channel_id: str, message: str) -> None:
+        self._request(
+            Priority.INTERACTIVE,
+            lambda: self.helix.send_chat_message(channel_id, self.user_id, message),
+        )
+
+    def _start_irc(self) -> None:
+        if self.chat.irc is not None:
             return
-        self.validate_auth()
+        self.chat.irc = IrcChatClient(
+            lambda: (self.login, self.helix.access_token), self.irc_url
+        )
+        self.chat.irc.start()
 
-        @self.rate_limiter
-        def _start_commercial() -> Any:
-            return self.twitch.start_commercial(self.user_id, length)
+    def _stop_irc(self) -> None:
+        irc = self.chat.irc
+        if irc is None:
+            return
+        self.chat.irc = None
+        irc.stop()
 
-        _start_commercial()
+    @instrumented
+    async def snooze_ad_async(self) -> None:
+        if not self.is_authed():
+            return
+        schedule = await self._request_async(
+            Priority.INTERACTIVE, lambda: self.helix.snooze_next_ad(self.user_id)
+        )
+        # The response already holds the new schedule, no need to fetch it again
+        self.poller.push(
+            RESOURCE_AD_SCHEDULE,
+            (
+                parse_timestamp(schedule["next_ad_at"]).timestamp(),
+                schedule["snooze_count"],
+            ),
+        )
 
-    def get_next_ad(self) -> tuple[datetime, int]:
-        if not self.twitch:
-            return datetime.now() - timedelta(minutes=1), -1
-        self.validate_auth()
+    snooze_ad = blocking(snooze_ad_async)
 
-        @self.rate_limiter
-        def _get_ad_schedule() -> Any:
-            return self.twitch.get_ad_schedule(self.user_id)
+    @instrumented
+    async def play_ad_async(self, length: int) -> None:
+        if not self.is_authed():
+            return
+        await self._request_async(
+            Priority.INTERACTIVE,
+            lambda: self.helix.start_commercial(self.user_id, length),
+            bucket=BUCKET_COMMERCIAL,
+        )
+        # Running an ad resets the ad schedule
+        self.poller.refresh(RESOURCE_AD_SCHEDULE)
+
+    play_ad = blocking(play_ad_async)
+
+    @instrumented
+    async def get_next_ad_async(
+        self, priority: Priority = Priority.INTERACTIVE
+    ) -> tuple[float, int]:
+        """Returns the time of the next ad as a Unix timestamp and the snoozes left."""
+        if not self.is_authed():
+            return (datetime.now() - timedelta(minutes=1)).timestamp(), -1
+        schedule = await self._request_async(
+            priority,
+            lambda: self.helix.get_ad_schedule(self.user_id),
+            key=RESOURCE_AD_SCHEDULE,
+        )
+        return (
+            parse_timestamp(schedule["next_ad_at"]).timestamp(),
+            schedule["snooze_count"],
+        )
 
-        schedule = _get_ad_schedule()
-        return schedule.next_ad_at, schedule.snooze_count
+    get_next_ad = blocking(get_next_ad_async)
 
-    def send_shoutout(self, target_username: str) -> None:
+    @instrumented
+    async def send_shoutout_async(self, target_username: str) -> None:
         """Send a shoutout to the specified user.
 
         Args:
@@ -312,36 +1674,618 @@ class Backend(BackendBase):
         Raises:
             Exception: If the user is not found or the shoutout fails
         """
-        if not self.twitch:
+        if not self.is_authed():
             raise Exception("Not authenticated")
-        self.validate_auth()
 
         # Resolve username to user ID
-        target_id = self.get_channel_id(target_username)
+        target_id = await self.get_channel_id_async(target_username)
         if not target_id:
             raise Exception(f"User '{target_username}' not found")
 
-        @self.rate_limiter
-        def _send_shoutout() -> None:
-            return self.twitch.send_a_shoutout(
+        await self._request_async(
+            Priority.INTERACTIVE,
+            lambda: self.helix.send_shoutout(
                 from_broadcaster_id=self.user_id,
                 to_broadcaster_id=target_id,
                 moderator_id=self.user_id,
+            ),
+            bucket=BUCKET_SHOUTOUT,
+        )
+
+    send_shoutout = blocking(send_shoutout_async)
+
+    async def _request_async(
+        self,
+        priority: Priority,
+        func: Callable[[], Awaitable[T]],
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> T:
+        """Runs an API call through the dispatcher and awaits its result.
+
+        The access token is kept fresh by a background check, so requests never
+        wait for a refresh. Requests rejected as unauthorized, e.g. because the
+        token was revoked, are retried once after refreshing the token.
+        Requests rejected for exceeding the rate limit are queued again once,
+        ahead of the other requests of their priority, and wait until Twitch
+        resets the limit. A key press that hit the limit stays the next
+        request to run.
+
+        Args:
+            priority: Priority class of the request
+            func: Coroutine function performing the API call
+            bucket: Rate limit bucket of the endpoint, if it has its own limit
+            key: Identifies background requests that can be merged while queued
+        """
+        access_token = self.helix.access_token
+        try:
+            return await self.dispatcher.request(priority, func, bucket, key)
+        except Exception as ex:
+            if self._is_rate_limited(ex):
+                log.warning(f"Request was rate limited, retrying after the reset: {ex}")
+                self.metrics.increment("rate_limited_retries_total")
+                # The response already synced the rate limiter with the reset time
+                return await self.dispatcher.request(
+                    priority, func, bucket, key, first=True
+                )
+            if not self._is_unauthorized(ex):
+                raise
+            log.warning(f"Request was rejected as unauthorized, re-authenticating: {ex}")
+            self.metrics.increment("unauthorized_retries_total")
+            # Refreshing waits for the token lock and for its own requests on
+            # the loop, so it must not block the loop
+            await asyncio.to_thread(self._reauthenticate, access_token)
+            if not self.is_authed():
+                raise
+            return await self.dispatcher.request(priority, func, bucket, key)
+
+    def _request(
+        self,
+        priority: Priority,
+        func: Callable[[], Awaitable[T]],
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> T:
+        """Runs an API call from outside the loop, e.g. from the EventSub or chat thread."""
+        return self.loop.run(self._request_async(priority, func, bucket, key))
+
+    def _validate_token(self) -> dict[str, Any]:
+        """Asks Twitch how long the current access token stays valid."""
+        self.metrics.increment("token_validations_total")
+        info = self.loop.run(self.helix.validate())
+        self.token_expires_at = monotonic() + info["expires_in"]
+        return info
+
+    def _refresh_token(self) -> None:
+        """Gets a new access token with the refresh token and stores it."""
+        self.metrics.increment("token_refreshes_total")
+        self.loop.run(self.helix.refresh())
+        info = self._validate_token()
+        self.user_id = info["user_id"]
+        self.login = info["login"]
+        self._save_tokens(self.auth_code)
+
+    def _reauthenticate(self, rejected_token: str) -> None:
+        """Refreshes the access token after Twitch rejected `rejected_token`."""
+        with self.token_lock:
+            if self.helix.access_token != rejected_token:
+                # Another request already refreshed the token
+                return
+            try:
+                self._refresh_token()
+            except Exception as ex:
+                log.error(f"Failed to refresh the access token: {ex}")
+                self.auth_failed()
+                return
+        self._schedule_token_check(self._next_token_check())
+
+    def _is_unauthorized(self, ex: Exception) -> bool:
+        return isinstance(ex, HelixError) and ex.status == 401
+
+    def _is_rate_limited(self, ex: Exception) -> bool:
+        return isinstance(ex, HelixError) and ex.status == 429
+
+    def _next_token_check(self) -> float:
+        """Returns the delay until the token has to be validated or refreshed."""
+        remaining = self.token_expires_at - monotonic()
+        return max(
+            0,
+            min(
+                remaining - TOKEN_EXPIRY_MARGIN_SECONDS,
+                TOKEN_VALIDATE_INTERVAL_SECONDS,
+            ),
+        )
+
+    def _schedule_token_check(self, delay: float) -> None:
+        self._cancel_token_check()
+        self.token_timer = threading.Timer(delay, self._check_token)
+        self.token_timer.daemon = True
+        self.token_timer.start()
+
+    def _cancel_token_check(self) -> None:
+        if self.token_timer is not None:
+            self.token_timer.cancel()
+            self.token_timer = None
+
+    def _check_token(self) -> None:
+        """Validates the access token and refreshes it before it expires.
+
+        Runs on a timer, so the token is refreshed in the background instead of
+        in the path of a request.
+        """
+        with self.token_lock:
+            if not self.is_authed():
+                return
+            try:
+                try:
+                    self._validate_token()
+                except HelixError as ex:
+                    if ex.status != 401:
+                        raise
+                    self.token_expires_at = 0
+                if monotonic() >= self.token_expires_at - TOKEN_EXPIRY_MARGIN_SECONDS:
+                    log.info("Access token is about to expire, refreshing it")
+                    self._refresh_token()
+            except HelixError as ex:
+                log.error(f"Failed to refresh the access token: {ex}")
+                self.auth_failed()
+                return
+            except Exception as ex:
+                # Most likely offline, the token may still be valid
+                log.warning(f"Failed to check the access token, retrying: {ex}")
+                self._schedule_token_check(TOKEN_RETRY_DELAY_SECONDS)
+                return
+        self._schedule_token_check(self._next_token_check())
+
+    def auth_with_code(
+        self, client_id: str, client_secret: str, auth_code: str
+    ) -> None:
+        try:
+            self.helix.client_id = client_id
+            self.helix.client_secret = client_secret
+            self.auth_code = auth_code
+            tokens = self._load_tokens()
+            restored = self._restore_tokens(tokens, auth_code)
+            if not restored:
+                if tokens.get("CODE") == auth_code and tokens.get("REFRESH_USER_TOKEN"):
+                    # Authorization codes can only be exchanged once
+                    self.helix.refresh_token = tokens["REFRESH_USER_TOKEN"]
+                    self.loop.run(self.helix.refresh())
+                else:
+                    self.loop.run(
+                        self.helix.exchange_code(auth_code, OAUTH_REDIRECT_URI)
+                    )
+                info = self._validate_token()
+                self.user_id = info["user_id"]
+                self.login = info["login"]
+                self._save_tokens(auth_code)
+
+            self.client_id = client_id
+            self.client_secret = client_secret
+            self.poller.mark_changed()
+            self._notify_authenticated(auth_code)
+            self._start_eventsub()
+            if self.use_irc:
+                self._start_irc()
+            self._schedule_prefetch()
+            # Stored tokens are validated right away, Twitch requires it on startup
+            self._schedule_token_check(0 if restored else self._next_token_check())
+        except Exception as e:
+            log.error("failed to authenticate", e)
+            self.auth_failed()
+
+    def _restore_tokens(self, tokens: dict[str, str], auth_code: str) -> bool:
+        """Uses the stored tokens as they are if they were issued for `auth_code`.
+
+        This avoids any request to Twitch on startup. The background token
+        check validates the token right after, and requests rejected with the
+        stored token refresh it.
+
+        Returns:
+            Whether the stored tokens are usable
+        """
+        try:
+            expires_at = float(tokens.get("EXPIRES_AT", 0))
+        except ValueError:
+            return False
+        remaining = expires_at - time()
+        if (
+            tokens.get("CODE") != auth_code
+            or not tokens.get("USER_TOKEN")
+            or not tokens.get("USER_ID")
+            or remaining <= TOKEN_EXPIRY_MARGIN_SECONDS
+        ):
+            return False
+        self.helix.access_token = tokens["USER_TOKEN"]
+        self.helix.refresh_token = tokens.get("REFRESH_USER_TOKEN", "")
+        self.user_id = tokens["USER_ID"]
+        self.login = tokens.get("LOGIN") or None
+        self.token_expires_at = monotonic() + remaining
+        return True
+
+    def _load_tokens(self) -> dict[str, str]:
+        """Reads the token file, which uses the KEY=VALUE format of twitchpy."""
+        tokens: dict[str, str] = {}
+        if not self.token_path or not os.path.isfile(self.token_path):
+            return tokens
+        try:
+            with open(self.token_path, "r", encoding="UTF-8") as f:
+                for line in f:
+                    key, _, value = line.strip().partition("=")
+                    if key:
+                        tokens[key] = value
+        except OSError as ex:
+            log.error(f"Failed to read token file: {ex}")
+        return tokens
+
+    def _save_tokens(self, auth_code: str) -> None:
+        if not self.token_path:
+            return
+        # Wall clock time, so the expiry stays meaningful across restarts
+        expires_at = time() + max(self.token_expires_at - monotonic(), 0)
+        with open(self.token_path, "w", encoding="UTF-8") as f:
+            f.write(
+                f"USER_TOKEN={self.helix.access_token}\n"
+                f"REFRESH_USER_TOKEN={self.helix.refresh_token}\n"
+                f"CODE={auth_code}\n"
+                f"USER_ID={self.user_id or ''}\n"
+                f"LOGIN={self.login or ''}\n"
+                f"EXPIRES_AT={int(expires_at)}"
+            )
+
+    def auth_failed(self, message: str = "") -> None:
+        self.user_id = None
+        self._cancel_token_check()
+        self._stop_irc()
+        self.poller.mark_changed()
+        self._stop_eventsub()
+        self._notify_auth_failed(message)
+
+    def is_authed(self) -> bool:
+        return self.user_id != None
+
+    def _notify_authenticated(self, auth_code: str) -> None:
+        if self.on_auth_changed:
+            self.on_auth_changed(self, True, "")
+
+    def _notify_auth_failed(self, message: str) -> None:
+        if self.on_auth_changed:
+            self.on_auth_changed(self, False, message)
+
+
+class Backend(TwitchAccount, BackendBase):
+    """Backend for Twitch API integration.
+
+    Handles authentication, API calls, and rate limiting for Twitch operations.
+    All API methods are automatically rate-limited to prevent exceeding Twitch's
+    API limits.
+
+    The backend itself is the main account. Further accounts, e.g. of a
+    co-streamer, are added with `add_account` and reached through
+    `get_account`. They use the same Twitch app and share the event loop,
+    the user ID cache and the metrics with the main account.
+
+    Args:
+        connect: Whether to connect to the frontend. Without a connection the
+            backend can be driven directly, e.g. by the benchmarks in `bench`,
+            and `frontend` has to be set by the caller.
+    """
+
+    def __init__(self, connect: bool = True) -> None:
+        # Requests of all accounts run on one loop instead of a thread pool per account
+        self.loop: EventLoopThread = EventLoopThread()
+        TwitchAccount.__init__(
+            self,
+            "",
+            self.loop,
+            UserIdCache(
+                USER_ID_CACHE_SIZE,
+                USER_ID_CACHE_TTL_SECONDS,
+                USER_ID_CACHE_SAVE_DELAY_SECONDS,
+            ),
+            Metrics(),
+        )
+        self.poller.register(
+            RESOURCE_METRICS,
+            self._get_latency_summary,
+            METRICS_UPDATE_INTERVAL_SECONDS,
+        )
+        self.httpd: Optional[HTTPServer] = None
+        self.httpd_thread: Optional[threading.Thread] = None
+        self.metrics_httpd: Optional[HTTPServer] = None
+        self.accounts: dict[str, TwitchAccount] = {}
+        self.accounts_lock: threading.Lock = threading.Lock()
+        # Set while the browser authorizes an account to add
+        self.adding_account: bool = False
+        if connect:
+            # Connects to the frontend, so everything above has to be set up first
+            BackendBase.__init__(self)
+
+    def set_token_path(self, path: str) -> None:
+        super().set_token_path(path)
+        self.user_cache.load(os.path.join(os.path.dirname(path), USER_ID_CACHE_FILE))
+
+    def on_disconnect(self, conn: Any) -> None:
+        if self.httpd is not None:
+            try:
+                self.httpd.shutdown()
+                self.httpd.server_close()
+            except Exception as ex:
+                log.error(f"Error shutting down HTTP server: {ex}")
+        self.httpd = None
+        self.httpd_thread = None
+        for account in self._get_added_accounts():
+            account.stop()
+        self.stop()
+        self.loop.stop()
+        self.user_cache.flush()
+        super().on_disconnect(conn)
+
+    def auth_all(
+        self,
+        client_id: str,
+        client_secret: str,
+        auth_code: str,
+        accounts: str = "{}",
+    ) -> None:
+        """Authenticates the main account and all added accounts at the same time.
+
+        Accounts with stored tokens authenticate without a request to Twitch,
+        the others exchange their tokens in parallel, so startup time does not
+        grow with the number of accounts.
+
+        Args:
+            client_id: Client ID of the Twitch app
+            client_secret: Client secret of the Twitch app
+            auth_code: Authorization code of the main account, may be empty
+            accounts: JSON object mapping the login of each added account to
+                its authorization code
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        logins: list[tuple[TwitchAccount, str]] = []
+        if auth_code:
+            logins.append((self, auth_code))
+        for login, code in json.loads(accounts).items():
+            account = self._create_account(login)
+            self._register_account(account)
+            logins.append((account, code))
+
+        async def authenticate() -> None:
+            # Authentication saves tokens and notifies the frontend, so it runs off the loop
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        account.auth_with_code, client_id, client_secret, code
+                    )
+                    for account, code in logins
+                )
+            )
+
+        self.loop.run(authenticate())
+
+    def get_account(self, account: str = "") -> TwitchAccount:
+        """Returns an added account by its login, the main account if `account` is empty.
+
+        Raises:
+            KeyError: If no account with that login was added
+        """
+        account = account.strip().lower()
+        if not account:
+            return self
+        with self.accounts_lock:
+            found = self.accounts.get(account)
+        if found is None:
+            raise KeyError(f"Unknown account '{account}'")
+        return found
+
+    def get_accounts(self) -> str:
+        """Returns the added accounts as JSON {login: authenticated, ...}."""
+        return json.dumps(
+            {
+                account.account: account.is_authed()
+                for account in self._get_added_accounts()
+            }
+        )
+
+    def remove_account(self, account: str) -> None:
+        """Stops using an added account and deletes its stored tokens."""
+        with self.accounts_lock:
+            removed = self.accounts.pop(account, None)
+        if removed is None:
+            return
+        removed.stop()
+        if removed.token_path and os.path.isfile(removed.token_path):
+            try:
+                os.remove(removed.token_path)
+            except OSError as ex:
+                log.error(f"Failed to delete token file of '{account}': {ex}")
+
+    def set_chat_irc(self, enabled: bool) -> None:
+        super().set_chat_irc(enabled)
+        for account in self._get_added_accounts():
+            account.set_chat_irc(enabled)
+
+    def _get_added_accounts(self) -> list[TwitchAccount]:
+        with self.accounts_lock:
+            return list(self.accounts.values())
+
+    def _create_account(self, account: str) -> TwitchAccount:
+        created = TwitchAccount(account, self.loop, self.user_cache, self.metrics)
+        created.frontend = self.frontend
+        created.on_auth_changed = self._on_account_auth_changed
+        created.set_endpoints(
+            self.helix.helix_url, self.helix.oauth_url, self.eventsub_url, self.irc_url
+        )
+        created.use_irc = self.use_irc
+        if account:
+            created.token_path = self._account_token_path(account)
+        return created
+
+    def _register_account(self, account: TwitchAccount) -> None:
+        with self.accounts_lock:
+            previous = self.accounts.get(account.account)
+            self.accounts[account.account] = account
+        if previous is not None and previous is not account:
+            # Authorized again, e.g. after its token was revoked
+            previous.stop()
+
+    def _account_token_path(self, account: str) -> Optional[str]:
+        if not self.token_path:
+            return None
+        return os.path.join(
+            os.path.dirname(self.token_path), ACCOUNT_TOKEN_FILE.format(account=account)
+        )
+
+    def _add_account(self, auth_code: str) -> None:
+        """Authenticates a new account with the code from the OAuth flow."""
+        # Named after its login, which is only known once it is authenticated
+        account = self._create_account("")
+        account.auth_with_code(self.client_id, self.client_secret, auth_code)
+        if not account.is_authed() or not account.login:
+            account.stop()
+            self.frontend.on_account_auth_callback("", False, "")
+            return
+        if account.login == self.login:
+            account.stop()
+            self.frontend.on_account_auth_callback(
+                "", False, f"'{account.login}' is already the main account"
+            )
+            return
+        account.account = account.login
+        account.token_path = self._account_token_path(account.login)
+        account._save_tokens(auth_code)
+        self._register_account(account)
+        self.frontend.save_account(account.account, auth_code)
+        self.frontend.on_account_auth_callback(account.account, True, "")
+
+    def _on_account_auth_changed(
+        self, account: TwitchAccount, authed: bool, message: str
+    ) -> None:
+        if not account.account:
+            # Still being added, `_add_account` reports the result
+            return
+        self.frontend.on_account_auth_callback(account.account, authed, message)
+
+    def _notify_authenticated(self, auth_code: str) -> None:
+        self.frontend.save_auth_settings(self.client_id, self.client_secret, auth_code)
+        self.frontend.on_auth_callback(True)
+
+    def _notify_auth_failed(self, message: str) -> None:
+        self.frontend.on_auth_callback(False, message)
+
+    def get_metrics(self) -> str:
+        """Returns all backend metrics as a JSON document.
+
+        Latencies are in seconds and summarized as p50, p95 and p99:
+
+            {"counters": [...], "gauges": [...], "histograms": [
+                {"name": "backend_call_seconds", "labels": {"method": "get_viewers"},
+                 "count": 12, "sum": 1.8, "max": 0.4, "p50": 0.12, ...}]}
+        """
+        self._collect_gauges()
+        return json.dumps(self.metrics.snapshot())
+
+    def get_prometheus_metrics(self) -> str:
+        """Returns all backend metrics in the Prometheus text format."""
+        self._collect_gauges()
+        return self.metrics.to_prometheus("twitch_")
+
+    def set_metrics_server(self, enabled: bool) -> None:
+        """Serves the metrics for Prometheus on http://localhost:<METRICS_PORT>/metrics."""
+        if not enabled:
+            if self.metrics_httpd is not None:
+                self.metrics_httpd.shutdown()
+                self.metrics_httpd.server_close()
+                self.metrics_httpd = None
+            return
+        if self.metrics_httpd is not None:
+            return
+        try:
+            self.metrics_httpd = HTTPServer(
+                ("localhost", METRICS_PORT), make_metrics_handler(self)
+            )
+        except Exception as ex:
+            log.error(f"Failed to create metrics server on port {METRICS_PORT}: {ex}")
+            return
+        threading.Thread(
+            target=self.metrics_httpd.serve_forever, daemon=True, name="metrics"
+        ).start()
+
+    def _collect_gauges(self) -> None:
+        """Copies the statistics kept by the other components into the metrics."""
+        for name, value in self.user_cache.get_stats().items():
+            self.metrics.set_gauge(f"user_cache_{name}", value)
+        for account in [self, *self._get_added_accounts()]:
+            login = account.login or account.account
+            for priority, stats in account.dispatcher.get_stats().items():
+                self.metrics.set_gauge(
+                    "dispatcher_queued", stats["queued"], priority=priority, account=login
+                )
+                self.metrics.set_gauge(
+                    "dispatcher_max_wait_seconds",
+                    stats["max_wait"],
+                    priority=priority,
+                    account=login,
+                )
+            for name, value in account.chat.get_stats().items():
+                self.metrics.set_gauge(f"chat_messages_{name}", value, account=login)
+            self.metrics.set_gauge(
+                "poll_calls_made", account.poller.calls_made, account=login
+            )
+            self.metrics.set_gauge(
+                "poll_calls_saved", account.poller.calls_saved, account=login
             )
 
-        _send_shoutout()
+    async def _get_latency_summary(self) -> dict[str, int]:
+        """Summarizes the backend call latency for the stats action."""
+        latencies = self.metrics.merged("backend_call_seconds")
+        return {
+            "p95_ms": round(latencies.quantile(0.95) * 1000),
+            "calls": latencies.count,
+            "errors": int(self.metrics.total("backend_call_errors_total")),
+        }
 
     def update_client_credentials(self, client_id: str, client_secret: str) -> None:
         if None in (client_id, client_secret) or "" in (client_id, client_secret):
             return
         self.client_id = client_id
         self.client_secret = client_secret
+        self.adding_account = False
+        self._start_oauth()
+
+    def add_account(self) -> None:
+        """Starts the OAuth flow for another account, e.g. of a co-streamer.
+
+        Twitch asks which account to authorize even if the browser is logged
+        in, so the user can switch accounts. The result is reported through
+        `on_account_auth_callback` of the frontend.
+        """
+        if not self.client_id or not self.client_secret:
+            self.frontend.on_account_auth_callback(
+                "", False, "Validate the Twitch app credentials first"
+            )
+            return
+        self.adding_account = True
+        self._start_oauth(force_verify=True)
+
+    def oauth_failed(self, message: str = "") -> None:
+        """Called when the authorization in the browser did not succeed."""
+        if self.adding_account:
+            self.adding_account = False
+            self.frontend.on_account_auth_callback("", False, message)
+            return
+        self.auth_failed(message)
+
+    def _start_oauth(self, force_verify: bool = False) -> None:
         params = {
-            "client_id": client_id,
+            "client_id": self.client_id,
             "redirect_uri": OAUTH_REDIRECT_URI,
             "response_type": "code",
-            "scope": "user:write:chat channel:manage:broadcast moderator:manage:chat_settings clips:edit channel:read:subscriptions channel:edit:commercial channel:manage:ads channel:read:ads moderator:manage:shoutouts",
+            "scope": "user:read:chat user:write:chat chat:edit channel:manage:broadcast moderator:manage:chat_settings clips:edit channel:read:subscriptions channel:edit:commercial channel:manage:ads channel:read:ads moderator:manage:shoutouts",
         }
+        if force_verify:
+            params["force_verify"] = "true"
         encoded_params = urlencode(params)
 
         # Clean up existing server if it exists
@@ -357,7 +2301,7 @@ class Backend(BackendBase):
             self.httpd = HTTPServer(("localhost", OAUTH_PORT), make_handler(self))
         except Exception as ex:
             log.error(f"Failed to create HTTP server on port {OAUTH_PORT}: {ex}")
-            self.auth_failed("Failed to start local authentication server")
+            self.oauth_failed("Failed to start local authentication server")
             return
 
         # Create and start server thread
@@ -368,64 +2312,21 @@ class Backend(BackendBase):
         if not self.httpd_thread.is_alive():
             self.httpd_thread.start()
 
-        url = f"https://id.twitch.tv/oauth2/authorize?{encoded_params}"
-        check = requests.get(url, timeout=5)
-        if check.status_code != 200:
-            message = (
-                check.json().get("message") if check.json() else "Incorrect Client ID"
-            )
-            self.auth_failed(message)
+        message = self.loop.run(self.helix.check_client_id(params))
+        if message:
+            self.oauth_failed(message)
             return
 
-        webbrowser.open(f"https://id.twitch.tv/oauth2/authorize?{encoded_params}")
+        webbrowser.open(f"{self.helix.oauth_url}/authorize?{encoded_params}")
 
     def new_code(self, auth_code: str) -> None:
+        if self.adding_account:
+            self.adding_account = False
+            self._add_account(auth_code)
+            return
         self.auth_with_code(self.client_id, self.client_secret, auth_code)
 
-    def validate_auth(self) -> None:
-        try:
-
-            @self.rate_limiter
-            def _validate() -> Sequence[Any]:
-                return self.twitch.get_streams(first=1, user_id=self.user_id)
-
-            _ = _validate()
-        except Exception as ex:
-            self.auth_with_code(self.client_id, self.client_secret, self.auth_code)
-
-    def auth_with_code(
-        self, client_id: str, client_secret: str, auth_code: str
-    ) -> None:
-        try:
-            self.twitch = Client(
-                client_id=client_id,
-                client_secret=client_secret,
-                tokens_path=self.token_path,
-                redirect_uri=OAUTH_REDIRECT_URI,
-                authorization_code=auth_code,
-            )
-
-            @self.rate_limiter
-            def _get_users() -> Sequence[Any]:
-                return self.twitch.get_users()
-
-            users = _get_users()
-            self.auth_code = auth_code
-            self.user_id = users[0].user_id
-            self.client_id = client_id
-            self.client_secret = client_secret
-            self.frontend.save_auth_settings(client_id, client_secret, auth_code)
-            self.frontend.on_auth_callback(True)
-        except Exception as e:
-            log.error("failed to authenticate", e)
-            self.auth_failed()
-
-    def auth_failed(self, message: str = "") -> None:
-        self.user_id = None
-        self.frontend.on_auth_callback(False, message)
-
-    def is_authed(self) -> bool:
-        return self.user_id != None
-
 
-backend = Backend()
+if __name__ == "__main__":
+    # StreamController runs this file as a script to launch the backend
+    backend = Backend()
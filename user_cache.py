@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Optional
+
+from loguru import logger as log
+
+
+class UserIdCache:
+    """LRU cache of Twitch login to user ID mappings with a time to live.
+
+    User IDs never change for a login, but logins can be renamed and reused, so
+    entries expire after `ttl` seconds. The cache is persisted to disk so the
+    first lookup after a restart does not need an API call.
+
+    Changes are written to disk by a timer `save_delay` seconds later, so
+    storing an entry never waits for the disk, e.g. on the backend event loop,
+    and several lookups in a row are written at once.
+
+    Args:
+        max_size: Maximum number of cached logins
+        ttl: Time in seconds an entry stays valid
+        save_delay: Time in seconds changes are collected before they are written
+    """
+
+    def __init__(self, max_size: int, ttl: float, save_delay: float = 0) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.save_delay: float = save_delay
+        self.path: Optional[str] = None
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.save_lock: threading.Lock = threading.Lock()
+        self.save_timer: Optional[threading.Timer] = None
+        self.dirty: bool = False
+
+    def load(self, path: str) -> None:
+        """Loads persisted entries and persists future changes to `path`."""
+        with self.lock:
+            self.path = path
+            try:
+                with open(path, "r", encoding="UTF-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return
+            except Exception as ex:
+                log.error(f"Failed to load user ID cache: {ex}")
+                return
+            now = time()
+            for login, (user_id, expires_at) in data.items():
+                if expires_at > now:
+                    self.entries[login] = (user_id, expires_at)
+            self._evict()
+
+    def get(self, login: str) -> Optional[str]:
+        login = login.lower()
+        with self.lock:
+            entry = self.entries.get(login)
+            if entry is None or entry[1] <= time():
+                self.entries.pop(login, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(login)
+            self.hits += 1
+            return entry[0]
+
+    def put_many(self, users: dict[str, str]) -> None:
+        """Stores several login to user ID mappings and persists them."""
+        expires_at = time() + self.ttl
+        with self.lock:
+            for login, user_id in users.items():
+                login = login.lower()
+                self.entries[login] = (str(user_id), expires_at)
+                self.entries.move_to_end(login)
+            self._evict()
+            self._schedule_save()
+
+    def put(self, login: str, user_id: str) -> None:
+        self.put_many({login: user_id})
+
+    def missing(self, logins: list[str]) -> list[str]:
+        """Returns the logins without a valid entry, without counting lookups."""
+        now = time()
+        with self.lock:
+            return [
+                login.lower()
+                for login in logins
+                if self.entries.get(login.lower(), ("", 0))[1] <= now
+            ]
+
+    def get_stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def flush(self) -> None:
+        """Writes pending changes to disk right away, e.g. before shutting down."""
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if not self.dirty or not self.path:
+                return
+            self.dirty = False
+            path = self.path
+            entries = dict(self.entries)
+        # Written outside of the lock, so lookups do not wait for the disk
+        with self.save_lock:
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="UTF-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, path)
+            except Exception as ex:
+                log.error(f"Failed to save user ID cache: {ex}")
+
+    def _schedule_save(self) -> None:
+        """Starts the save timer unless it is running, must be called with the lock held."""
+        self.dirty = True
+        if not self.path or self.save_timer is not None:
+            return
+        self.save_timer = threading.Timer(self.save_delay, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
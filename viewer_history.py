@@ -0,0 +1,114 @@
+import threading
+from array import array
+from typing import Any
+
+from constants import (
+    VIEWER_HISTORY_SIZE,
+    VIEWER_SPARKLINE_BUCKETS,
+    VIEWER_SPARKLINE_BUCKET_SECONDS,
+)
+
+
+class ViewerHistory:
+    """Ring buffer of timestamped viewer counts of the current stream.
+
+    Samples are stored in two preallocated unsigned 32 bit arrays, so a full
+    buffer takes 8 bytes per sample. The sparkline (the last viewer count of
+    each of the last `buckets` time buckets), the peak and the delta are
+    updated with every sample instead of being recomputed from the history.
+
+    Args:
+        capacity: Maximum number of samples, the oldest ones are overwritten
+        buckets: Number of points of the sparkline
+        bucket_seconds: Time span of one sparkline point in seconds
+    """
+
+    def __init__(
+        self,
+        capacity: int = VIEWER_HISTORY_SIZE,
+        buckets: int = VIEWER_SPARKLINE_BUCKETS,
+        bucket_seconds: float = VIEWER_SPARKLINE_BUCKET_SECONDS,
+    ) -> None:
+        self.capacity: int = capacity
+        self.buckets: int = buckets
+        self.bucket_seconds: float = bucket_seconds
+        self.times: array = array("I", bytes(4 * capacity))
+        self.counts: array = array("I", bytes(4 * capacity))
+        self.start: int = 0
+        self.size: int = 0
+        self.peak: int = 0
+        self.sparkline: array = array("I", bytes(4 * buckets))
+        self.last_bucket: int = -1
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, timestamp: float, viewers: int) -> bool:
+        """Adds a sample.
+
+        Returns:
+            Whether the trend returned by `get_trend` changed
+        """
+        with self.lock:
+            # Trends without samples have no peak, so the first sample always changes it
+            before = (self.size == 0, self.peak, self.sparkline.tobytes())
+            if self.size == self.capacity:
+                evicted = self.counts[self.start]
+                self.counts[self.start] = 0
+                self.start = (self.start + 1) % self.capacity
+                self.size -= 1
+                if evicted == self.peak:
+                    # Only rescanned when the peak itself falls out of the buffer
+                    self.peak = max(self.counts) if self.size else 0
+            end = (self.start + self.size) % self.capacity
+            self.times[end] = int(timestamp)
+            self.counts[end] = viewers
+            self.size += 1
+            self.peak = max(self.peak, viewers)
+            self._update_sparkline(int(timestamp // self.bucket_seconds), viewers)
+            return before != (False, self.peak, self.sparkline.tobytes())
+
+    def clear(self) -> None:
+        with self.lock:
+            self.start = 0
+            self.size = 0
+            self.peak = 0
+            self.last_bucket = -1
+
+    def get_trend(self) -> dict[str, Any]:
+        """Returns the sparkline, the change over the sparkline window and the peak.
+
+        Returns None values while there are no samples.
+        """
+        with self.lock:
+            if not self.size:
+                return {"sparkline": [], "delta": None, "peak": None}
+            return {
+                "sparkline": self.sparkline.tolist(),
+                "delta": self.sparkline[-1] - self.sparkline[0],
+                "peak": self.peak,
+            }
+
+    def get_samples(self) -> list[tuple[int, int]]:
+        """Returns all samples as (Unix timestamp, viewers), oldest first."""
+        with self.lock:
+            end = self.start + self.size
+            if end <= self.capacity:
+                times = self.times[self.start : end]
+                counts = self.counts[self.start : end]
+            else:
+                wrapped = end - self.capacity
+                times = self.times[self.start :] + self.times[:wrapped]
+                counts = self.counts[self.start :] + self.counts[:wrapped]
+            return list(zip(times, counts))
+
+    def _update_sparkline(self, bucket: int, viewers: int) -> None:
+        """Moves the sparkline forward to `bucket`, must be called with the lock held."""
+        if self.last_bucket < 0:
+            # First sample, the stream starts flat
+            self.sparkline = array("I", [viewers]) * self.buckets
+        elif bucket > self.last_bucket:
+            shift = min(bucket - self.last_bucket, self.buckets)
+            # Buckets without samples keep the last known count
+            filler = array("I", [self.sparkline[-1]]) * shift
+            self.sparkline = self.sparkline[shift:] + filler
+        self.last_bucket = max(self.last_bucket, bucket)
+        self.sparkline[-1] = viewers